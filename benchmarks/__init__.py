@@ -0,0 +1 @@
+"""Performance benchmarks of the Matching Engine, results are reported as JSON so they can be compared between commits"""
@@ -0,0 +1,83 @@
+"""
+Call auction benchmark: collects the orders of an opening auction and reports the time of the equilibrium price
+computation (vectorized with NumPy and with the pure Python fallback) and of the whole uncross
+
+Usage: python -m benchmarks.auction [--orders N] [--levels L] [--output FILE]
+"""
+import argparse
+import json
+import random
+import time
+
+from engine.matching_engine import MatchingEngine
+from engine.src import auction
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType
+from engine.src.instrument import InstrumentSpec
+
+
+def collect(orders: int, levels: int, seed: int) -> MatchingEngine:
+    """Collects the orders spread over the given number of price levels around 1000 on each side"""
+    rnd = random.Random(seed)
+    engine = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.01)], clock=SimulatedClock())
+    engine.start_auction('BTC')
+    for idx in range(orders):
+        side = rnd.choice((Side.BUY, Side.SELL))
+        offset = rnd.randrange(levels) * 0.01
+        price = 1000.0 + levels * 0.005 - offset if side == Side.BUY else 1000.0 - levels * 0.005 + offset
+        engine.match_order(engine.new_order(f'c{idx % 1000:06}', 'BTC', OrderType.LIMIT, side,
+                                            rnd.randrange(1, 100), round(price, 2)))
+    return engine
+
+
+def run(orders: int = 200_000, levels: int = 2_000, seed: int = 42) -> dict:
+    """
+    Runs the benchmark
+
+    :param orders: Number of orders collected during the auction
+    :param levels: Number of price levels per side
+    :param seed: Seed of the generated orders
+    :return: dict with the results
+    """
+    engine = collect(orders, levels, seed)
+    book = engine.orderbooks['BTC']
+    sides = [([level.price for level in side.levels()], [level.total_quantity for level in side.levels()])
+             for side in (book.bid_side, book.ask_side)]
+    results = {'config': {'orders': orders, 'levels': levels, 'seed': seed}}
+
+    for name, compute in (('vectorized', auction.equilibrium),
+                          ('python', lambda *levels: auction._equilibrium_python(*levels, None))):
+        if name == 'vectorized' and auction.numpy is None:
+            continue
+        start = time.perf_counter_ns()
+        price, volume, imbalance = compute(*sides[0], *sides[1])
+        results[f'equilibrium_{name}_ms'] = round((time.perf_counter_ns() - start) / 1e6, 3)
+
+    start = time.perf_counter_ns()
+    result = engine.end_auction('BTC')
+    elapsed = time.perf_counter_ns() - start
+    results['uncross'] = {'price': engine.to_price('BTC', result.price),
+                          'volume': result.volume,
+                          'imbalance': result.imbalance,
+                          'trades': len(result.trade_numbers),
+                          'ms': round(elapsed / 1e6, 3)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Matching Engine call auction benchmark')
+    parser.add_argument('--orders', type=int, default=200_000, help='number of orders collected during the auction')
+    parser.add_argument('--levels', type=int, default=2_000, help='number of price levels per side')
+    parser.add_argument('--output', help='JSON file the results are written to, printed to stdout by default')
+    args = parser.parse_args()
+
+    results = json.dumps(run(args.orders, args.levels), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(results)
+    else:
+        print(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Compares two benchmark results produced by benchmarks.run, e.g. of two commits
+
+Usage: python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold PCT]
+"""
+import argparse
+import json
+import sys
+
+
+def metrics(results: dict) -> dict:
+    """
+    Flattens the benchmark results into the compared metrics
+
+    :param results: Results produced by benchmarks.run
+    :return: dict of metric name -> (value, True if higher is better)
+    """
+    flat = {'events_per_sec': (results['throughput']['events_per_sec'], True)}
+    for kind, summary in results['latency_ns'].items():
+        for name in ('p50', 'p99', 'p99.9'):
+            if summary.get(name) is not None:
+                flat[f'latency_ns.{kind}.{name}'] = (summary[name], False)
+    if 'peak_memory_bytes' in results:
+        flat['peak_memory_bytes'] = (results['peak_memory_bytes'], False)
+    for name, value in results.get('memory', {}).items():
+        if name.startswith('bytes_per_'):
+            flat[f'memory.{name}'] = (value, False)
+    for name in ('journaled_events_per_sec', 'replay_events_per_sec'):
+        if name in results.get('journal', {}):
+            flat[f'journal.{name}'] = (results['journal'][name], True)
+    return flat
+
+
+def compare(baseline: dict, candidate: dict, threshold: float = 10.0) -> list:
+    """
+    Compares the metrics of the two results
+
+    :param baseline: Baseline results
+    :param candidate: Candidate results
+    :param threshold: Change in percent considered to be a regression
+    :return: list of (metric, baseline value, candidate value, change in percent, True if regressed)
+    """
+    old, new = metrics(baseline), metrics(candidate)
+    rows = []
+    for name, (value, higher_is_better) in old.items():
+        if name not in new or not value:
+            continue
+        change = (new[name][0] - value) / value * 100
+        regressed = -change > threshold if higher_is_better else change > threshold
+        rows.append((name, value, new[name][0], round(change, 1), regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares two Matching Engine benchmark results')
+    parser.add_argument('baseline', help='JSON results of the baseline')
+    parser.add_argument('candidate', help='JSON results of the candidate')
+    parser.add_argument('--threshold', type=float, default=10.0, help='change in percent considered a regression')
+    args = parser.parse_args()
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.candidate) as file:
+        candidate = json.load(file)
+
+    rows = compare(baseline, candidate, args.threshold)
+    for name, old, new, change, regressed in rows:
+        print(f"{name:<32} {old:>14} {new:>14} {change:>+8.1f}% {'REGRESSION' if regressed else ''}")
+    sys.exit(1 if any(row[-1] for row in rows) else 0)
+
+
+if __name__ == '__main__':
+    main()
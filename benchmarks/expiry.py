@@ -0,0 +1,100 @@
+"""
+Time-in-force expiry benchmark: cost of expiring resting GTD orders through the engine's timer wheel, compared with
+scanning the OrderBooks for expired orders, and of the bulk end-of-day expiry of DAY orders
+
+Usage: python -m benchmarks.expiry [--orders N] [--seconds S] [--output FILE]
+"""
+import argparse
+import json
+import random
+import time
+
+from engine.matching_engine import MatchingEngine
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType, TimeInForce
+
+SECOND = 1_000_000_000
+
+
+def rest_orders(orders: int, seconds: int, time_in_force: TimeInForce, seed: int) -> MatchingEngine:
+    """Rests the orders on both sides of three instruments, GTD ones expire uniformly over the given seconds"""
+    rnd = random.Random(seed)
+    engine = MatchingEngine(clock=SimulatedClock())
+    for _ in range(orders):
+        side = rnd.choice((Side.BUY, Side.SELL))
+        price = 1000.0 - rnd.randrange(1, 200) if side == Side.BUY else 1000.0 + rnd.randrange(1, 200)
+        expire_time = rnd.randrange(1, seconds * SECOND) if time_in_force == TimeInForce.GTD else None
+        engine.match_order(engine.new_order(f'c{rnd.randrange(1000):06}', rnd.choice(('BTC', 'ETH', 'SOL')),
+                                            OrderType.LIMIT, side, 10, price, time_in_force=time_in_force,
+                                            expire_time=expire_time))
+    return engine
+
+
+def wheel_expiry(orders: int, seconds: int, seed: int) -> dict:
+    """Advances the clock second by second, expiring the GTD orders through the timer wheel"""
+    engine = rest_orders(orders, seconds, TimeInForce.GTD, seed)
+    expired = 0
+    start = time.perf_counter_ns()
+    for second in range(1, seconds + 1):
+        engine.clock.set(second * SECOND)
+        expired += len(engine.expire_orders())
+    elapsed = time.perf_counter_ns() - start
+    return {'expired': expired, 'ns_per_order': round(elapsed / max(expired, 1))}
+
+
+def scan_expiry(orders: int, seconds: int, seed: int) -> dict:
+    """The same expiry done by scanning all working orders every second, the cost the timer wheel avoids"""
+    engine = rest_orders(orders, seconds, TimeInForce.GTD, seed)
+    expired = 0
+    start = time.perf_counter_ns()
+    for second in range(1, seconds + 1):
+        now = second * SECOND
+        for book in engine.orderbooks.values():
+            for order in [order for order in book.bids + book.asks if order.expire_time <= now]:
+                book.remove_order(order)
+                expired += 1
+    elapsed = time.perf_counter_ns() - start
+    return {'expired': expired, 'ns_per_order': round(elapsed / max(expired, 1))}
+
+
+def day_expiry(orders: int, seed: int) -> dict:
+    """Expires all DAY orders at the end of the day"""
+    engine = rest_orders(orders, 1, TimeInForce.DAY, seed)
+    start = time.perf_counter_ns()
+    expired = len(engine.expire_day())
+    elapsed = time.perf_counter_ns() - start
+    return {'expired': expired, 'ns_per_order': round(elapsed / max(expired, 1))}
+
+
+def run(orders: int = 200_000, seconds: int = 60, seed: int = 42) -> dict:
+    """
+    Runs the benchmark
+
+    :param orders: Number of resting orders
+    :param seconds: Period the GTD orders expire over, the clock moves by one second at a time
+    :param seed: Seed of the generated orders
+    :return: dict with the results
+    """
+    return {'config': {'orders': orders, 'seconds': seconds, 'seed': seed},
+            'gtd_wheel': wheel_expiry(orders, seconds, seed),
+            'gtd_scan': scan_expiry(orders, seconds, seed),
+            'day_end': day_expiry(orders, seed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Matching Engine time-in-force expiry benchmark')
+    parser.add_argument('--orders', type=int, default=200_000, help='number of resting orders')
+    parser.add_argument('--seconds', type=int, default=60, help='period the GTD orders expire over')
+    parser.add_argument('--output', help='JSON file the results are written to, printed to stdout by default')
+    args = parser.parse_args()
+
+    results = json.dumps(run(args.orders, args.seconds), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(results)
+    else:
+        print(results)
+
+
+if __name__ == '__main__':
+    main()
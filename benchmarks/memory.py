@@ -0,0 +1,83 @@
+"""
+Memory footprint benchmark: bytes used per resting order and per trade
+
+Usage: python -m benchmarks.memory [--orders N] [--output FILE]
+"""
+import argparse
+import json
+import tracemalloc
+
+from engine.matching_engine import MatchingEngine
+from engine.src.enums import Side, OrderType
+
+
+def order_memory(orders: int = 100_000, levels: int = 100, clients: int = 1_000) -> float:
+    """
+    Measures the memory used by each limit order resting in the OrderBook, including its share of the book structures
+
+    :param orders: Number of resting orders
+    :param levels: Number of price levels the orders are spread across
+    :param clients: Number of distinct clients placing the orders
+    :return: float, bytes per order
+    """
+    engine = MatchingEngine()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(orders):
+        order = engine.new_order(f'c{i % clients:06}', 'BTC', OrderType.LIMIT, Side.BUY, 10, 1000.0 - i % levels)
+        engine.match_order(order)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / orders
+
+
+def trade_memory(trades: int = 100_000) -> float:
+    """
+    Measures the memory used by each trade kept by the engine
+
+    :param trades: Number of trades
+    :return: float, bytes per trade
+    """
+    engine = MatchingEngine()
+    for i in range(trades):
+        engine.match_order(engine.new_order('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 1, 1000.0))
+    # Keep the passive orders alive, so only the trades are measured
+    resting = engine.orderbooks['BTC'].asks
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    engine.match_order(engine.new_order('c000002', 'BTC', OrderType.MARKET, Side.BUY, trades))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(engine.trades) == len(resting)
+    return (after - before) / trades
+
+
+def run(orders: int = 100_000) -> dict:
+    """
+    Runs the memory benchmark
+
+    :param orders: Number of orders and trades to be measured
+    :return: dict with the results
+    """
+    return {'orders': orders,
+            'bytes_per_order': round(order_memory(orders), 1),
+            'bytes_per_trade': round(trade_memory(orders), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Matching Engine memory footprint benchmark')
+    parser.add_argument('--orders', type=int, default=100_000, help='number of orders and trades to be measured')
+    parser.add_argument('--output', help='JSON file the results are written to, printed to stdout by default')
+    args = parser.parse_args()
+
+    results = json.dumps(run(args.orders), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(results)
+    else:
+        print(results)
+
+
+if __name__ == '__main__':
+    main()
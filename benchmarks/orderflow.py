@@ -0,0 +1,121 @@
+"""
+Seeded synthetic order flow used to drive the Matching Engine in benchmarks.
+
+Each event is a tuple (kind, timestamp, payload). Order events carry a record of the MatchingEngine.new_order
+parameters, cancel events carry (instrument, index of the cancelled order's event)
+"""
+import random
+
+from engine.src.enums import Side, OrderType
+
+LIMIT = 'limit'
+MARKET = 'market'
+ICEBERG = 'iceberg'
+FOK = 'fok'
+STOP = 'stop'
+CANCEL = 'cancel'
+
+# Share of each event kind in the generated flow
+DEFAULT_MIX = {LIMIT: 0.50, MARKET: 0.05, ICEBERG: 0.05, FOK: 0.03, STOP: 0.05, CANCEL: 0.32}
+
+
+def generate_order_flow(events: int = 100_000,
+                        instruments: tuple = ('BTC', 'ETH', 'SOL'),
+                        rate: float = 10_000.0,
+                        mix: dict = None,
+                        seed: int = 42,
+                        mid_price: float = 100.0,
+                        tick_size: float = 0.01,
+                        depth_decay: float = 0.15,
+                        aggressive_share: float = 0.1,
+                        clients: int = 100,
+                        start_time: int = 0):
+    """
+    Generates the order flow. Arrivals follow a Poisson process, passive prices are placed at a geometrically
+    distributed distance from a random-walking mid price, so most of the depth is close to the top of the book
+
+    :param events: Number of events to be generated
+    :param instruments: Traded instruments, events are spread uniformly across them
+    :param rate: Mean number of events per second
+    :param mix: Share of each event kind, see DEFAULT_MIX
+    :param seed: Random seed, the same seed always generates the same flow
+    :param mid_price: Initial mid price of every instrument
+    :param tick_size: Price increment
+    :param depth_decay: Parameter of the geometric distribution of the passive prices' distance (in ticks) from the mid
+    :param aggressive_share: Share of the limit orders priced through the mid, i.e. likely to trade on arrival
+    :param clients: Number of distinct clients
+    :param start_time: Timestamp (ns) of the first event
+    :return: generator of events
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    mids = {instrument: round(mid_price / tick_size) for instrument in instruments}
+    # Indexes of the events of the orders which could still be working in the OrderBook, per instrument
+    resting = {instrument: [] for instrument in instruments}
+    client_ids = [f'c{idx:06}' for idx in range(clients)]
+    timestamp = start_time
+
+    def price(ticks: int) -> float:
+        return round(ticks * tick_size, 10)
+
+    def passive_ticks(instrument: str, side: Side) -> int:
+        distance = 1 + int(rng.expovariate(depth_decay))
+        return mids[instrument] - distance if side == Side.BUY else mids[instrument] + distance
+
+    def quantity() -> int:
+        return 1 + int(rng.expovariate(1 / 20))
+
+    for idx in range(events):
+        timestamp += int(rng.expovariate(rate) * 1e9)
+        instrument = rng.choice(instruments)
+        side = Side.BUY if rng.random() < 0.5 else Side.SELL
+        client_id = rng.choice(client_ids)
+        kind = rng.choices(kinds, weights)[0]
+
+        # Random walk of the mid price
+        move = rng.random()
+        if move < 0.05:
+            mids[instrument] += 1
+        elif move < 0.10 and mids[instrument] > 10:
+            mids[instrument] -= 1
+
+        if kind == CANCEL and not resting[instrument]:
+            kind = LIMIT
+
+        if kind == CANCEL:
+            orders = resting[instrument]
+            # Cancels hit recent orders more often than old ones
+            target = orders.pop(max(0, len(orders) - 1 - int(rng.expovariate(0.05))))
+            yield CANCEL, timestamp, (instrument, target)
+
+        elif kind == LIMIT or kind == ICEBERG:
+            ticks = passive_ticks(instrument, side)
+            if rng.random() < aggressive_share:
+                ticks = 2 * mids[instrument] - ticks
+            qty = quantity()
+            if kind == ICEBERG:
+                qty *= 5
+                record = (client_id, instrument, OrderType.LIMIT, side, qty, price(ticks), True, max(1, qty // 5))
+            else:
+                record = (client_id, instrument, OrderType.LIMIT, side, qty, price(ticks))
+            resting[instrument].append(idx)
+            yield kind, timestamp, record
+
+        elif kind == MARKET:
+            yield kind, timestamp, (client_id, instrument, OrderType.MARKET, side, quantity())
+
+        elif kind == FOK:
+            # Fill or Kill orders are priced through the mid and either sweep a few levels or get killed
+            ticks = mids[instrument] + (3 if side == Side.BUY else -3)
+            record = (client_id, instrument, OrderType.LIMIT, side, quantity() * 2, price(ticks), False, None, True)
+            yield kind, timestamp, record
+
+        elif kind == STOP:
+            # Stops wait beyond the mid in the direction of the move they protect against
+            distance = 1 + int(rng.expovariate(0.3))
+            ticks = mids[instrument] + distance if side == Side.BUY else mids[instrument] - distance
+            record = (client_id, instrument, OrderType.MARKET, side, quantity(), None, False, None, False, True,
+                      price(ticks))
+            yield kind, timestamp, record
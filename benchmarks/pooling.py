@@ -0,0 +1,86 @@
+"""
+Pooled mode benchmark: drives the same order flow through a regular and a pooled engine and reports the Orders
+allocated per inbound order, the garbage collections and the latency percentiles of both
+
+Usage: python -m benchmarks.pooling [--events N] [--seed S] [--output FILE]
+"""
+import argparse
+from array import array
+import gc
+import json
+import time
+
+from benchmarks.orderflow import generate_order_flow, CANCEL, DEFAULT_MIX
+from benchmarks.run import drive, percentiles
+from engine.matching_engine import MatchingEngine
+from engine.src.clock import SimulatedClock
+from engine.src.instrument import InstrumentSpec
+
+
+def measure(flow: list, instruments: tuple, tick_size: float, pooled: bool) -> dict:
+    """
+    Drives the engine with the flow, counting the garbage collections of every generation
+
+    :return: dict with the throughput, latency percentiles, allocated Orders and garbage collections
+    """
+    engine = MatchingEngine(instruments=[InstrumentSpec(instrument, tick_size) for instrument in instruments],
+                            clock=SimulatedClock(), pooled=pooled)
+    collections = [0, 0, 0]
+
+    def count_collections(phase: str, info: dict):
+        if phase == 'start':
+            collections[info['generation']] += 1
+
+    latencies = {kind: array('q') for kind in DEFAULT_MIX}
+    gc.collect()
+    gc.callbacks.append(count_collections)
+    try:
+        start = time.perf_counter()
+        drive(engine, flow, latencies)
+        elapsed = time.perf_counter() - start
+    finally:
+        gc.callbacks.remove(count_collections)
+
+    all_latencies = array('q')
+    for kind_latencies in latencies.values():
+        all_latencies.extend(kind_latencies)
+    orders = sum(1 for kind, *_ in flow if kind != CANCEL)
+    pool = engine.pool
+    return {'events_per_sec': round(len(flow) / elapsed),
+            'latency_ns': percentiles(all_latencies),
+            'orders_allocated_per_order': round(pool.created / orders, 4) if pool is not None else 1.0,
+            'orders_reused': pool.reused if pool is not None else 0,
+            'trades': engine.trades.count,
+            'gc_collections': {f'gen{generation}': count for generation, count in enumerate(collections)}}
+
+
+def run(events: int = 100_000, seed: int = 42, instruments: tuple = ('BTC', 'ETH', 'SOL'),
+        tick_size: float = 0.01) -> dict:
+    """
+    Runs the benchmark
+
+    :return: dict with the results of the regular and the pooled engine
+    """
+    flow = list(generate_order_flow(events, instruments=instruments, seed=seed, tick_size=tick_size))
+    return {'config': {'events': events, 'seed': seed, 'instruments': list(instruments)},
+            'regular': measure(flow, instruments, tick_size, pooled=False),
+            'pooled': measure(flow, instruments, tick_size, pooled=True)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Matching Engine pooled mode benchmark')
+    parser.add_argument('--events', type=int, default=100_000, help='number of generated events')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the generated order flow')
+    parser.add_argument('--output', help='JSON file the results are written to, printed to stdout by default')
+    args = parser.parse_args()
+
+    results = json.dumps(run(args.events, args.seed), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(results)
+    else:
+        print(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Historical replay benchmark: writes the seeded synthetic order flow as CSV and binary replay files and replays
+each of them at the maximum speed through a fresh engine, streaming the fills and book level updates to a file
+
+Usage: python -m benchmarks.replay [--events N] [--output FILE]
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from benchmarks.orderflow import generate_order_flow, CANCEL
+from engine.matching_engine import MatchingEngine
+from engine.src import codec
+from engine.src.enums import TimeInForce
+from engine.src.replay import ReplayDriver, read_csv, read_binary, write_csv, write_binary
+
+# Default values of the new_order parameters the generated order records may leave out, from the price onwards
+_DEFAULTS = (None, False, None, False, False, None, TimeInForce.GTC, None)
+
+
+def replay_events(flow):
+    """
+    Converts the generated order flow to replay events, the orders are referenced by their event number
+
+    :param flow: Events generated by generate_order_flow
+    :return: generator of (timestamp, reference, message type, fields) tuples
+    """
+    for idx, (kind, timestamp, payload) in enumerate(flow, 1):
+        if kind == CANCEL:
+            instrument, target = payload
+            yield timestamp, 0, codec.CANCEL, (instrument, target + 1)
+        else:
+            yield timestamp, idx, codec.NEW_ORDER, tuple(payload) + _DEFAULTS[len(payload) - 5:]
+
+
+def run(events: int = 100_000, seed: int = 42, retention: int = 10_000) -> dict:
+    """
+    Runs the benchmark
+
+    :param events: Number of replayed events
+    :param seed: Seed of the generated order flow
+    :param retention: Number of trades the replaying engine keeps in memory
+    :return: dict with the results
+    """
+    results = {'config': {'events': events, 'seed': seed, 'retention': retention}}
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {'csv': os.path.join(directory, 'events.csv'), 'binary': os.path.join(directory, 'events.bin')}
+        write_csv(replay_events(generate_order_flow(events, seed=seed)), paths['csv'])
+        write_binary(replay_events(generate_order_flow(events, seed=seed)), paths['binary'])
+        output = os.path.join(directory, 'output.csv')
+
+        for name, read in (('csv', read_csv), ('binary', read_binary)):
+            driver = ReplayDriver(MatchingEngine(trade_retention=retention), output)
+            stats = driver.run(read(paths[name]))
+            results[name] = {'file_bytes': os.path.getsize(paths[name]),
+                             'events_per_second': stats['events_per_second'],
+                             'seconds': stats['seconds'],
+                             'trades': stats['trades'],
+                             'level_updates': stats['level_updates'],
+                             'output_bytes': os.path.getsize(output)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Matching Engine historical replay benchmark')
+    parser.add_argument('--events', type=int, default=100_000, help='number of replayed events')
+    parser.add_argument('--output', help='JSON file the results are written to, printed to stdout by default')
+    args = parser.parse_args()
+
+    results = json.dumps(run(args.events), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(results)
+    else:
+        print(results)
+
+
+if __name__ == '__main__':
+    main()
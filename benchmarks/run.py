@@ -0,0 +1,226 @@
+"""
+Throughput and latency benchmark of the Matching Engine driven by the synthetic order flow.
+Reports orders/sec, latency percentiles per event kind and per matching phase, peak memory, stop-cascade sizes and
+the journal's write and replay speed as JSON
+
+Usage: python -m benchmarks.run [--events N] [--seed S] [--output FILE] [--no-memory] [--no-journal] [--no-phases]
+Compare two results with: python -m benchmarks.compare BASELINE.json CANDIDATE.json
+"""
+import argparse
+from array import array
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import memory
+from benchmarks.orderflow import generate_order_flow, CANCEL, DEFAULT_MIX
+from engine.matching_engine import MatchingEngine
+from engine.src.clock import SimulatedClock
+from engine.src.instrument import InstrumentSpec
+from engine.src import snapshot
+from engine.src.journal import Journal
+from engine.src.latency import LatencyRecorder
+
+PERCENTILES = (('p50', 0.50), ('p99', 0.99), ('p99.9', 0.999))
+
+
+def percentiles(latencies: array) -> dict:
+    """
+    Summarizes the latencies
+
+    :param latencies: Latencies in nanoseconds
+    :return: dict with the count and percentiles of the latencies
+    """
+    ordered = sorted(latencies)
+    summary = {'count': len(ordered)}
+    for name, quantile in PERCENTILES:
+        summary[name] = ordered[min(len(ordered) - 1, int(quantile * len(ordered)))] if ordered else None
+    summary['max'] = ordered[-1] if ordered else None
+    return summary
+
+
+def create_engine(instruments: tuple, tick_size: float, journal: Journal = None) -> MatchingEngine:
+    clock = SimulatedClock()
+    return MatchingEngine(instruments=[InstrumentSpec(instrument, tick_size) for instrument in instruments], clock=clock,
+                          journal=journal)
+
+
+def drive(engine: MatchingEngine, events: list, latencies: dict = None) -> dict:
+    """
+    Feeds the events to the engine, timing each of them
+
+    :param engine: Engine to be driven
+    :param events: Events generated by generate_order_flow
+    :param latencies: Optional dict the per-kind latencies (ns) are collected in
+    :return: dict with the stop-cascade statistics
+    """
+    clock = engine.clock
+    order_ids = {}
+    perf_counter_ns = time.perf_counter_ns
+
+    for idx, (kind, timestamp, payload) in enumerate(events):
+        clock.set(timestamp)
+
+        start = perf_counter_ns()
+        if kind == CANCEL:
+            engine.cancel_order(payload[0], order_ids.get(payload[1], -1))
+        else:
+            report = engine.match_order(engine.new_order(*payload))
+        elapsed = perf_counter_ns() - start
+
+        if kind != CANCEL:
+            order_ids[idx] = report.order_id
+        if latencies is not None:
+            latencies[kind].append(elapsed)
+
+    cascades = engine.stop_cascades.summary()
+    return {'events_with_stops_fired': cascades['cascades'],
+            'max_stops_fired': cascades['max_fired'],
+            'mean_stops_fired': cascades['mean_fired'],
+            'max_depth': cascades['max_depth'],
+            'seconds': cascades['seconds']}
+
+
+def run(events: int = 100_000,
+        seed: int = 42,
+        instruments: tuple = ('BTC', 'ETH', 'SOL'),
+        tick_size: float = 0.01,
+        measure_memory: bool = True,
+        measure_journal: bool = True,
+        sync_every: int = 1000,
+        measure_phases: bool = True) -> dict:
+    """
+    Runs the benchmark
+
+    :param events: Number of generated events
+    :param seed: Seed of the order flow
+    :param instruments: Traded instruments
+    :param tick_size: Tick size of all instruments
+    :param measure_memory: If True the flow is replayed once more under tracemalloc to measure the peak memory
+    :param measure_journal: If True the flow is replayed once more with a journal, which is then replayed
+    :param sync_every: Number of journal records per fsync
+    :param measure_phases: If True the flow is replayed once more recording the latencies of the matching phases
+    :return: dict with the results
+    """
+    flow = list(generate_order_flow(events, instruments=instruments, seed=seed, tick_size=tick_size))
+
+    engine = create_engine(instruments, tick_size)
+    latencies = {kind: array('q') for kind in DEFAULT_MIX}
+    start = time.perf_counter()
+    cascades = drive(engine, flow, latencies)
+    elapsed = time.perf_counter() - start
+    all_latencies = array('q')
+    for kind_latencies in latencies.values():
+        all_latencies.extend(kind_latencies)
+
+    results = {'config': {'events': events, 'seed': seed, 'instruments': list(instruments), 'tick_size': tick_size},
+               'environment': {'python': platform.python_version(), 'commit': _commit()},
+               'throughput': {'seconds': round(elapsed, 3),
+                              'events_per_sec': round(events / elapsed),
+                              'engine_events_per_sec': round(events / (sum(all_latencies) / 1e9))},
+               'latency_ns': {'all': percentiles(all_latencies),
+                              **{kind: percentiles(kind_latencies) for kind, kind_latencies in latencies.items()}},
+               'stop_cascade': cascades,
+               'trades': engine.trades.count,
+               'resting_orders': sum(len(book) for book in engine.orderbooks.values())}
+
+    if measure_memory:
+        engine = create_engine(instruments, tick_size)
+        tracemalloc.start()
+        drive(engine, flow)
+        results['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results['memory'] = memory.run(min(events, 100_000))
+
+    if measure_journal:
+        results['journal'] = journal_run(flow, instruments, tick_size, sync_every)
+
+    if measure_phases:
+        engine = create_engine(instruments, tick_size)
+        engine.latency = LatencyRecorder()
+        start = time.perf_counter()
+        drive(engine, flow)
+        elapsed = time.perf_counter() - start
+        results['phases'] = {'events_per_sec': round(events / elapsed),
+                             'latency_ns': engine.latency_stats((50, 99, 99.9))['order_type']}
+
+    return results
+
+
+def journal_run(flow: list, instruments: tuple, tick_size: float, sync_every: int) -> dict:
+    """
+    Drives the engine with a journal and recovers a new engine from it, once by replaying the whole journal
+    and once from a snapshot
+
+    :return: dict with the journaled throughput, the replay speed and the snapshot's capture and load times
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'engine.journal')
+        with Journal(path, sync_every=sync_every) as journal:
+            engine = create_engine(instruments, tick_size, journal)
+            start = time.perf_counter()
+            drive(engine, flow)
+            elapsed = time.perf_counter() - start
+        records = journal.records
+
+        recovered = create_engine(instruments, tick_size)
+        start = time.perf_counter()
+        Journal.replay(path, recovered)
+        replay_elapsed = time.perf_counter() - start
+
+        snapshot_path = os.path.join(directory, 'engine.snapshot')
+        start = time.perf_counter()
+        captured = snapshot.capture(engine)
+        capture_elapsed = time.perf_counter() - start
+        snapshot.write(captured, snapshot_path)
+        start = time.perf_counter()
+        snapshot.load(snapshot_path, create_engine(instruments, tick_size))
+        load_elapsed = time.perf_counter() - start
+
+        return {'sync_every': sync_every,
+                'records': records,
+                'bytes': os.path.getsize(path),
+                'journaled_events_per_sec': round(len(flow) / elapsed),
+                'replay_seconds': round(replay_elapsed, 3),
+                'replay_events_per_sec': round(records / replay_elapsed),
+                'replayed_trades_match': recovered.trades.count == engine.trades.count,
+                'snapshot_orders': sum(len(book) for book in engine.orderbooks.values()) +
+                                   sum(map(len, engine.stop_bids.values())) + sum(map(len, engine.stop_asks.values())),
+                'snapshot_bytes': len(captured),
+                'snapshot_capture_ms': round(capture_elapsed * 1e3, 2),
+                'snapshot_load_ms': round(load_elapsed * 1e3, 2)}
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Matching Engine throughput and latency benchmark')
+    parser.add_argument('--events', type=int, default=100_000, help='number of generated events')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the generated order flow')
+    parser.add_argument('--no-memory', action='store_true', help='skip the memory measurements')
+    parser.add_argument('--no-journal', action='store_true', help='skip the journal measurements')
+    parser.add_argument('--no-phases', action='store_true', help='skip the per-phase latency measurements')
+    parser.add_argument('--output', help='JSON file the results are written to, printed to stdout by default')
+    args = parser.parse_args()
+
+    results = json.dumps(run(args.events, args.seed, measure_memory=not args.no_memory,
+                             measure_journal=not args.no_journal, measure_phases=not args.no_phases), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(results)
+    else:
+        print(results)
+
+
+if __name__ == '__main__':
+    main()
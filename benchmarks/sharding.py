@@ -0,0 +1,68 @@
+"""
+Throughput of the sharded Matching Engine for an increasing number of worker processes.
+The multi-instrument synthetic order flow (without cancels) is sent in batches, the results are reported as JSON
+
+Usage: python -m benchmarks.sharding [--events N] [--instruments N] [--workers N] [--batch N] [--output FILE]
+"""
+import argparse
+import json
+import os
+import time
+
+from benchmarks.orderflow import generate_order_flow, CANCEL
+from engine.src.clock import SimulatedClock
+from engine.src.instrument import InstrumentSpec
+from engine.src.sharding import ShardedMatchingEngine
+
+
+def run(events: int = 100_000, instruments: int = 8, workers: int = None, batch: int = 5_000, seed: int = 42) -> dict:
+    """
+    Runs the benchmark
+
+    :param events: Number of generated events
+    :param instruments: Number of traded instruments
+    :param workers: Largest number of worker processes, the number of CPUs by default
+    :param batch: Number of orders sent to the workers at once
+    :param seed: Seed of the order flow
+    :return: dict with the throughput per number of workers
+    """
+    symbols = tuple(f'I{idx:03}' for idx in range(instruments))
+    records = [payload for kind, _, payload in generate_order_flow(events, instruments=symbols, seed=seed)
+               if kind != CANCEL]
+    specs = [InstrumentSpec(symbol, 0.01) for symbol in symbols]
+
+    results = {'config': {'events': events, 'orders': len(records), 'instruments': instruments, 'batch': batch,
+                          'cpus': os.cpu_count()},
+               'throughput': {}}
+    for shards in range(1, (workers or os.cpu_count() or 1) + 1):
+        with ShardedMatchingEngine(shards, instruments=specs, clock=SimulatedClock()) as engine:
+            trades = 0
+            start = time.perf_counter()
+            for idx in range(0, len(records), batch):
+                trades += len(engine.match_orders(records[idx:idx + batch])[1])
+            elapsed = time.perf_counter() - start
+        results['throughput'][shards] = {'seconds': round(elapsed, 3),
+                                         'orders_per_sec': round(len(records) / elapsed),
+                                         'trades': trades}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sharded Matching Engine throughput benchmark')
+    parser.add_argument('--events', type=int, default=100_000, help='number of generated events')
+    parser.add_argument('--instruments', type=int, default=8, help='number of traded instruments')
+    parser.add_argument('--workers', type=int, help='largest number of worker processes, CPU count by default')
+    parser.add_argument('--batch', type=int, default=5_000, help='number of orders sent to the workers at once')
+    parser.add_argument('--output', help='JSON file the results are written to, printed to stdout by default')
+    args = parser.parse_args()
+
+    results = json.dumps(run(args.events, args.instruments, args.workers, args.batch), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(results)
+    else:
+        print(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,81 @@
-from engine.src.order import Order
+from collections import deque
+import math
+from time import perf_counter_ns
+
+from engine.src import codec
+from engine.src.auction import AuctionResult, equilibrium
+from engine.src.clock import MonotonicClock
+from engine.src.instrument import InstrumentSpec
+from engine.src.latency import BOOK, FOK_CHECK, SWEEP, REMOVE, INSERT, STOPS
+from engine.src.order import Order, OrderPool, order_key
 from engine.src.orderbook import OrderBook
-from engine.src.trade import Trade
-from engine.src.enums import Side, OrderType
+from engine.src.position import PositionBook
+from engine.src.stopbook import StopBook, CascadeStats
+from engine.src.timerwheel import TimerWheel
+from engine.src.tradetape import TradeTape
+from engine.src.enums import Side, OrderType, OrderStatus, TimeInForce
+from engine.src.report import ExecutionReport
 
 
 class MatchingEngine:
-    def __init__(self):
+    def __init__(self,
+                 instruments: list = None,
+                 clock=None,
+                 trade_retention: int = None,
+                 trade_spill_path: str = None,
+                 journal=None,
+                 feed=None,
+                 latency=None,
+                 stop_cascade_limit: int = None,
+                 pooled: bool = False,
+                 expiry_resolution: int = 1_000_000):
         self._orderbooks = {}
-        self._trades = []
+        # Instruments with a registered InstrumentSpec are traded in integer tick prices
+        self._instruments = {}
+        # Columnar trade store, optionally keeping only the most recent trades in memory
+        self._trades = TradeTape(retention=trade_retention, spill_path=trade_spill_path,
+                                 tick_instruments=self._instruments)
+        # Client ID -> instrument -> order ID -> Order index of the working orders, shared by all OrderBooks
+        self._client_orders = {}
+        # Per-client, per-instrument positions of both counterparties, updated on every fill
+        self._positions = PositionBook()
         self._stop_bids = {}
         self._stop_asks = {}
-        # Counter used to generate unique trade IDs
-        self.__counter = 1
+        # Client ID -> instrument -> order ID -> Order index of the queued stop orders, shared by all StopBooks
+        self._client_stops = {}
+        # Instrument -> price the stop queues were last searched at
+        self._stop_checks = {}
+        # Maximum number of stop orders matched per inbound event, the rest of the cascade is deferred
+        assert stop_cascade_limit is None or stop_cascade_limit > 0, 'Stop cascade limit has to be positive'
+        self._stop_cascade_limit = stop_cascade_limit
+        # Instrument -> deque of the triggered stop orders deferred to the instrument's next inbound order
+        self._deferred_stops = {}
+        self._cascade_stats = CascadeStats()
+        # Instruments in the call auction phase, their orders are collected without matching until the uncross
+        self._auctions = set()
+        # Monotonically increasing sequence number stamped on every order reaching the engine, defines time priority
+        self._sequence = 0
+        # Clock providing nanosecond timestamps, e.g. MonotonicClock or SimulatedClock for replays
+        self._clock = clock if clock is not None else MonotonicClock()
+        # Optional write-ahead Journal recording every inbound order, cancel and modification before it is processed
+        self._journal = journal
+        # Optional MarketDataFeed the changed OrderBook levels are published to after every inbound event
+        self._feed = None
+        if feed is not None:
+            self.feed = feed
+        # Optional LatencyRecorder the hot path's phase latencies are recorded into
+        self._latency = latency
+        # Pooled mode: Orders leaving the engine (fully filled, killed or cancelled) are recycled by new_order,
+        # so they must not be used after the call which filled or cancelled them returned
+        self._pool = OrderPool() if pooled else None
+        # Timer wheel of the (order ID, Order) entries of the working GTD orders, advanced by the inbound events.
+        # Entries of the orders filled or cancelled before their expiry are dropped when they fire
+        self._expiries = TimerWheel(resolution=expiry_resolution)
+        # Instrument -> list of the (order ID, Order) entries of the DAY orders, expired in bulk by expire_day
+        self._day_orders = {}
+
+        for spec in instruments or []:
+            self.add_instrument(spec)
 
     @property
     def orderbooks(self):
@@ -21,6 +85,14 @@ class MatchingEngine:
     def trades(self):
         return self._trades
 
+    @property
+    def client_orders(self):
+        return self._client_orders
+
+    @property
+    def positions(self):
+        return self._positions
+
     @property
     def stop_bids(self):
         return self._stop_bids
@@ -29,192 +101,864 @@ class MatchingEngine:
     def stop_asks(self):
         return self._stop_asks
 
-    def match_order(self, order: Order):
+    @property
+    def client_stops(self):
+        return self._client_stops
+
+    @property
+    def deferred_stops(self):
+        return self._deferred_stops
+
+    @property
+    def auctions(self) -> set:
+        return self._auctions
+
+    @property
+    def stop_cascades(self) -> CascadeStats:
+        return self._cascade_stats
+
+    @property
+    def stop_cascade_limit(self):
+        return self._stop_cascade_limit
+
+    @stop_cascade_limit.setter
+    def stop_cascade_limit(self, limit: int):
+        assert limit is None or limit > 0, 'Stop cascade limit has to be positive'
+        self._stop_cascade_limit = limit
+
+    @property
+    def instruments(self):
+        return self._instruments
+
+    @property
+    def clock(self):
+        return self._clock
+
+    @clock.setter
+    def clock(self, clock):
+        self._clock = clock
+
+    @property
+    def journal(self):
+        return self._journal
+
+    @journal.setter
+    def journal(self, journal):
+        self._journal = journal
+
+    @property
+    def feed(self):
+        return self._feed
+
+    @feed.setter
+    def feed(self, feed):
+        self._feed = feed
+        if feed is not None:
+            for book in self._orderbooks.values():
+                book.track_changes()
+
+    @property
+    def latency(self):
+        return self._latency
+
+    @latency.setter
+    def latency(self, latency):
+        self._latency = latency
+
+    def latency_stats(self, percentiles: tuple = (50, 99, 99.9)):
+        """
+        Gets the phase latencies of matching the orders per order type and per instrument
+
+        :param percentiles: Percentiles to be reported
+        :return: dict, see LatencyRecorder.stats, or None if the latencies are not recorded
+        """
+        return self._latency.stats(percentiles) if self._latency is not None else None
+
+    @property
+    def pool(self):
+        return self._pool
+
+    @property
+    def expiries(self) -> TimerWheel:
+        return self._expiries
+
+    @property
+    def sequence(self):
+        return self._sequence
+
+    @sequence.setter
+    def sequence(self, sequence: int):
+        self._sequence = sequence
+
+    def format_timestamp(self, timestamp: int) -> str:
+        """
+        Formats the engine's clock timestamp of an order or a trade as human-readable time
+
+        :param timestamp: Nanoseconds returned by the engine's clock
+        :return: str
+        """
+        return self._clock.format(timestamp)
+
+    def add_instrument(self, spec: InstrumentSpec):
+        """
+        Registers the instrument's trading parameters, from now on the instrument is traded in integer ticks
+
+        :param spec: Instrument specification
+        """
+        assert spec.instrument not in self._orderbooks, f'{spec.instrument} is already traded without a spec'
+        self._instruments[spec.instrument] = spec
+
+    def to_price(self, instrument: str, price):
+        """
+        Converts the price used inside the engine (ticks for instruments with a spec) to the outside world price
+
+        :param instrument: Instrument of the price
+        :param price: Price used by the engine's orders, trades and OrderBooks
+        :return: float
+        """
+        spec = self._instruments.get(instrument)
+        return spec.to_price(price) if spec is not None and price is not None else price
+
+    def new_order(self,
+                  client_id: str,
+                  instrument: str,
+                  order_type: OrderType,
+                  side: Side,
+                  total_quantity: int,
+                  price: float = None,
+                  iceberg_flag: bool = False,
+                  displayed_quantity: int = None,
+                  fok_flag: bool = False,
+                  stop_flag: bool = False,
+                  trigger_price: float = None,
+                  time_in_force: TimeInForce = TimeInForce.GTC,
+                  expire_time: int = None) -> Order:
+        """
+        Creates the order from outside world parameters. For instruments with a spec the quantities are validated
+        against the lot size and the prices are checked against the price band and converted to ticks.
+        The expiry time of GTD orders is given in nanoseconds of the engine's clock
+
+        :return: Order ready to be matched by the engine
+        """
+        if self._journal is not None:
+            # Symbols have to fit the journal records, checked before the order can change the OrderBook
+            codec.check_symbol(client_id)
+            codec.check_symbol(instrument)
+        spec = self._instruments.get(instrument)
+        if spec is not None:
+            spec.check_quantity(total_quantity)
+            if iceberg_flag and displayed_quantity is not None:
+                spec.check_quantity(displayed_quantity)
+            if price is not None:
+                price = spec.to_ticks(price)
+                spec.check_price(price)
+            if trigger_price is not None:
+                trigger_price = spec.to_ticks(trigger_price)
+
+        create = self._pool.acquire if self._pool is not None else Order
+        return create(client_id,
+                      instrument,
+                      order_type,
+                      side,
+                      total_quantity,
+                      price,
+                      iceberg_flag,
+                      displayed_quantity,
+                      fok_flag,
+                      stop_flag,
+                      trigger_price,
+                      time_in_force,
+                      expire_time)
+
+    def match_order(self, order: Order) -> ExecutionReport:
         """
         Main matching function
 
         :param order: New order reaching the engine
+        :return: ExecutionReport
         """
+        latency = self._latency
+        if latency is not None:
+            start = perf_counter_ns()
         # Check if OrderBook for given instrument is already in place, if not create one
+        book = self._orderbooks.get(order.instrument)
+        if book is None:
+            book = self._create_book(order.instrument)
+        if latency is not None:
+            latency.record(BOOK, order, perf_counter_ns() - start)
+        timestamp = self._clock.now()
+        if self._journal is not None:
+            self._journal.record_order(order, timestamp)
+        if timestamp >= self._expiries.next_expiry:
+            self._expire(timestamp)
+        report = self._process(order, book, timestamp)
+        if self._feed is not None:
+            self._feed.publish(book, self._sequence)
+        return report
+
+    def match_orders(self, orders, trade_counts: list = None) -> list:
+        """
+        Batch matching function, processes the orders in strict arrival order with the same results as matching them
+        one by one, while the per-order overhead (method and OrderBook lookups, result building) is paid once per batch
+
+        :param orders: Iterable of Order objects or order records, i.e. tuples or dicts of the new_order parameters
+        :param trade_counts: Optional list the trade count after each order is appended to, splits the trade stream
+                             by the orders, including the trades of the stop orders they triggered
+        :return: list of ExecutionReports, one per order. Invalid records get a REJECTED report
+        """
+        books = self._orderbooks
+        new_order = self.new_order
+        match = self._process
+        now = self._clock.now
+        journal = self._journal
+        feed = self._feed
+        latency = self._latency
+        expiries = self._expiries
+        reports = []
+        append = reports.append
+        tape = self._trades
+        count = trade_counts.append if trade_counts is not None else None
+
+        for record in orders:
+            if isinstance(record, Order):
+                order = record
+            else:
+                try:
+                    order = new_order(**record) if isinstance(record, dict) else new_order(*record)
+                except (AssertionError, ValueError, TypeError) as error:
+                    append(ExecutionReport(None, OrderStatus.REJECTED, 0, 0, reason=str(error)))
+                    if count is not None:
+                        count(tape.count)
+                    continue
+
+            if latency is not None:
+                start = perf_counter_ns()
+            book = books.get(order.instrument)
+            if book is None:
+                book = self._create_book(order.instrument)
+            if latency is not None:
+                latency.record(BOOK, order, perf_counter_ns() - start)
+            timestamp = now()
+            if journal is not None:
+                try:
+                    journal.record_order(order, timestamp)
+                except ValueError as error:
+                    # Order objects created outside new_order may not fit the journal records
+                    append(ExecutionReport(order.id, OrderStatus.REJECTED, 0, 0, reason=str(error)))
+                    if count is not None:
+                        count(tape.count)
+                    continue
+            if timestamp >= expiries.next_expiry:
+                self._expire(timestamp)
+            append(match(order, book, timestamp))
+            if count is not None:
+                count(tape.count)
+            if feed is not None:
+                feed.publish(book, self._sequence)
+
+        return reports
+
+    def _create_book(self, instrument: str) -> OrderBook:
+        book = self._orderbooks[instrument] = OrderBook(instrument, spec=self._instruments.get(instrument),
+                                                        client_orders=self._client_orders)
+        if self._feed is not None:
+            book.track_changes()
+        return book
+
+    def _process(self, order: Order, book: OrderBook, timestamp: int) -> ExecutionReport:
+        """
+        Matches the inbound order and the stop orders triggered by its trades. Stops deferred by the cascade limit
+        are matched first, they were triggered before the order arrived
+
+        :param order: Inbound order
+        :param book: OrderBook of the order's instrument
+        :param timestamp: Clock time of the inbound event, shared by all stop orders it triggers
+        :return: ExecutionReport of the inbound order
+        """
+        instrument = order.instrument
+        if instrument in self._auctions:
+            return self._collect(order, book, timestamp)
+        limit = self._stop_cascade_limit
+        if instrument in self._deferred_stops:
+            limit = self._cascade(book, deque((stop, 1) for stop in self._deferred_stops.pop(instrument)),
+                                  timestamp, limit)
+
+        report = self._match(order, book, timestamp)
+
+        # If anything traded, check if any stop order was triggered
+        if report.filled_quantity:
+            latency = self._latency
+            if latency is not None:
+                start = perf_counter_ns()
+            triggered = self._triggered_stops(instrument, self._trades.last_price(instrument), order.side)
+            if triggered:
+                self._cascade(book, deque((stop, 1) for stop in triggered), timestamp, limit)
+            if latency is not None:
+                latency.record(STOPS, order, perf_counter_ns() - start)
+        return report
+
+    def _cascade(self, book: OrderBook, queue: deque, timestamp: int, limit: int = None):
+        """
+        Matches the triggered stop orders one by one from the work queue. Stops triggered by a stop's trades are
+        matched before the remaining ones (depth first), i.e. in the order a recursive cascade would match them
+
+        :param book: OrderBook of the stops' instrument
+        :param queue: deque of (stop order, depth) tuples in the trigger priority
+        :param timestamp: Clock time of the inbound event
+        :param limit: Maximum number of stops to be matched, the remaining ones are deferred. None for no limit
+        :return: Number of stops the event may still match, None for no limit
+        """
+        start = perf_counter_ns()
+        instrument = book.instrument
+        fired = max_depth = deferred = 0
+        while queue:
+            if limit is not None and fired == limit:
+                deferred = len(queue)
+                self._deferred_stops.setdefault(instrument, deque()).extend(stop for stop, _ in queue)
+                break
+            stop, depth = queue.popleft()
+            stop.deactivate_stop_flag()
+            fired += 1
+            if depth > max_depth:
+                max_depth = depth
+            if self._match(stop, book, timestamp).filled_quantity:
+                triggered = self._triggered_stops(instrument, self._trades.last_price(instrument), stop.side)
+                queue.extendleft((triggered_stop, depth + 1) for triggered_stop in reversed(triggered))
+
+        self._cascade_stats.record(fired, max_depth, deferred, perf_counter_ns() - start)
+        return None if limit is None else limit - fired
+
+    def _match(self, order: Order, book: OrderBook, timestamp: int) -> ExecutionReport:
+        """
+        Matches the order against its instrument's OrderBook, the stops it triggers are matched by _process
+
+        :param order: Order to be matched
+        :param book: OrderBook of the order's instrument
+        :param timestamp: Clock time of the inbound event, shared by all stop orders it triggers
+        :return: ExecutionReport
+        """
+        # Stamp the arriving order, its sequence number defines the time priority
+        self._sequence += 1
+        order.update_timestamp(self._sequence, timestamp)
         instr = order.instrument
-        if instr not in self._orderbooks:
-            self._orderbooks[instr] = OrderBook(instr)
+        quantity = order.total_quantity
+        latency = self._latency
 
-        filled = 0
-        cleared_levels = []
+        # Good-Till-Date order which expired before it could work, e.g. a stop order triggered after its expiry
+        time_in_force = order.time_in_force
+        if time_in_force == TimeInForce.GTD and order.expire_time <= timestamp:
+            if self._pool is not None:
+                self._pool.release(order)
+            return ExecutionReport(order.id, OrderStatus.EXPIRED, 0, 0)
 
         # If the order is a STOP order, don't add it to OrderBook but save it in a queue where it would be waiting for a trigger price to trade
         if order.stop_flag:
             self.add_stop(order)
+            if time_in_force != TimeInForce.GTC:
+                self.track_expiry(order)
+            return ExecutionReport(order.id, OrderStatus.PENDING, 0, quantity)
 
-        elif order.side == Side.BUY:
-
-            for ask in self._orderbooks[instr].asks:
-
-                # Not enough quantity to fill the whole Fill or Kill order
-                if order.fok_flag and self.orderbooks[order.instrument].get_levels_quantity(Side.SELL, order.price) < order.total_quantity:
-                    break
-
-                # Existing price is too high, stop filling and work the full/remaining qty
-                if ask.price > order.price:
-                    break
-
-                # Order was filled completely
-                if filled == order.total_quantity:
-                    break
-
-                # Whole level gets filled
-                if ask.total_quantity <= order.total_quantity - filled:
-                    filled += ask.total_quantity
-                    trade = Trade(trade_id=f'c{self.__counter:06}',
-                                  client_id=order.client_id,
-                                  instrument=order.instrument,
-                                  price=ask.price,
-                                  quantity=ask.total_quantity,
-                                  order_id_b=order.order_id,
-                                  order_id_a=ask.order_id)
-                    cleared_levels.append(ask)
-                    self._trades.append(trade)
-
-                # Not the whole level gets filled
-                elif ask.total_quantity > order.total_quantity - filled:
-                    size_traded = order.total_quantity - filled
-                    filled += size_traded
-                    trade = Trade(trade_id='t' + str(self.__counter),
-                                  client_id=order.client_id,
-                                  instrument=order.instrument,
-                                  price=ask.price,
-                                  quantity=size_traded,
-                                  order_id_b=order.order_id,
-                                  order_id_a=ask.order_id)
-                    self._trades.append(trade)
-
-                    ask.total_quantity -= size_traded
-
-                    # Special logic for passive iceberg orders to have the proper qty displayed in the OrderBook
-                    if ask.iceberg_flag is True:
-                        if size_traded < ask.show_quantity:
-                            ask.show_quantity -= size_traded
-                        else:
-                            qty = size_traded - ask.displayed_quantity
-                            ask.show_quantity -= qty
-                    else:
-                        ask.show_quantity -= size_traded
-
-                self.__counter += 1
-
-            # Not the whole order was filled, add the remaining quantity to the OrderBook
-            if filled < order.total_quantity and not order.fok_flag and order.order_type == OrderType.LIMIT:
-                order.total_quantity -= filled
-                order.displayed_quantity = order.displayed_quantity if order.iceberg_flag is False or order.displayed_quantity <= order.total_quantity else order.total_quantity
-
-                # Special logic for aggressive iceberg orders to have the proper qty displayed in the OrderBook
-                if order.iceberg_flag and filled:
-                    if filled < order.show_quantity:
-                        order.show_quantity -= filled
-                    else:
-                        order.show_quantity = order.total_quantity % order.displayed_quantity
-                else:
+        if order.side == Side.BUY:
+            passive_side = book.ask_side
+        else:
+            passive_side = book.bid_side
+
+        # Not enough quantity to fill the whole Fill or Kill order
+        if order.fok_flag:
+            if latency is not None:
+                start = perf_counter_ns()
+            available = passive_side.quantity_to(order.price, limit=quantity)
+            if latency is not None:
+                latency.record(FOK_CHECK, order, perf_counter_ns() - start)
+            if available < quantity:
+                if self._pool is not None:
+                    self._pool.release(order)
+                return ExecutionReport(order.id, OrderStatus.KILLED, 0, 0)
+
+        if latency is not None:
+            start = perf_counter_ns()
+            removing = 0
+        first_trade = self._trades.count + 1
+        filled = 0
+        while filled < order.total_quantity:
+            level = passive_side.best_level()
+            if level is None:
+                break
+
+            # Existing price is worse than the order's limit, stop filling and work the full/remaining qty
+            if (order.side == Side.BUY and level.price > order.price) or \
+                    (order.side == Side.SELL and level.price < order.price):
+                break
+
+            # Orders at the level are filled in the time priority
+            passive = level.head
+            size_traded = min(passive.total_quantity, order.total_quantity - filled)
+            filled += size_traded
+            self._trades.append(instr,
+                                order.client_id,
+                                passive.price,
+                                size_traded,
+                                order.id if order.side == Side.BUY else passive.id,
+                                passive.id if order.side == Side.BUY else order.id,
+                                order.timestamp,
+                                passive.client_id,
+                                order.side)
+            self._positions.trade(instr,
+                                  passive.price,
+                                  size_traded,
+                                  order.client_id if order.side == Side.BUY else passive.client_id,
+                                  passive.client_id if order.side == Side.BUY else order.client_id)
+
+            # Whole passive order gets filled, remove it from the OrderBook
+            if size_traded == passive.total_quantity:
+                if latency is not None:
+                    removed = perf_counter_ns()
+                passive_side.remove(passive)
+                if latency is not None:
+                    removed = perf_counter_ns() - removed
+                    removing += removed
+                    latency.record(REMOVE, order, removed)
+                if self._pool is not None:
+                    self._pool.release(passive)
+
+            # Not the whole passive order gets filled
+            else:
+                passive_side.fill(passive, size_traded)
+
+        if latency is not None:
+            latency.record(SWEEP, order, perf_counter_ns() - start - removing)
+
+        # Not the whole order was filled, add the remaining quantity to the OrderBook unless it's Immediate-Or-Cancel
+        if filled < order.total_quantity and not order.fok_flag and order.order_type == OrderType.LIMIT and \
+                time_in_force != TimeInForce.IOC:
+            order.total_quantity -= filled
+            order.displayed_quantity = order.displayed_quantity if order.iceberg_flag is False or order.displayed_quantity <= order.total_quantity else order.total_quantity
+
+            # Special logic for aggressive iceberg orders to have the proper qty displayed in the OrderBook
+            if order.iceberg_flag and filled:
+                if filled < order.show_quantity:
                     order.show_quantity -= filled
+                else:
+                    order.show_quantity = order.total_quantity % order.displayed_quantity
+            else:
+                order.show_quantity -= filled
+
+            if latency is not None:
+                start = perf_counter_ns()
+            book.add_order(order)
+            if latency is not None:
+                latency.record(INSERT, order, perf_counter_ns() - start)
+            if time_in_force != TimeInForce.GTC:
+                self.track_expiry(order)
+            report = ExecutionReport(order.id,
+                                     OrderStatus.PARTIALLY_FILLED if filled else OrderStatus.NEW,
+                                     filled,
+                                     order.total_quantity,
+                                     range(first_trade, self._trades.count + 1))
+        else:
+            report = ExecutionReport(order.id,
+                                     OrderStatus.FILLED if filled == quantity else OrderStatus.KILLED,
+                                     filled,
+                                     0,
+                                     range(first_trade, self._trades.count + 1))
+            if self._pool is not None:
+                self._pool.release(order)
+
+        return report
+
+    def cancel_order(self, instrument: str, order_id):
+        """
+        Cancels the order working in the OrderBook or waiting in the stop queue
+
+        :param instrument: Instrument of the order
+        :param order_id: ID of the order to be cancelled
+        :return: Cancelled Order, or None if the order is unknown
+        """
+        if self._journal is not None:
+            self._journal.record_cancel(instrument, order_id)
+        book = self._orderbooks.get(instrument)
+        order = book.cancel_order(order_id) if book is not None else None
+        if order is None:
+            # The order might still be waiting for its trigger price in one of the stop queues
+            for stops in (self._stop_bids, self._stop_asks):
+                if instrument in stops:
+                    order = stops[instrument].cancel(order_id)
+                    if order is not None:
+                        break
+            if order is None and instrument in self._deferred_stops:
+                order = self._cancel_deferred(instrument, order_id)
+        elif self._feed is not None:
+            self._feed.publish(book, self._sequence)
+        if order is not None and self._pool is not None:
+            self._pool.release(order)
+        return order
+
+    def mass_cancel(self,
+                    client_id: str = None,
+                    instrument: str = None,
+                    side: Side = None,
+                    min_price: float = None,
+                    max_price: float = None,
+                    stops: bool = True) -> list:
+        """
+        Cancels the working orders of the client (optionally only in one instrument), or all orders of the instrument
+        within the price range, e.g. when the client disconnects. The orders are found through the client index or
+        the price levels within the range, so the cost grows with the number of cancelled orders, not with the size
+        of the OrderBooks. The client's stop orders are found through the client index of the stop queues as well,
+        the stop orders of an instrument by scanning its stop queues
+
+        :param client_id: Client whose orders are cancelled
+        :param instrument: Instrument whose orders are cancelled, required if no client is given
+        :param side: Only the orders of this side are cancelled if given
+        :param min_price: Only the orders priced at or above it are cancelled if given
+        :param max_price: Only the orders priced at or below it are cancelled if given
+        :param stops: Whether the stop orders waiting for their trigger price (or deferred by the cascade limit)
+                      are cancelled too, the price range applies to their trigger prices
+        :return: list of cancelled Orders
+        """
+        assert client_id is not None or instrument is not None, 'Mass cancel needs a client or an instrument'
+        if client_id is not None:
+            instruments = self._client_orders.get(client_id, {})
+            if instrument is not None:
+                names = [instrument]
+            elif stops:
+                # Deferred stops are only kept until the instrument's next inbound order, their queues are short
+                names = list(dict.fromkeys([*instruments, *self._client_stops.get(client_id, {}),
+                                            *self._deferred_stops]))
+            else:
+                names = list(instruments)
+            groups = [(name, list(instruments.get(name, {}).values())) for name in names]
+        else:
+            groups = [(instrument, None)]
+
+        cancelled = []
+        for name, orders in groups:
+            book = self._orderbooks.get(name)
+            low, high = self._price_range(name, min_price, max_price)
+            if orders is None:
+                orders = [order for book_side in (book.bid_side, book.ask_side)
+                          if side is None or book_side.side == side
+                          for order in book_side.orders_between(low, high)] if book is not None else []
+            elif side is not None or low is not None or high is not None:
+                orders = [order for order in orders if (side is None or order.side == side) and
+                          (low is None or order.price >= low) and (high is None or order.price <= high)]
+            if orders:
+                for order in orders:
+                    if self._journal is not None:
+                        self._journal.record_cancel(name, order.id)
+                    book.remove_order(order)
+                    if self._pool is not None:
+                        self._pool.release(order)
+                cancelled.extend(orders)
+                if self._feed is not None:
+                    self._feed.publish(book, self._sequence)
+            if stops:
+                cancelled.extend(self._cancel_stops(name, client_id, side, low, high))
+        return cancelled
+
+    def _cancel_stops(self, instrument: str, client_id: str, side: Side, low, high) -> list:
+        """Cancels the instrument's queued and deferred stop orders matching the mass cancel's filters"""
+        def matches(order: Order) -> bool:
+            return (client_id is None or order.client_id == client_id) and (side is None or order.side == side) and \
+                (low is None or order.trigger_price >= low) and (high is None or order.trigger_price <= high)
+
+        if client_id is not None:
+            queued = list(self._client_stops.get(client_id, {}).get(instrument, {}).values())
+        else:
+            queued = [order for queues in (self._stop_bids, self._stop_asks) if instrument in queues
+                      for order in queues[instrument]]
+        cancelled = []
+        for order in queued:
+            if matches(order):
+                (self._stop_bids if order.side == Side.BUY else self._stop_asks)[instrument].cancel(order.id)
+                cancelled.append(order)
+        deferred = self._deferred_stops.get(instrument)
+        if deferred:
+            kept = deque(order for order in deferred if not matches(order))
+            cancelled.extend(order for order in deferred if matches(order))
+            if kept:
+                self._deferred_stops[instrument] = kept
+            else:
+                del self._deferred_stops[instrument]
+
+        for order in cancelled:
+            if self._journal is not None:
+                self._journal.record_cancel(instrument, order.id)
+            if self._pool is not None:
+                self._pool.release(order)
+        return cancelled
+
+    def _price_range(self, instrument: str, min_price: float, max_price: float) -> tuple:
+        """Converts the price range to the engine's units, rounded inwards to whole ticks"""
+        spec = self._instruments.get(instrument)
+        if spec is None:
+            return min_price, max_price
+        return (None if min_price is None else math.ceil(min_price / spec.tick_size - 1e-6),
+                None if max_price is None else math.floor(max_price / spec.tick_size + 1e-6))
+
+    def modify_order(self, instrument: str, order_id, price: float, quantity: int, displayed_quantity: int = None):
+        """
+        Modifies the price and/or quantity of the order working in the OrderBook. If the new price crosses
+        the opposite side of the book, the order is matched the same way a new order would be
+
+        :param instrument: Instrument of the order
+        :param order_id: ID of the order to be modified
+        :param price: New order price
+        :param quantity: New order quantity
+        :param displayed_quantity: New displayed quantity (applicable only to Iceberg orders)
+        :return: Modified Order, or None if the order is unknown
+        """
+        timestamp = self._clock.now()
+        if self._journal is not None:
+            self._journal.record_modify(instrument, order_id, price, quantity, displayed_quantity, timestamp)
+        if timestamp >= self._expiries.next_expiry:
+            self._expire(timestamp)
+        book = self._orderbooks.get(instrument)
+        if book is None:
+            return None
+        order = book.get_order(order_id)
+        if order is None:
+            return None
+
+        spec = self._instruments.get(instrument)
+        if spec is not None:
+            spec.check_quantity(quantity)
+            price = spec.to_ticks(price)
+            spec.check_price(price)
+
+        # During an auction the order keeps waiting for the uncross even if it crosses the OrderBook
+        if instrument not in self._auctions and \
+                ((order.side == Side.BUY and price >= book.best_ask_price()) or
+                 (order.side == Side.SELL and price <= book.best_bid_price())):
+            book.remove_order(order)
+            order.modify(price, quantity, displayed_quantity)
+            self._process(order, book, timestamp)
+        else:
+            order = book.modify_order(order_id, order.side, price, quantity, displayed_quantity)
+            # The order loses its priority, stamp it as if it just arrived
+            self._sequence += 1
+            order.update_timestamp(self._sequence, timestamp)
+
+        if self._feed is not None:
+            self._feed.publish(book, self._sequence)
+        return order
+
+    def start_auction(self, instrument: str):
+        """
+        Switches the instrument to the call auction phase (e.g. the opening, the closing or a halt). From now on
+        its LIMIT orders rest in the OrderBook without matching until end_auction uncrosses it, so the OrderBook
+        may be crossed. STOP orders wait for the trigger price as usual, MARKET, Fill-or-Kill and
+        Immediate-or-Cancel orders are rejected
+
+        :param instrument: Instrument entering the auction
+        """
+        if self._journal is not None:
+            self._journal.record_auction(instrument, True, self._clock.now())
+        self._auctions.add(instrument)
+
+    def end_auction(self, instrument: str) -> AuctionResult:
+        """
+        Uncrosses the instrument's OrderBook at its equilibrium price (see auction_price) and resumes the continuous
+        trading. The crossed orders execute in their price-time priority, all at the single uncross price,
+        afterwards the stop orders triggered by the price are matched
+
+        :param instrument: Instrument in the auction phase
+        :return: AuctionResult
+        """
+        assert instrument in self._auctions, f'{instrument} is not in the auction phase'
+        timestamp = self._clock.now()
+        if self._journal is not None:
+            self._journal.record_auction(instrument, False, timestamp)
+        if timestamp >= self._expiries.next_expiry:
+            self._expire(timestamp)
+        self._auctions.discard(instrument)
+
+        book = self._orderbooks.get(instrument)
+        uncross = self.auction_price(instrument)
+        if uncross is None:
+            return AuctionResult(instrument, None, 0, 0)
+        price, volume, imbalance = uncross
+        first_trade = self._trades.count + 1
+        self._uncross(book, price, volume, timestamp)
+        result = AuctionResult(instrument, price, volume, imbalance, range(first_trade, self._trades.count + 1))
+
+        triggered = self._triggered_stops(instrument, price, Side.BUY if imbalance >= 0 else Side.SELL)
+        if triggered:
+            self._cascade(book, deque((stop, 1) for stop in triggered), timestamp, self._stop_cascade_limit)
+        if self._feed is not None:
+            self._feed.publish(book, self._sequence)
+        return result
+
+    def auction_price(self, instrument: str):
+        """
+        Computes the equilibrium price the instrument's OrderBook would uncross at, i.e. the indicative auction price.
+        Only the crossed price levels are read, the price is found in one vectorized pass over their cumulative
+        quantities (see engine.src.auction), with the last traded price as the reference
+
+        :param instrument: Instrument of the OrderBook
+        :return: tuple (price, volume, imbalance), or None if the OrderBook is not crossed
+        """
+        book = self._orderbooks.get(instrument)
+        if book is None:
+            return None
+        # Only the best levels are looked at, the order lists of the sides are never built
+        bid_level, ask_level = book.bid_side.best_level(), book.ask_side.best_level()
+        if bid_level is None or ask_level is None or bid_level.price < ask_level.price:
+            return None
+        best_bid, best_ask = bid_level.price, ask_level.price
+        bid_prices, bid_quantities, ask_prices, ask_quantities = [], [], [], []
+        for level in book.bid_side.levels():
+            if level.price < best_ask:
+                break
+            bid_prices.append(level.price)
+            bid_quantities.append(level.total_quantity)
+        for level in book.ask_side.levels():
+            if level.price > best_bid:
+                break
+            ask_prices.append(level.price)
+            ask_quantities.append(level.total_quantity)
+        return equilibrium(bid_prices, bid_quantities, ask_prices, ask_quantities, self._trades.last_price(instrument))
+
+    def _collect(self, order: Order, book: OrderBook, timestamp: int) -> ExecutionReport:
+        """Adds the order arriving during the auction to the OrderBook without matching it"""
+        self._sequence += 1
+        order.update_timestamp(self._sequence, timestamp)
+        # Orders which could only execute immediately, the STOP orders among them wait for their trigger price
+        if not order.stop_flag and (order.order_type == OrderType.MARKET or order.fok_flag or
+                                    order.time_in_force == TimeInForce.IOC):
+            if self._pool is not None:
+                self._pool.release(order)
+            return ExecutionReport(order.id, OrderStatus.REJECTED, 0, 0,
+                                   reason='Order type is not accepted during the auction')
+        if order.time_in_force == TimeInForce.GTD and order.expire_time <= timestamp:
+            if self._pool is not None:
+                self._pool.release(order)
+            return ExecutionReport(order.id, OrderStatus.EXPIRED, 0, 0)
+
+        if order.stop_flag:
+            self.add_stop(order)
+            status = OrderStatus.PENDING
+        else:
+            book.add_order(order)
+            status = OrderStatus.NEW
+        if order.time_in_force != TimeInForce.GTC:
+            self.track_expiry(order)
+        return ExecutionReport(order.id, status, 0, order.total_quantity)
 
-                self._orderbooks[instr].add_order(order)
-
-            # Remove all traded orders from the OrderBook
-            for ask in cleared_levels:
-                self._orderbooks[instr].remove_order(ask)
-
-            # If anything traded, check if any stop order was triggered, if yes call the matching engine
-            if filled:
-                stop_orders = self.get_stops(instrument=order.instrument,
-                                             price=self.get_last_trade_price(),
-                                             side=order.side)
-                for stp_ord in stop_orders:
-                    stp_ord.deactivate_stop_flag()
-                    self.match_order(stp_ord)
-
-        elif order.side == Side.SELL:
-            for bid in self._orderbooks[instr].bids:
-
-                # Not enough quantity to fill the whole Fill or Kill order
-                if order.fok_flag and self.orderbooks[order.instrument].get_levels_quantity(Side.BUY, order.price) < order.total_quantity:
-                    break
-
-                # Existing price is too high, stop filling and work the full/remaining qty
-                if bid.price < order.price:
-                    break
-
-                # Order was filled completely
-                if filled == order.total_quantity:
-                    break
-
-                # Whole level gets filled
-                if bid.total_quantity <= order.total_quantity - filled:
-                    filled += bid.total_quantity
-                    trade = Trade(trade_id='t' + str(self.__counter),
-                                  client_id=order.client_id,
-                                  instrument=order.instrument,
-                                  price=bid.price,
-                                  quantity=bid.total_quantity,
-                                  order_id_b=bid.order_id,
-                                  order_id_a=order.order_id)
-                    cleared_levels.append(bid)
-                    self._trades.append(trade)
-
-                # Not the whole level gets filled
-                elif bid.total_quantity > order.total_quantity - filled:
-                    size_traded = order.total_quantity - filled
-                    filled += size_traded
-                    trade = Trade(trade_id='t' + str(self.__counter),
-                                  client_id=order.client_id,
-                                  instrument=order.instrument,
-                                  price=bid.price,
-                                  quantity=size_traded,
-                                  order_id_b=bid.order_id,
-                                  order_id_a=order.order_id)
-                    self._trades.append(trade)
-
-                    bid.total_quantity -= size_traded
-
-                    # Special logic for iceberg orders to have the proper qty displayed in the OrderBook
-                    if bid.iceberg_flag is True:
-                        if size_traded < bid.show_quantity:
-                            bid.show_quantity -= size_traded
-                        else:
-                            qty = size_traded - bid.displayed_quantity
-                            bid.show_quantity -= qty
-                    else:
-                        bid.show_quantity -= size_traded
-
-            self.__counter += 1
-
-            # Not the whole order was filled, add the remaining quantity to the OrderBook
-            if filled < order.total_quantity and not order.fok_flag and order.order_type == OrderType.LIMIT:
-                order.total_quantity -= filled
-                order.displayed_quantity = order.displayed_quantity if order.iceberg_flag is False or order.displayed_quantity <= order.total_quantity else order.total_quantity
-
-                # Special logic for aggressive iceberg orders to have the proper qty displayed in the OrderBook
-                if order.iceberg_flag and filled:
-                    if filled < order.show_quantity:
-                        order.show_quantity -= filled
-                    else:
-                        order.show_quantity = order.total_quantity % order.displayed_quantity
+    def _uncross(self, book: OrderBook, price, volume: int, timestamp: int):
+        """
+        Executes the given volume of the crossed orders at the uncross price. The order which arrived later
+        is recorded as the attacking one of each trade
+        """
+        instrument = book.instrument
+        bids, asks = book.bid_side, book.ask_side
+        while volume:
+            bid, ask = bids.best_level().head, asks.best_level().head
+            quantity = min(bid.total_quantity, ask.total_quantity, volume)
+            volume -= quantity
+            aggressor, passive = (bid, ask) if bid.sequence > ask.sequence else (ask, bid)
+            self._trades.append(instrument,
+                                aggressor.client_id,
+                                price,
+                                quantity,
+                                bid.id,
+                                ask.id,
+                                timestamp,
+                                passive.client_id,
+                                aggressor.side)
+            self._positions.trade(instrument, price, quantity, bid.client_id, ask.client_id)
+            for side, order in ((bids, bid), (asks, ask)):
+                if quantity == order.total_quantity:
+                    side.remove(order)
+                    if self._pool is not None:
+                        self._pool.release(order)
                 else:
-                    order.show_quantity -= filled
+                    side.fill(order, quantity)
+
+    def track_expiry(self, order: Order):
+        """
+        Registers the working GTD order in the expiry timer wheel or the DAY order in its instrument's DAY orders,
+        also used to restore the expiries of the orders loaded from a snapshot
+
+        :param order: Order resting in the OrderBook or waiting in a stop queue
+        """
+        if order.time_in_force == TimeInForce.GTD:
+            self._expiries.schedule(order.expire_time, (order.id, order))
+        elif order.time_in_force == TimeInForce.DAY:
+            self._day_orders.setdefault(order.instrument, []).append((order.id, order))
+
+    def expire_orders(self) -> list:
+        """
+        Expires the GTD orders whose expiry time the engine's clock reached. Inbound orders and modifications expire
+        them before they're processed, so this is only needed to expire them while no orders arrive
+
+        :return: list of expired Orders
+        """
+        return self._expire(self._clock.now())
+
+    def _expire(self, timestamp: int) -> list:
+        """
+        Removes the GTD orders which fired in the expiry timer wheel, entries of the orders which have been filled or
+        cancelled in the meantime are skipped. Each expiry is journaled as a cancel, so a replay ending before the
+        replayed clock reaches the expiry time expires the order as well
+        """
+        expired = []
+        for order_id, order in self._expiries.advance(timestamp):
+            if self._remove_expired(order_id, order):
+                if self._journal is not None:
+                    self._journal.record_cancel(order.instrument, order_id)
+                expired.append(order)
+        if expired and self._feed is not None:
+            for instrument in {order.instrument for order in expired}:
+                if instrument in self._orderbooks:
+                    self._feed.publish(self._orderbooks[instrument], self._sequence)
+        return expired
+
+    def expire_day(self, instrument: str = None) -> list:
+        """
+        Expires all DAY orders of the instrument at the end of its trading day, in bulk from the instrument's DAY
+        orders without searching the OrderBook. Each expiry is journaled as a cancel
+
+        :param instrument: Instrument whose trading day ended, all instruments if not given
+        :return: list of expired Orders
+        """
+        instruments = [instrument] if instrument is not None else list(self._day_orders)
+        expired = []
+        for name in instruments:
+            orders = []
+            for order_id, order in self._day_orders.pop(name, ()):
+                if self._remove_expired(order_id, order):
+                    if self._journal is not None:
+                        self._journal.record_cancel(name, order_id)
+                    orders.append(order)
+            expired.extend(orders)
+            if orders and self._feed is not None and name in self._orderbooks:
+                self._feed.publish(self._orderbooks[name], self._sequence)
+        return expired
 
-                self._orderbooks[instr].add_order(order)
+    def _is_working(self, order: Order) -> bool:
+        """Checks if the order still rests in its OrderBook or waits in its stop queue"""
+        if order.stop_flag:
+            stops = (self._stop_bids if order.side == Side.BUY else self._stop_asks).get(order.instrument)
+            return stops is not None and stops.get_order(order.id) is order
+        book = self._orderbooks.get(order.instrument)
+        return book is not None and book.get_order(order.id) is order
 
-            # Remove all traded orders from the OrderBook
-            for bid in cleared_levels:
-                self._orderbooks[instr].remove_order(bid)
+    def _remove_expired(self, order_id: int, order: Order) -> bool:
+        """
+        Removes the expired order if it's still working. Orders re-used by the pool carry a new ID
 
-            # If anything traded check if any stop order was triggered, if yes call the matching engine
-            if filled:
-                stop_orders = self.get_stops(instrument=order.instrument,
-                                             price=self.get_last_trade_price(),
-                                             side=order.side)
-                for stp_ord in stop_orders:
-                    stp_ord.deactivate_stop_flag()
-                    self.match_order(stp_ord)
+        :return: bool, False if the order was already filled or cancelled
+        """
+        if order.id != order_id or not self._is_working(order):
+            return False
+        if order.stop_flag:
+            (self._stop_bids if order.side == Side.BUY else self._stop_asks)[order.instrument].cancel(order_id)
+        else:
+            self._orderbooks[order.instrument].remove_order(order)
+        if self._pool is not None:
+            self._pool.release(order)
+        return True
 
     def add_stop(self, order: Order):
         """
@@ -222,70 +966,114 @@ class MatchingEngine:
 
         :param order: Stop order to be added to the queue
         """
+        stops = self._stop_bids if order.side == Side.BUY else self._stop_asks
+        if order.instrument not in stops:
+            stops[order.instrument] = StopBook(order.instrument, order.side, client_stops=self._client_stops)
+        stops[order.instrument].add(order)
+        self._stop_checks.pop(order.instrument, None)
 
-        if order.side == Side.BUY:
-            if order.instrument in self._stop_bids:
-                self._stop_bids[order.instrument].append(order)
-                self._stop_bids[order.instrument].sort(key=lambda elem: (elem.trigger_price, elem.timestamp))
-
-            else:
-                self._stop_bids[order.instrument] = [order]
-        elif order.side == Side.SELL:
-            if order.instrument in self._stop_asks:
-                self._stop_asks[order.instrument].append(order)
-                self._stop_asks[order.instrument].sort(key=lambda elem: (-elem.trigger_price, elem.timestamp))
+    def _cancel_deferred(self, instrument: str, order_id):
+        deferred = self._deferred_stops[instrument]
+        key = order_key(order_id)
+        for idx, order in enumerate(deferred):
+            if order.id == key:
+                del deferred[idx]
+                if not deferred:
+                    del self._deferred_stops[instrument]
+                return order
+        return None
 
-            else:
-                self._stop_asks[order.instrument] = [order]
+    def _triggered_stops(self, instrument: str, price: float, side: Side) -> list:
+        """
+        Gets the stops triggered by the traded price. The stop queues are only searched when the price changed
+        or new stops arrived since the last search, otherwise nothing new could have been triggered
+        """
+        if self._stop_checks.get(instrument) == price:
+            return []
+        self._stop_checks[instrument] = price
+        return self.get_stops(instrument, price, side)
 
     def get_stops(self, instrument: str, price: float, side: Side) -> list:
         """
-        Method used to search the stop queues for any orders that got triggered and return them to the main engine
+        Method used to search the stop queues of both sides for any orders that got triggered and return them to the main engine
 
         :param instrument: Most recently traded instrument
         :param price: Most recently traded price
-        :param side: Attacking order's side
+        :param side: Attacking order's side, stops on this side are returned first
         :return: list
         """
         triggered_stops = []
+        for stops in ((self._stop_bids, self._stop_asks) if side == Side.BUY else (self._stop_asks, self._stop_bids)):
+            if instrument in stops:
+                triggered_stops.extend(stops[instrument].pop_triggered(price))
+        return triggered_stops
+
+    def get_last_trade_price(self, instrument: str = None):
+        """
+        Method used to get the most recently traded price
 
-        if side == Side.BUY and instrument in self._stop_bids:
-            for stop_order in self._stop_bids[instrument]:
-                if stop_order.trigger_price > price:
-                    break
-                triggered_stops.append(stop_order)
-            # If found anything remove it from queue
-            if triggered_stops:
-                self._stop_bids[instrument] = [elem for elem in self._stop_bids[instrument] if
-                                               elem not in triggered_stops]
-        elif side == Side.SELL and instrument in self._stop_asks:
-            for stop_order in self._stop_asks[instrument]:
-                if stop_order.trigger_price < price:
-                    break
-                triggered_stops.append(stop_order)
-            # If found anything remove it from queue
-            if triggered_stops:
-                self._stop_asks[instrument] = [elem for elem in self._stop_asks[instrument] if
-                                               elem not in triggered_stops]
+        :param instrument: Instrument to get the price for, any instrument if not given
+        """
+        return self._trades.last_price(instrument)
 
-        return triggered_stops
+    def get_order(self, instrument: str, order_id):
+        """
+        Gets the working order resting in the OrderBook or waiting in the stop queues
 
-    def get_last_trade_price(self):
-        """Method used to get the most recently traded price"""
-        try:
-            return self._trades[-1].price
-        except IndexError:
-            return None
+        :param instrument: Instrument of the order
+        :param order_id: ID of the searched order
+        :return: Order, or None if the order is not working (filled, cancelled, expired or unknown)
+        """
+        book = self._orderbooks.get(instrument)
+        order = book.get_order(order_id) if book is not None else None
+        if order is None:
+            for stops in (self._stop_bids, self._stop_asks):
+                if instrument in stops:
+                    order = stops[instrument].get_order(order_id)
+                    if order is not None:
+                        break
+            if order is None and instrument in self._deferred_stops:
+                key = order_key(order_id)
+                order = next((order for order in self._deferred_stops[instrument] if order.id == key), None)
+        return order
+
+    def get_client_orders(self, client_id: str, instrument: str = None) -> list:
+        """
+        Gets the client's working orders from the client index, without scanning the OrderBooks
+
+        :param client_id: Client ID to be searched for
+        :param instrument: Only the orders in this instrument are returned if given
+        :return: list of Orders
+        """
+        instruments = self._client_orders.get(client_id, {})
+        if instrument is not None:
+            return list(instruments.get(instrument, {}).values())
+        return [order for orders in instruments.values() for order in orders.values()]
+
+    def get_position(self, client_id: str, instrument: str):
+        """
+        Gets the client's position in the instrument, see Position
+
+        :param client_id: Client ID to be searched for
+        :param instrument: Instrument of the position
+        :return: Position, or None if the client has not traded the instrument
+        """
+        return self._positions.get(client_id, instrument)
+
+    def get_client_positions(self, client_id: str) -> dict:
+        """
+        Gets the client's positions in all instruments it traded
+
+        :param client_id: Client ID to be searched for
+        :return: dict instrument -> Position
+        """
+        return self._positions.client_positions(client_id)
 
     def get_client_trades(self, searched_id: str) -> list:
         """
-        Method returns all trades performed by the searched client
+        Method returns all trades performed by the searched client, as the attacking or the passive counterparty
 
         :param searched_id: Client ID to be searched for
         :return: list
         """
-        out_trades = []
-        for trade in self._trades:
-            if trade.client_id == searched_id:
-                out_trades.append(trade)
-        return out_trades
+        return self._trades.client_trades(searched_id)
@@ -0,0 +1,110 @@
+"""
+Call auction uncrossing: the single price the crossed orders accumulated during an auction execute at.
+
+The equilibrium price is chosen among the limit prices of the crossed part of the OrderBook by the usual rules:
+1. the largest executable volume,
+2. the smallest surplus (imbalance) left at that price,
+3. market pressure: the highest price if the surplus is on the buy side at all remaining prices, the lowest price
+   if it's on the sell side,
+4. the price closest to the reference price (e.g. the last traded price), the lowest of the remaining prices
+   without a reference.
+
+Cumulative buy and sell curves over the price levels are evaluated for all candidate prices at once with NumPy,
+a pure Python fallback with the same results is used when NumPy is not installed
+"""
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class AuctionResult:
+    """Outcome of the uncross of one instrument's auction, the price is in the engine's units"""
+    __slots__ = ('instrument', 'price', 'volume', 'imbalance', 'trade_numbers')
+
+    def __init__(self, instrument: str, price, volume: int, imbalance: int, trade_numbers: range = range(0)):
+        self.instrument = instrument
+        # Uncross price, None if no orders were crossed
+        self.price = price
+        self.volume = volume
+        # Buy quantity minus sell quantity at the uncross price, i.e. the surplus left unexecuted
+        self.imbalance = imbalance
+        # Numbers of the uncross trades, see MatchingEngine.trades
+        self.trade_numbers = trade_numbers
+
+    def __repr__(self):
+        return f'Instrument: {self.instrument}, Price: {self.price}, Volume: {self.volume}, ' \
+               f'Imbalance: {self.imbalance}'
+
+
+def equilibrium(bid_prices, bid_quantities, ask_prices, ask_quantities, reference=None):
+    """
+    Finds the uncross price of the auction
+
+    :param bid_prices: Prices of the bid levels from the best (highest) to the worst
+    :param bid_quantities: Total quantities of the bid levels
+    :param ask_prices: Prices of the ask levels from the best (lowest) to the worst
+    :param ask_quantities: Total quantities of the ask levels
+    :param reference: Reference price breaking the remaining ties, e.g. the last traded price
+    :return: tuple (price, volume, imbalance), or None if the OrderBook is not crossed
+    """
+    if not len(bid_prices) or not len(ask_prices) or bid_prices[0] < ask_prices[0]:
+        return None
+    if numpy is None:
+        return _equilibrium_python(bid_prices, bid_quantities, ask_prices, ask_quantities, reference)
+
+    # Bids in ascending order, so both sides can be searched
+    bid_prices = numpy.ascontiguousarray(numpy.asarray(bid_prices)[::-1])
+    ask_prices = numpy.asarray(ask_prices)
+    bid_totals = numpy.concatenate(([0], numpy.cumsum(numpy.asarray(bid_quantities, dtype=numpy.int64)[::-1])))
+    ask_totals = numpy.concatenate(([0], numpy.cumsum(numpy.asarray(ask_quantities, dtype=numpy.int64))))
+
+    # Candidate prices are the distinct limit prices within the crossed range. Both sides are sorted already,
+    # a stable sort merges the two runs in linear time
+    prices = numpy.sort(numpy.concatenate((bid_prices, ask_prices)), kind='stable')
+    prices = prices[numpy.concatenate(([True], prices[1:] != prices[:-1]))]
+    prices = prices[(prices >= ask_prices[0]) & (prices <= bid_prices[-1])]
+    # Quantity bid at or above and offered at or below each candidate price
+    buy = bid_totals[-1] - bid_totals[numpy.searchsorted(bid_prices, prices, side='left')]
+    sell = ask_totals[numpy.searchsorted(ask_prices, prices, side='right')]
+    volume = numpy.minimum(buy, sell)
+    imbalance = buy - sell
+
+    surplus = numpy.abs(imbalance)
+    best = volume == volume.max()
+    candidates = numpy.flatnonzero(best & (surplus == surplus[best].min()))
+    if len(candidates) > 1:
+        if (imbalance[candidates] > 0).all():
+            candidates = candidates[-1:]
+        elif reference is not None and not (imbalance[candidates] < 0).all():
+            candidates = candidates[numpy.argmin(numpy.abs(prices[candidates] - reference)):]
+    idx = candidates[0]
+    return prices[idx].item(), int(volume[idx]), int(imbalance[idx])
+
+
+def _equilibrium_python(bid_prices, bid_quantities, ask_prices, ask_quantities, reference):
+    bid_prices = list(bid_prices)[::-1]
+    ask_prices = list(ask_prices)
+    bid_totals = [0, *accumulate(list(bid_quantities)[::-1])]
+    ask_totals = [0, *accumulate(ask_quantities)]
+
+    low, high = ask_prices[0], bid_prices[-1]
+    prices = sorted({price for price in bid_prices if price >= low} | {price for price in ask_prices if price <= high})
+    buy = [bid_totals[-1] - bid_totals[bisect_left(bid_prices, price)] for price in prices]
+    sell = [ask_totals[bisect_right(ask_prices, price)] for price in prices]
+    volume = [min(bought, sold) for bought, sold in zip(buy, sell)]
+    imbalance = [bought - sold for bought, sold in zip(buy, sell)]
+
+    largest = max(volume)
+    smallest = min(abs(imbalance[idx]) for idx in range(len(prices)) if volume[idx] == largest)
+    candidates = [idx for idx in range(len(prices)) if volume[idx] == largest and abs(imbalance[idx]) == smallest]
+    if len(candidates) > 1:
+        if all(imbalance[idx] > 0 for idx in candidates):
+            candidates = candidates[-1:]
+        elif reference is not None and not all(imbalance[idx] < 0 for idx in candidates):
+            candidates = [min(candidates, key=lambda idx: abs(prices[idx] - reference))]
+    idx = candidates[0]
+    return prices[idx], volume[idx], imbalance[idx]
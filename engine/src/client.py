@@ -1,9 +1,8 @@
 """TO BE COMPLETED"""
 
 from engine.matching_engine import MatchingEngine
-from engine.src.order import Order
 from random import randint
-from engine.src.enums import Side, OrderType
+from engine.src.enums import Side, OrderType, TimeInForce
 
 
 class Client:
@@ -13,8 +12,6 @@ class Client:
         self.client_name = client_name
 
         self.working_orders = []
-        self.trade_list = []
-        self.positions = []
 
     @property
     def client_id(self):
@@ -34,21 +31,52 @@ class Client:
                     displayed_quantity: int = None,
                     fok_flag: bool = False,
                     stop_flag: bool = False,
-                    trigger_price: float = None):
-
-        order = Order(self._client_id,
-                      instrument,
-                      order_type,
-                      side,
-                      total_quantity,
-                      price,
-                      iceberg_flag,
-                      displayed_quantity,
-                      fok_flag,
-                      stop_flag,
-                      trigger_price)
+                    trigger_price: float = None,
+                    time_in_force: TimeInForce = TimeInForce.GTC,
+                    expire_time: int = None):
+
+        order = exchange.new_order(self._client_id,
+                                   instrument,
+                                   order_type,
+                                   side,
+                                   total_quantity,
+                                   price,
+                                   iceberg_flag,
+                                   displayed_quantity,
+                                   fok_flag,
+                                   stop_flag,
+                                   trigger_price,
+                                   time_in_force,
+                                   expire_time)
 
         exchange.match_order(order)
 
-        return 0
+        return order.order_id
+
+    def get_trades(self, exchange: MatchingEngine) -> list:
+        """
+        Gets the client's trades on the exchange, including the ones of its passive orders
+
+        :return: list of Trade objects
+        """
+        return exchange.get_client_trades(self._client_id)
+
+    def get_positions(self, exchange: MatchingEngine) -> dict:
+        """
+        Gets the client's positions on the exchange
+
+        :return: dict instrument -> Position
+        """
+        return exchange.get_client_positions(self._client_id)
+
+    def cancel_order(self, exchange: MatchingEngine, instrument: str, order_id: str):
+        """
+        Cancels client's order working in the OrderBook
+
+        :return: Cancelled Order, or None if the order is unknown
+        """
+        order = exchange.orderbooks[instrument].get_order(order_id) if instrument in exchange.orderbooks else None
+        if order is None or order.client_id != self._client_id:
+            return None
+        return exchange.cancel_order(instrument, order_id)
 
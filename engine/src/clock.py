@@ -0,0 +1,60 @@
+from datetime import datetime
+import time
+
+
+class MonotonicClock:
+    """
+    Default engine clock returning the nanoseconds of time.monotonic_ns. Timestamps are anchored to the wall clock
+    only when they are formatted for presentation
+    """
+
+    def __init__(self):
+        self.now = time.monotonic_ns
+        # Difference between the wall clock and the monotonic clock, used to present the timestamps
+        self._offset = time.time_ns() - time.monotonic_ns()
+
+    def format(self, timestamp: int) -> str:
+        """
+        Formats the timestamp as human-readable time
+
+        :param timestamp: Nanoseconds returned by the clock
+        :return: str
+        """
+        return datetime.fromtimestamp((timestamp + self._offset) / 1e9).strftime("%H:%M:%S.%f")
+
+
+class SimulatedClock:
+    """Clock driven manually, used for replays and tests. Time is expressed in nanoseconds since the epoch"""
+
+    def __init__(self, start: int = 0):
+        self._time = start
+
+    def now(self) -> int:
+        """Gets the current simulated time"""
+        return self._time
+
+    def set(self, timestamp: int):
+        """
+        Moves the clock to the given time, the clock never goes backwards
+
+        :param timestamp: New time in nanoseconds
+        """
+        if timestamp > self._time:
+            self._time = timestamp
+
+    def advance(self, nanoseconds: int):
+        """
+        Moves the clock forward
+
+        :param nanoseconds: Number of nanoseconds to move the clock by
+        """
+        self._time += nanoseconds
+
+    def format(self, timestamp: int) -> str:
+        """
+        Formats the timestamp as human-readable time
+
+        :param timestamp: Nanoseconds since the epoch
+        :return: str
+        """
+        return datetime.fromtimestamp(timestamp / 1e9).strftime("%H:%M:%S.%f")
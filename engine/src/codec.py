@@ -0,0 +1,320 @@
+"""
+Fixed-layout binary messages of the engine, used for IPC, journaling and the network path.
+
+Every message starts with its one-byte type and has a fixed size given by its type. Messages are packed into and
+unpacked from any writable buffer (bytearray, mmap, memoryview) at a given offset, so a preallocated buffer can be
+filled and decoded in place. Integers are little-endian, prices are float64 in the outside world units with NaN
+standing for no price, symbols are ASCII padded with zero bytes to SYMBOL_SIZE and order IDs are the numeric IDs
+"""
+import struct
+import sys
+
+from engine.src.enums import Side, OrderType, OrderStatus, TimeInForce
+from engine.src.order import order_key
+
+NEW_ORDER = 1
+CANCEL = 2
+MODIFY = 3
+FILL = 4
+REJECT = 5
+REPORT = 6
+AUCTION = 7
+
+SYMBOL_SIZE = 8
+REASON_SIZE = 48
+
+# Flags of the new order message
+ICEBERG = 1
+FOK = 2
+STOP = 4
+
+# type, tag, order type, side, flags, client ID, instrument, quantity, price, displayed quantity, trigger price,
+# time in force, expiry time (0 for none)
+_NEW_ORDER = struct.Struct(f'<BIBBB{SYMBOL_SIZE}s{SYMBOL_SIZE}sqdqdBq')
+# type, tag, instrument, order ID
+_CANCEL = struct.Struct(f'<BI{SYMBOL_SIZE}sq')
+# type, tag, instrument, order ID, price, quantity, displayed quantity
+_MODIFY = struct.Struct(f'<BI{SYMBOL_SIZE}sqdqq')
+# type, trade number, instrument, price, quantity, buy order ID, sell order ID, timestamp
+_FILL = struct.Struct(f'<Bq{SYMBOL_SIZE}sdqqqq')
+# type, tag, order ID, reason
+_REJECT = struct.Struct(f'<BIq{REASON_SIZE}s')
+# type, tag, order ID, status, filled quantity, leaves quantity, first trade number, number of trades
+_REPORT = struct.Struct('<BIqBqqqq')
+# type, tag, instrument, 1 to start the call auction phase, 0 to uncross and resume the continuous trading
+_AUCTION = struct.Struct(f'<BI{SYMBOL_SIZE}sB')
+
+MESSAGES = {NEW_ORDER: _NEW_ORDER, CANCEL: _CANCEL, MODIFY: _MODIFY, FILL: _FILL, REJECT: _REJECT, REPORT: _REPORT,
+            AUCTION: _AUCTION}
+MESSAGE_SIZES = {message_type: layout.size for message_type, layout in MESSAGES.items()}
+
+_NO_PRICE = float('nan')
+_SIDES = {side.value: side for side in Side}
+_ORDER_TYPES = {order_type.value: order_type for order_type in OrderType}
+_TIMES_IN_FORCE = {time_in_force.value: time_in_force for time_in_force in TimeInForce}
+_STATUSES = {status.value: status for status in OrderStatus}
+# Padded symbol -> interned str, symbols are decoded once
+_symbols = {}
+
+
+def _encode_symbol(symbol: str) -> bytes:
+    raw = symbol.encode('ascii')
+    if len(raw) > SYMBOL_SIZE:
+        raise ValueError(f'Symbol {symbol} is longer than {SYMBOL_SIZE} characters')
+    return raw
+
+
+def check_symbol(symbol: str):
+    """
+    Checks the symbol (client ID or instrument) fits the symbol field of the messages
+
+    :param symbol: Checked symbol
+    :raises ValueError: if the symbol is not ASCII or longer than SYMBOL_SIZE
+    """
+    _encode_symbol(symbol)
+
+
+def _decode_symbol(raw: bytes) -> str:
+    symbol = _symbols.get(raw)
+    if symbol is None:
+        symbol = _symbols[raw] = sys.intern(raw.rstrip(b'\0').decode('ascii'))
+    return symbol
+
+
+def encode_new_order(buffer,
+                     offset: int,
+                     client_id: str,
+                     instrument: str,
+                     order_type: OrderType,
+                     side: Side,
+                     total_quantity: int,
+                     price: float = None,
+                     iceberg_flag: bool = False,
+                     displayed_quantity: int = None,
+                     fok_flag: bool = False,
+                     stop_flag: bool = False,
+                     trigger_price: float = None,
+                     time_in_force: TimeInForce = TimeInForce.GTC,
+                     expire_time: int = None,
+                     tag: int = 0) -> int:
+    """
+    Packs the new order message, parameters are the same as of MatchingEngine.new_order
+
+    :param buffer: Writable buffer
+    :param offset: Position of the message in the buffer
+    :param tag: Sender's reference of the message, echoed in the engine's replies
+    :return: int, position right after the message
+    """
+    flags = (ICEBERG if iceberg_flag else 0) | (FOK if fok_flag else 0) | (STOP if stop_flag else 0)
+    _NEW_ORDER.pack_into(buffer, offset, NEW_ORDER, tag, order_type, side, flags,
+                         _encode_symbol(client_id), _encode_symbol(instrument), total_quantity,
+                         _NO_PRICE if price is None else price,
+                         0 if displayed_quantity is None else displayed_quantity,
+                         _NO_PRICE if trigger_price is None else trigger_price,
+                         time_in_force,
+                         0 if expire_time is None else expire_time)
+    return offset + _NEW_ORDER.size
+
+
+def encode_cancel(buffer, offset: int, instrument: str, order_id: int, tag: int = 0) -> int:
+    """
+    Packs the cancel message
+
+    :return: int, position right after the message
+    """
+    _CANCEL.pack_into(buffer, offset, CANCEL, tag, _encode_symbol(instrument), order_id)
+    return offset + _CANCEL.size
+
+
+def encode_modify(buffer,
+                  offset: int,
+                  instrument: str,
+                  order_id: int,
+                  price: float,
+                  quantity: int,
+                  displayed_quantity: int = None,
+                  tag: int = 0) -> int:
+    """
+    Packs the modify message, parameters are the same as of MatchingEngine.modify_order
+
+    :return: int, position right after the message
+    """
+    _MODIFY.pack_into(buffer, offset, MODIFY, tag, _encode_symbol(instrument), order_id, price, quantity,
+                      0 if displayed_quantity is None else displayed_quantity)
+    return offset + _MODIFY.size
+
+
+def encode_auction(buffer, offset: int, instrument: str, start: bool, tag: int = 0) -> int:
+    """
+    Packs the auction message, starting the instrument's call auction phase or ending it with the uncross
+
+    :return: int, position right after the message
+    """
+    _AUCTION.pack_into(buffer, offset, AUCTION, tag, _encode_symbol(instrument), 1 if start else 0)
+    return offset + _AUCTION.size
+
+
+def encode_fill(buffer,
+                offset: int,
+                trade_number: int,
+                instrument: str,
+                price: float,
+                quantity: int,
+                order_id_b: int,
+                order_id_a: int,
+                timestamp: int) -> int:
+    """
+    Packs the fill message of a single trade
+
+    :return: int, position right after the message
+    """
+    _FILL.pack_into(buffer, offset, FILL, trade_number, _encode_symbol(instrument), price, quantity,
+                    order_id_b, order_id_a, timestamp)
+    return offset + _FILL.size
+
+
+def encode_reject(buffer, offset: int, reason: str, order_id: int = 0, tag: int = 0) -> int:
+    """
+    Packs the reject message, the reason is truncated to REASON_SIZE bytes
+
+    :return: int, position right after the message
+    """
+    _REJECT.pack_into(buffer, offset, REJECT, tag, order_id, reason.encode()[:REASON_SIZE])
+    return offset + _REJECT.size
+
+
+def encode_report(buffer, offset: int, report, tag: int = 0) -> int:
+    """
+    Packs the ExecutionReport of the order, rejected orders without an ID get the order ID 0
+
+    :return: int, position right after the message
+    """
+    _REPORT.pack_into(buffer, offset, REPORT, tag, order_key(report.order_id) or 0, report.status,
+                      report.filled_quantity, report.leaves_quantity, report.trade_numbers.start, len(report.trade_numbers))
+    return offset + _REPORT.size
+
+
+def decode(buffer, offset: int = 0) -> tuple:
+    """
+    Unpacks the message at the given position
+
+    :param buffer: Buffer holding the message
+    :param offset: Position of the message in the buffer
+    :return: tuple (message type, tag, fields, position right after the message). Fields of a new order are
+             the record of MatchingEngine.new_order parameters, of a cancel (instrument, order ID), of a modify
+             the MatchingEngine.modify_order parameters, of a fill (trade number, instrument, price, quantity,
+             buy order ID, sell order ID, timestamp), of a reject (order ID, reason), of a report
+             (order ID, status, filled quantity, leaves quantity, trade numbers) and of an auction
+             (instrument, start). Fills have no tag (0)
+    """
+    message_type = buffer[offset]
+
+    if message_type == NEW_ORDER:
+        (_, tag, order_type, side, flags, client_id, instrument, quantity, price, displayed_quantity,
+         trigger_price, time_in_force, expire_time) = _NEW_ORDER.unpack_from(buffer, offset)
+        fields = (_decode_symbol(client_id),
+                  _decode_symbol(instrument),
+                  _ORDER_TYPES[order_type],
+                  _SIDES[side],
+                  quantity,
+                  None if price != price else price,
+                  bool(flags & ICEBERG),
+                  displayed_quantity or None,
+                  bool(flags & FOK),
+                  bool(flags & STOP),
+                  None if trigger_price != trigger_price else trigger_price,
+                  _TIMES_IN_FORCE[time_in_force],
+                  expire_time or None)
+        return NEW_ORDER, tag, fields, offset + _NEW_ORDER.size
+
+    if message_type == CANCEL:
+        _, tag, instrument, order_id = _CANCEL.unpack_from(buffer, offset)
+        return CANCEL, tag, (_decode_symbol(instrument), order_id), offset + _CANCEL.size
+
+    if message_type == MODIFY:
+        _, tag, instrument, order_id, price, quantity, displayed_quantity = _MODIFY.unpack_from(buffer, offset)
+        fields = (_decode_symbol(instrument), order_id, price, quantity, displayed_quantity or None)
+        return MODIFY, tag, fields, offset + _MODIFY.size
+
+    if message_type == FILL:
+        _, trade_number, instrument, price, quantity, order_id_b, order_id_a, timestamp = \
+            _FILL.unpack_from(buffer, offset)
+        fields = (trade_number, _decode_symbol(instrument), price, quantity, order_id_b, order_id_a, timestamp)
+        return FILL, 0, fields, offset + _FILL.size
+
+    if message_type == REJECT:
+        _, tag, order_id, reason = _REJECT.unpack_from(buffer, offset)
+        return REJECT, tag, (order_id, reason.rstrip(b'\0').decode(errors='replace')), offset + _REJECT.size
+
+    if message_type == REPORT:
+        _, tag, order_id, status, filled, leaves, first_trade, trades = _REPORT.unpack_from(buffer, offset)
+        fields = (order_id, _STATUSES[status], filled, leaves, range(first_trade, first_trade + trades))
+        return REPORT, tag, fields, offset + _REPORT.size
+
+    if message_type == AUCTION:
+        _, tag, instrument, start = _AUCTION.unpack_from(buffer, offset)
+        return AUCTION, tag, (_decode_symbol(instrument), bool(start)), offset + _AUCTION.size
+
+    raise ValueError(f'Unknown message type {message_type} at offset {offset}')
+
+
+def decode_all(buffer, offset: int = 0, end: int = None):
+    """
+    Unpacks all messages of the buffer
+
+    :param buffer: Buffer holding the messages back to back
+    :param offset: Position of the first message
+    :param end: Position right after the last message, the end of the buffer by default
+    :return: generator of (message type, tag, fields) tuples
+    """
+    view = memoryview(buffer)
+    end = len(view) if end is None else end
+    try:
+        while offset < end:
+            message_type, tag, fields, offset = decode(view, offset)
+            yield message_type, tag, fields
+    finally:
+        view.release()
+
+
+def submit_all(engine, buffer, offset: int = 0, end: int = None) -> list:
+    """
+    Decodes a buffer of inbound messages (new orders, cancels, modifications and auctions) into engine calls,
+    preserving their order. Runs of consecutive new orders are matched as a single MatchingEngine.match_orders batch
+
+    :param engine: MatchingEngine processing the messages
+    :param buffer: Buffer holding the messages back to back
+    :param offset: Position of the first message
+    :param end: Position right after the last message, the end of the buffer by default
+    :return: list of (tag, result) tuples, one per message. The result of a new order is its ExecutionReport,
+             of a cancel and a modify the affected Order, or None if the order is unknown, of an auction start None
+             and of an auction end its AuctionResult
+    """
+    results = []
+    tags = []
+    records = []
+
+    def flush():
+        results.extend(zip(tags, engine.match_orders(records)))
+        tags.clear()
+        records.clear()
+
+    for message_type, tag, fields in decode_all(buffer, offset, end):
+        if message_type == NEW_ORDER:
+            tags.append(tag)
+            records.append(fields)
+            continue
+        if records:
+            flush()
+        if message_type == CANCEL:
+            results.append((tag, engine.cancel_order(*fields)))
+        elif message_type == MODIFY:
+            results.append((tag, engine.modify_order(*fields)))
+        elif message_type == AUCTION:
+            instrument, start = fields
+            results.append((tag, engine.start_auction(instrument) if start else engine.end_auction(instrument)))
+        else:
+            raise ValueError(f'Message type {message_type} is not an inbound message')
+    if records:
+        flush()
+    return results
@@ -1,13 +1,40 @@
-"""Enums used for order side and type selection"""
+"""
+Enums used for order side and type selection.
+Members are small ints, so they can be packed into arrays and binary messages
+"""
 from enum import Enum
 
 
-class Side(Enum):
+class Side(int, Enum):
     BUY = 1
     SELL = 2
 
 
-class OrderType(Enum):
+class OrderType(int, Enum):
     MARKET = 1
     LIMIT = 2
 
+
+class OrderStatus(int, Enum):
+    NEW = 1
+    PARTIALLY_FILLED = 2
+    FILLED = 3
+    # Remaining quantity was not allowed to rest in the OrderBook (Fill-or-Kill and MARKET orders)
+    KILLED = 4
+    # STOP order waiting for its trigger price
+    PENDING = 5
+    CANCELLED = 6
+    REJECTED = 7
+    # Good-Till-Date order which reached its expiry time before it could rest in the OrderBook
+    EXPIRED = 8
+
+
+class TimeInForce(int, Enum):
+    # Good-Till-Cancelled, the order works until it's filled or cancelled
+    GTC = 1
+    # Immediate-Or-Cancel, the quantity not filled on arrival is cancelled instead of resting in the OrderBook
+    IOC = 2
+    # Good-Till-Date, the order expires at its expiry time
+    GTD = 3
+    # The order expires at the end of its instrument's trading day
+    DAY = 4
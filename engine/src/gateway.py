@@ -0,0 +1,318 @@
+"""
+asyncio order-entry gateway of the Matching Engine.
+
+Clients connect over a local TCP or Unix socket and exchange newline-delimited JSON messages:
+
+    {"type": "new", "id": 1, "client_id": "c000001", "instrument": "BTC", "order_type": "LIMIT", "side": "BUY",
+     "quantity": 10, "price": 100.0, "iceberg": false, "displayed_quantity": null, "fok": false,
+     "stop": false, "trigger_price": null, "time_in_force": "GTC", "expire_time": null}
+    {"type": "cancel", "id": 2, "instrument": "BTC", "order_id": "o000001"}
+    {"type": "modify", "id": 3, "instrument": "BTC", "order_id": "o000001", "price": 99.0, "quantity": 5,
+     "displayed_quantity": null}
+
+The gateway answers with "ack" (new order processed, with its ExecutionReport), "cancelled", "modified" and
+"reject" messages echoing the client's "id", and sends a "fill" message to both counterparties of every trade
+
+Usage: python -m engine.src.gateway [--host HOST] [--port PORT] [--unix PATH]
+"""
+import argparse
+import asyncio
+import json
+
+from engine.matching_engine import MatchingEngine
+from engine.src.enums import Side, OrderType, TimeInForce
+
+
+class Gateway:
+    """
+    Order-entry gateway serving all client sessions from a single event loop, without a thread per client.
+
+    Messages are queued in a bounded queue per instrument and fed into the engine by one worker task per instrument,
+    so each instrument's messages are processed in the arrival order. A session stops being read while the queue of
+    the instrument it sends to is full, and while it does not read its own acks and fills, so the backpressure
+    propagates to the clients through their sockets
+    """
+
+    def __init__(self, engine: MatchingEngine, queue_size: int = 1024, batch_size: int = 256, prune_size: int = 1024):
+        """
+        :param engine: Engine the orders are matched by
+        :param queue_size: Maximum number of messages waiting in the queue of a single instrument
+        :param batch_size: Maximum number of messages a worker processes before giving way to the other tasks
+        :param prune_size: Number of tracked orders first triggering the removal of the orders which left the engine
+                           unnoticed, e.g. expired GTD and DAY orders
+        """
+        assert queue_size > 0 and batch_size > 0, 'Queue and batch sizes have to be positive'
+        assert prune_size > 0, 'Prune size has to be positive'
+        self._engine = engine
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.prune_size = prune_size
+        self._queues = {}
+        self._workers = {}
+        self._servers = []
+        # Writer -> task of every connected session
+        self._sessions = {}
+        # Order ID -> (writer of the session which entered the order, instrument), kept while the order is working
+        # in the engine. Orders leaving it without a fill or cancel seen by the gateway are dropped once the map
+        # reaches the prune threshold
+        self._owners = {}
+        # Writer -> IDs of the session's orders in the owner map, dropped with the session
+        self._session_orders = {}
+        self._prune_at = prune_size
+
+    @property
+    def engine(self):
+        return self._engine
+
+    @property
+    def sessions(self) -> int:
+        """Number of connected client sessions"""
+        return len(self._sessions)
+
+    @property
+    def orders(self) -> int:
+        """Number of orders the gateway routes fills for"""
+        return len(self._owners)
+
+    def queue_depth(self, instrument: str) -> int:
+        """Number of messages waiting in the instrument's queue"""
+        queue = self._queues.get(instrument)
+        return queue.qsize() if queue is not None else 0
+
+    async def listen_tcp(self, host: str = '127.0.0.1', port: int = 0):
+        """
+        Starts accepting sessions over TCP
+
+        :param host: Interface to listen on
+        :param port: Port to listen on, any free port if 0
+        :return: (host, port) the gateway listens on
+        """
+        server = await asyncio.start_server(self._session, host, port)
+        self._servers.append(server)
+        return server.sockets[0].getsockname()[:2]
+
+    async def listen_unix(self, path: str):
+        """
+        Starts accepting sessions over a Unix socket
+
+        :param path: Path of the socket
+        """
+        self._servers.append(await asyncio.start_unix_server(self._session, path))
+
+    async def join(self):
+        """Waits until all queued messages are processed"""
+        for queue in list(self._queues.values()):
+            await queue.join()
+
+    async def close(self):
+        """Stops accepting sessions, disconnects the connected ones and stops the workers"""
+        for server in self._servers:
+            server.close()
+        sessions = list(self._sessions.values())
+        for writer in list(self._sessions):
+            writer.close()
+        # Closed sessions see the end of their streams and finish
+        await asyncio.gather(*sessions, return_exceptions=True)
+        for server in self._servers:
+            await server.wait_closed()
+        for worker in self._workers.values():
+            worker.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._servers, self._queues, self._workers = [], {}, {}
+
+    async def _session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._sessions[writer] = asyncio.current_task()
+        self._session_orders[writer] = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    instrument = message['instrument']
+                    queue = self._queues.get(instrument)
+                    if queue is None:
+                        queue = self._create_queue(instrument)
+                except (ValueError, KeyError, TypeError) as error:
+                    self._send(writer, {'type': 'reject', 'id': None, 'reason': f'Malformed message: {error}'})
+                    continue
+
+                # Waits while the instrument's queue is full
+                await queue.put((writer, message))
+                # Waits while the client does not keep up with reading its acks and fills
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # Connection lost or a line longer than the reader's limit
+            pass
+        finally:
+            del self._sessions[writer]
+            # The session's orders keep working, but there is nobody to send their fills to anymore
+            for order_id in self._session_orders.pop(writer):
+                del self._owners[order_id]
+            writer.close()
+
+    def _create_queue(self, instrument: str) -> asyncio.Queue:
+        queue = self._queues[instrument] = asyncio.Queue(self.queue_size)
+        self._workers[instrument] = asyncio.get_running_loop().create_task(self._work(queue))
+        return queue
+
+    async def _work(self, queue: asyncio.Queue):
+        """Feeds the messages of a single instrument into the engine"""
+        while True:
+            messages = [await queue.get()]
+            while len(messages) < self.batch_size and not queue.empty():
+                messages.append(queue.get_nowait())
+            for writer, message in messages:
+                self._process(writer, message)
+                queue.task_done()
+
+    def _process(self, writer: asyncio.StreamWriter, message: dict):
+        engine = self._engine
+        first_trade = engine.trades.count
+        kind = message.get('type')
+        tag = message.get('id')
+        instrument = message['instrument']
+        try:
+            if kind == 'new':
+                self._new_order(writer, tag, instrument, message)
+            elif kind == 'cancel':
+                self._cancel_order(writer, tag, instrument, message['order_id'])
+            elif kind == 'modify':
+                self._modify_order(writer, tag, instrument, message)
+            else:
+                raise ValueError(f'Unknown message type: {kind}')
+        except (AssertionError, ValueError, TypeError, KeyError) as error:
+            self._send(writer, {'type': 'reject', 'id': tag, 'reason': str(error)})
+
+        # Trades of the message, including the ones of the stop orders it triggered
+        if engine.trades.count > first_trade:
+            self._publish_fills(engine.trades.trades_since(first_trade))
+        if len(self._owners) >= self._prune_at:
+            self._prune_owners()
+
+    def _new_order(self, writer: asyncio.StreamWriter, tag, instrument: str, message: dict):
+        engine = self._engine
+        order = engine.new_order(message['client_id'],
+                                 instrument,
+                                 OrderType[message['order_type']],
+                                 Side[message['side']],
+                                 message['quantity'],
+                                 message.get('price'),
+                                 message.get('iceberg', False),
+                                 message.get('displayed_quantity'),
+                                 message.get('fok', False),
+                                 message.get('stop', False),
+                                 message.get('trigger_price'),
+                                 TimeInForce[message.get('time_in_force', 'GTC')],
+                                 message.get('expire_time'))
+        report = engine.match_order(order)
+        session_orders = self._session_orders.get(writer)
+        # Orders queued by a session which disconnected since have nobody to send their fills to
+        if session_orders is not None and (report.filled_quantity or report.leaves_quantity):
+            self._owners[report.order_id] = (writer, instrument)
+            session_orders.add(report.order_id)
+        self._send(writer, {'type': 'ack',
+                            'id': tag,
+                            'order_id': report.order_id,
+                            'status': report.status.name,
+                            'filled': report.filled_quantity,
+                            'leaves': report.leaves_quantity})
+
+    def _cancel_order(self, writer: asyncio.StreamWriter, tag, instrument: str, order_id: str):
+        # Sessions can only cancel their own orders
+        order = self._engine.cancel_order(instrument, order_id) if self._owner(order_id) is writer else None
+        if order is None:
+            raise ValueError(f'Unknown order: {order_id}')
+        self._forget(order.order_id)
+        self._send(writer, {'type': 'cancelled', 'id': tag, 'order_id': order.order_id})
+
+    def _modify_order(self, writer: asyncio.StreamWriter, tag, instrument: str, message: dict):
+        engine = self._engine
+        order_id = message['order_id']
+        order = engine.modify_order(instrument,
+                                    order_id,
+                                    message['price'],
+                                    message['quantity'],
+                                    message.get('displayed_quantity')) if self._owner(order_id) is writer else None
+        if order is None:
+            raise ValueError(f'Unknown order: {order_id}')
+        self._send(writer, {'type': 'modified',
+                            'id': tag,
+                            'order_id': order.order_id,
+                            'price': engine.to_price(instrument, order.price),
+                            'quantity': order.total_quantity})
+
+    def _publish_fills(self, trades: list):
+        engine = self._engine
+        touched = set()
+        for trade in trades:
+            for side, order_id in ((Side.BUY, trade.order_id_b), (Side.SELL, trade.order_id_a)):
+                writer = self._owner(order_id)
+                if writer is None:
+                    continue
+                touched.add((trade.instrument, order_id))
+                self._send(writer, {'type': 'fill',
+                                    'trade_id': trade.trade_id,
+                                    'order_id': order_id,
+                                    'instrument': trade.instrument,
+                                    'side': side.name,
+                                    'price': engine.to_price(trade.instrument, trade.price),
+                                    'quantity': trade.quantity,
+                                    'timestamp': trade.timestamp})
+
+        # Forget the orders which are no longer working in the engine
+        for instrument, order_id in touched:
+            if engine.get_order(instrument, order_id) is None:
+                self._forget(order_id)
+
+    def _owner(self, order_id: str):
+        owner = self._owners.get(order_id)
+        return owner[0] if owner is not None else None
+
+    def _forget(self, order_id: str):
+        writer, _ = self._owners.pop(order_id)
+        self._session_orders[writer].discard(order_id)
+
+    def _prune_owners(self):
+        """Drops the orders which left the engine without the gateway noticing, e.g. by expiry or mass cancel"""
+        get_order = self._engine.get_order
+        for order_id in [order_id for order_id, (_, instrument) in self._owners.items()
+                         if get_order(instrument, order_id) is None]:
+            self._forget(order_id)
+        self._prune_at = max(self.prune_size, 2 * len(self._owners))
+
+    @staticmethod
+    def _send(writer: asyncio.StreamWriter, message: dict):
+        if not writer.is_closing():
+            writer.write(json.dumps(message).encode() + b'\n')
+
+
+async def serve(host: str = '127.0.0.1', port: int = 9000, unix_path: str = None):
+    gateway = Gateway(MatchingEngine())
+    if unix_path is not None:
+        await gateway.listen_unix(unix_path)
+        print(f'Gateway listening on {unix_path}')
+    else:
+        host, port = await gateway.listen_tcp(host, port)
+        print(f'Gateway listening on {host}:{port}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await gateway.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Matching Engine order-entry gateway')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP interface to listen on')
+    parser.add_argument('--port', type=int, default=9000, help='TCP port to listen on')
+    parser.add_argument('--unix', help='path of the Unix socket to listen on instead of TCP')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+
+class InstrumentSpec:
+    """
+    Trading parameters of an instrument. Instruments with a spec registered in the MatchingEngine are traded
+    in integer ticks: prices are converted to ticks when orders reach the engine and back to prices only
+    when they are presented to the outside world
+    """
+
+    def __init__(self,
+                 instrument: str,
+                 tick_size: float,
+                 lot_size: int = 1,
+                 min_price: float = None,
+                 max_price: float = None):
+
+        assert tick_size > 0, 'Tick size has to be positive'
+        assert lot_size > 0, 'Lot size has to be positive'
+
+        self.instrument = instrument
+        self.tick_size = tick_size
+        self.lot_size = lot_size
+
+        # Number of decimal places of the tick size, used to present tick prices without float artifacts
+        self._decimals = max(0, -Decimal(str(tick_size)).as_tuple().exponent)
+
+        # Price band, orders priced outside of it are rejected
+        self.min_tick = self.to_ticks(min_price) if min_price is not None else None
+        self.max_tick = self.to_ticks(max_price) if max_price is not None else None
+
+    def __repr__(self):
+        return f'Instrument: {self.instrument}, Tick Size: {self.tick_size}, Lot Size: {self.lot_size}'
+
+    def to_ticks(self, price: float) -> int:
+        """
+        Converts the price to the integer number of ticks
+
+        :param price: Price to be converted
+        :return: int
+        """
+        ticks = round(price / self.tick_size)
+        if abs(price - ticks * self.tick_size) > self.tick_size * 1e-6:
+            raise ValueError(f'Price {price} is not a multiple of the {self.instrument} tick size {self.tick_size}')
+        return ticks
+
+    def to_price(self, ticks: int) -> float:
+        """
+        Converts the integer number of ticks to the price
+
+        :param ticks: Number of ticks to be converted
+        :return: float
+        """
+        return round(ticks * self.tick_size, self._decimals)
+
+    def check_price(self, ticks: int):
+        """
+        Validates that the price in ticks is within the instrument's price band
+
+        :param ticks: Price in ticks
+        """
+        if (self.min_tick is not None and ticks < self.min_tick) or \
+                (self.max_tick is not None and ticks > self.max_tick):
+            raise ValueError(f'Price {self.to_price(ticks)} is outside of the {self.instrument} price band')
+
+    def check_quantity(self, quantity: int):
+        """
+        Validates that the quantity is a multiple of the instrument's lot size
+
+        :param quantity: Order quantity
+        """
+        if quantity % self.lot_size:
+            raise ValueError(f'Quantity {quantity} is not a multiple of the {self.instrument} lot size {self.lot_size}')
@@ -0,0 +1,278 @@
+import mmap
+import os
+import struct
+import time
+import zlib
+
+from engine.src import codec
+from engine.src.clock import SimulatedClock
+from engine.src.enums import OrderType
+from engine.src.order import Order, order_key, advance_order_ids
+
+# Record header: size of the record, CRC32 of the rest of the record, clock time of the event (ns), numeric ID of
+# the new order (0 for cancels and modifications)
+_HEADER = struct.Struct('<IIqq')
+# Bytes of the header before the checksummed part of the record
+_CHECKED = 8
+_RECORD_SIZES = {message_type: _HEADER.size + size for message_type, size in codec.MESSAGE_SIZES.items()}
+MAX_RECORD_SIZE = max(_RECORD_SIZES.values())
+
+
+def pack_record(buffer, timestamp: int, order_id: int, encode, *fields) -> int:
+    """
+    Packs the log record of an inbound message, e.g. to write a log of recorded events for a replay
+
+    :param buffer: Writable buffer the record is packed at its start
+    :param timestamp: Clock time of the event (ns)
+    :param order_id: Numeric ID of the new order, 0 for the other events
+    :param encode: Codec function packing the message, e.g. codec.encode_new_order
+    :param fields: Fields of the message passed to the codec function
+    :return: int, size of the record
+    """
+    _HEADER.pack_into(buffer, 0, 0, 0, timestamp, order_id)
+    return _seal(buffer, encode(buffer, _HEADER.size, *fields))
+
+
+def _seal(buffer, end: int) -> int:
+    """Fills in the size and the checksum of the record packed at the start of the buffer"""
+    struct.pack_into('<II', buffer, 0, end, zlib.crc32(memoryview(buffer)[_CHECKED:end]))
+    return end
+
+
+def _records(view, offset: int = 0):
+    """
+    Finds the complete records of the log, ending at the first record which is torn (cut short by a crash in the
+    middle of writing) or corrupted, i.e. whose size or checksum does not match
+
+    :param view: memoryview of the log
+    :param offset: Position of the first record
+    :return: generator of (position, size) tuples of the records
+    """
+    end = len(view)
+    while offset + _HEADER.size < end:
+        size, checksum = struct.unpack_from('<II', view, offset)
+        if size != _RECORD_SIZES.get(view[offset + _HEADER.size]) or offset + size > end or \
+                zlib.crc32(view[offset + _CHECKED:offset + size]) != checksum:
+            break
+        yield offset, size
+        offset += size
+
+
+class Journal:
+    """
+    Append-only write-ahead log of the engine's inbound events. Every new order, cancel, modification and auction
+    start or end is written before the engine processes it, as a record header followed by the event's codec
+    message.
+
+    New orders are recorded as the Order the engine received, with prices in the engine's units (ticks for
+    instruments with a spec), cancels and modifications as the parameters of the engine call. Replaying the log
+    through an engine with the same instruments rebuilds the same OrderBooks, stop queues and trades.
+
+    Records are handed to the operating system as they arrive, so they survive the process dying. Surviving a
+    machine crash needs an fsync, which is done once per group of records (group commit) to keep it from capping
+    the throughput. Every record carries its size and checksum, a record torn by a crash is cut off the log when
+    it's opened again, before new records are appended
+    """
+
+    def __init__(self, path: str, sync_every: int = 1, sync_interval: float = None):
+        """
+        :param path: Path of the log file, new records are appended to the existing ones
+        :param sync_every: Number of records per fsync, None leaves flushing the file to the operating system
+        :param sync_interval: Maximum seconds between two fsyncs, checked whenever a record is written
+        """
+        assert sync_every is None or sync_every > 0, 'Number of records per fsync has to be positive'
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = None if sync_interval is None else int(sync_interval * 1e9)
+        self._fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        # Size of the log, i.e. the position the next record is written at
+        self.offset = self._recover()
+        self._buffer = bytearray(MAX_RECORD_SIZE)
+        self._unsynced = 0
+        self._last_sync = time.monotonic_ns()
+        self.records = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record_order(self, order: Order, timestamp: int):
+        """
+        Writes the new order
+
+        :param order: Order as received by the engine
+        :param timestamp: Clock time the engine stamps the order with
+        """
+        buffer = self._buffer
+        _HEADER.pack_into(buffer, 0, 0, 0, timestamp, order.id)
+        end = codec.encode_new_order(buffer,
+                                     _HEADER.size,
+                                     order.client_id,
+                                     order.instrument,
+                                     order.order_type,
+                                     order.side,
+                                     order.total_quantity,
+                                     order.price if order.order_type == OrderType.LIMIT else None,
+                                     order.iceberg_flag,
+                                     order.displayed_quantity if order.iceberg_flag else None,
+                                     order.fok_flag,
+                                     order.stop_flag,
+                                     order.trigger_price,
+                                     order.time_in_force,
+                                     order.expire_time)
+        self._write(end)
+
+    def record_cancel(self, instrument: str, order_id):
+        """
+        Writes the cancel
+
+        :param instrument: Instrument of the cancelled order
+        :param order_id: ID of the cancelled order
+        """
+        _HEADER.pack_into(self._buffer, 0, 0, 0, 0, 0)
+        self._write(codec.encode_cancel(self._buffer, _HEADER.size, instrument, order_key(order_id) or 0))
+
+    def record_modify(self,
+                      instrument: str,
+                      order_id,
+                      price: float,
+                      quantity: int,
+                      displayed_quantity: int,
+                      timestamp: int):
+        """
+        Writes the modification, parameters are the same as of MatchingEngine.modify_order
+
+        :param timestamp: Clock time the engine stamps the modified order with
+        """
+        _HEADER.pack_into(self._buffer, 0, 0, 0, timestamp, 0)
+        self._write(codec.encode_modify(self._buffer, _HEADER.size, instrument, order_key(order_id) or 0, price,
+                                        quantity, displayed_quantity))
+
+    def record_auction(self, instrument: str, start: bool, timestamp: int):
+        """
+        Writes the start or the end (uncross) of the instrument's call auction phase
+
+        :param instrument: Instrument of the auction
+        :param start: True when the auction starts, False when it ends
+        :param timestamp: Clock time of the event
+        """
+        _HEADER.pack_into(self._buffer, 0, 0, 0, timestamp, 0)
+        self._write(codec.encode_auction(self._buffer, _HEADER.size, instrument, start))
+
+    def sync(self):
+        """Forces all written records to disk"""
+        os.fsync(self._fd)
+        self._unsynced = 0
+        self._last_sync = time.monotonic_ns()
+
+    def close(self):
+        if self._fd is not None:
+            self.sync()
+            os.close(self._fd)
+            self._fd = None
+
+    def _recover(self) -> int:
+        """Cuts a torn or corrupted tail off the log and returns the size of the complete records"""
+        size = os.fstat(self._fd).st_size
+        if size == 0:
+            return 0
+        end = 0
+        with mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ) as log:
+            view = memoryview(log)
+            try:
+                for offset, record_size in _records(view):
+                    end = offset + record_size
+            finally:
+                view.release()
+        if end < size:
+            os.ftruncate(self._fd, end)
+            os.fsync(self._fd)
+        return end
+
+    def _write(self, end: int):
+        os.write(self._fd, memoryview(self._buffer)[:_seal(self._buffer, end)])
+        self.offset += end
+        self.records += 1
+        self._unsynced += 1
+        if (self.sync_every is not None and self._unsynced >= self.sync_every) or \
+                (self.sync_interval is not None and time.monotonic_ns() - self._last_sync >= self.sync_interval):
+            self.sync()
+
+    @staticmethod
+    def read(path: str, offset: int = 0):
+        """
+        Reads the log through a memory map. A record torn by a crash in the middle of writing, or failing its
+        checksum, ends the log
+
+        :param path: Path of the log file
+        :param offset: Position of the first read record, e.g. the journal offset of a snapshot
+        :return: generator of (timestamp, order ID, message type, message fields) tuples, see codec.decode
+        """
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size <= offset:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as log:
+                view = memoryview(log)
+                try:
+                    for offset, _ in _records(view, offset):
+                        _, _, timestamp, order_id = _HEADER.unpack_from(view, offset)
+                        message_type, _, fields, _ = codec.decode(view, offset + _HEADER.size)
+                        yield timestamp, order_id, message_type, fields
+                finally:
+                    view.release()
+
+    @staticmethod
+    def replay(path: str, engine, offset: int = 0) -> int:
+        """
+        Replays the log through the engine, which has to be in the state the log was started from (usually empty,
+        or restored from a snapshot) and must not be journaling. Orders get their recorded IDs and timestamps back,
+        afterwards the engine's own clock is used again and new orders continue the recorded ID sequence
+
+        :param path: Path of the log file
+        :param engine: MatchingEngine the events are replayed through
+        :param offset: Position of the first replayed record, e.g. the journal offset of a snapshot
+        :return: int, number of replayed events
+        """
+        assert engine.journal is None, 'Engine replaying the journal cannot be journaling'
+        clock = engine.clock
+        replay_clock = engine.clock = SimulatedClock()
+        instruments = engine.instruments
+        last_id = 0
+        events = 0
+        try:
+            for timestamp, order_id, message_type, fields in Journal.read(path, offset):
+                replay_clock.set(timestamp)
+                try:
+                    if message_type == codec.NEW_ORDER:
+                        fields = list(fields)
+                        # Prices of the instruments with a spec are integer ticks
+                        if fields[1] in instruments:
+                            fields[5] = None if fields[5] is None else int(fields[5])
+                            fields[10] = None if fields[10] is None else int(fields[10])
+                        # The recorded ID is given back without rewinding the process-wide ID sequence
+                        order = Order(*fields)
+                        order.id = order_id
+                        last_id = max(last_id, order_id)
+                        engine.match_order(order)
+                    elif message_type == codec.CANCEL:
+                        engine.cancel_order(*fields)
+                    elif message_type == codec.MODIFY:
+                        engine.modify_order(*fields)
+                    elif message_type == codec.AUCTION:
+                        instrument, start = fields
+                        if start:
+                            engine.start_auction(instrument)
+                        else:
+                            engine.end_auction(instrument)
+                except (AssertionError, ValueError):
+                    # Modifications journaled before the engine rejected them (e.g. an off-tick price) are rejected
+                    # again, orders rejected by new_order never reached the journal
+                    pass
+                events += 1
+        finally:
+            engine.clock = clock
+            advance_order_ids(last_id)
+        return events
+
@@ -0,0 +1,172 @@
+"""
+Optional instrumentation of the engine's hot path. Every phase of matching an order is timed and recorded into
+log-bucketed histograms of a fixed size, so recording costs one bucket increment and the memory does not grow with
+the number of orders
+"""
+from array import array
+
+# Phases of MatchingEngine.match_order
+BOOK = 'book'  # OrderBook lookup or creation
+FOK_CHECK = 'fok_check'  # Fill or Kill feasibility check
+SWEEP = 'sweep'  # Matching against the opposite side, without removing the filled passive orders
+REMOVE = 'remove'  # Removal of one filled passive order
+INSERT = 'insert'  # Adding the remaining quantity to the OrderBook
+STOPS = 'stops'  # Stop trigger evaluation and the cascade of triggered stops, including their own phases
+PHASES = (BOOK, FOK_CHECK, SWEEP, REMOVE, INSERT, STOPS)
+
+# Every power of two is split into 2 ** _SUB_BITS buckets, i.e. the values are kept within 12.5% precision
+_SUB_BITS = 3
+_SUB_BUCKETS = 1 << _SUB_BITS
+_MAX_SHIFT = 63 - _SUB_BITS
+_BUCKETS = (_MAX_SHIFT + 2) << _SUB_BITS
+
+
+def _bucket(value: int) -> int:
+    if value < _SUB_BUCKETS:
+        return value if value > 0 else 0
+    shift = min(value.bit_length() - _SUB_BITS - 1, _MAX_SHIFT)
+    return ((shift + 1) << _SUB_BITS) + min((value >> shift) - _SUB_BUCKETS, _SUB_BUCKETS - 1)
+
+
+def _bucket_bounds(idx: int) -> tuple:
+    if idx < _SUB_BUCKETS:
+        return idx, idx
+    shift = (idx >> _SUB_BITS) - 1
+    mantissa = (idx & (_SUB_BUCKETS - 1)) + _SUB_BUCKETS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram of latencies in nanoseconds"""
+    __slots__ = ('_counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self._counts = array('q', bytes(8 * _BUCKETS))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value: int):
+        self._counts[_bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """
+        Adds the other histogram's values to this one
+
+        :param other: LatencyHistogram to be merged
+        """
+        counts = self._counts
+        for idx, count in enumerate(other._counts):
+            if count:
+                counts[idx] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def percentile(self, percentile: float):
+        """
+        Gets the latency the given percentage of the values is at or below, precise to the bucket's width
+
+        :param percentile: Percentile between 0 and 100
+        :return: int nanoseconds, or None if nothing was recorded
+        """
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * percentile // 100))
+        seen = 0
+        for idx, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return min(_bucket_bounds(idx)[1], self.max)
+        return self.max
+
+    def summary(self, percentiles: tuple = (50, 99, 99.9)) -> dict:
+        """
+        Summarizes the histogram
+
+        :param percentiles: Percentiles to be reported
+        :return: dict with the count, mean, min, max and the percentiles named e.g. p99.9
+        """
+        summary = {'count': self.count,
+                   'mean': round(self.total / self.count) if self.count else None,
+                   'min': self.min,
+                   'max': self.max}
+        for percentile in percentiles:
+            summary[f'p{percentile:g}'] = self.percentile(percentile)
+        return summary
+
+
+class LatencyRecorder:
+    """
+    Collects the phase latencies of the engine, one LatencyHistogram per phase, order type and instrument.
+    The engine only records them when the recorder is set, see MatchingEngine.latency
+    """
+
+    def __init__(self):
+        # (phase, order type, instrument) -> LatencyHistogram
+        self._histograms = {}
+
+    def __len__(self):
+        return len(self._histograms)
+
+    def record(self, phase: str, order, elapsed: int):
+        """
+        Records the latency of the phase
+
+        :param phase: One of the PHASES
+        :param order: Order being matched
+        :param elapsed: Time spent in the phase in nanoseconds
+        """
+        key = (phase, order.order_type, order.instrument)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = LatencyHistogram()
+        histogram.record(elapsed)
+
+    def histogram(self, phase: str, order_type=None, instrument: str = None) -> LatencyHistogram:
+        """
+        Gets the latencies of the phase, aggregated over all order types and/or instruments if not given
+
+        :return: LatencyHistogram
+        """
+        merged = LatencyHistogram()
+        for (key_phase, key_type, key_instrument), histogram in self._histograms.items():
+            if key_phase == phase and order_type in (None, key_type) and instrument in (None, key_instrument):
+                merged.merge(histogram)
+        return merged
+
+    def stats(self, percentiles: tuple = (50, 99, 99.9)) -> dict:
+        """
+        Summarizes the recorded latencies per order type and per instrument
+
+        :param percentiles: Percentiles to be reported
+        :return: dict {'order_type': {type name: {phase: summary}}, 'instrument': {instrument: {phase: summary}}},
+                 see LatencyHistogram.summary
+        """
+        by_type, by_instrument = {}, {}
+        for (phase, order_type, instrument), histogram in self._histograms.items():
+            for groups, group in ((by_type, order_type.name), (by_instrument, instrument)):
+                phases = groups.setdefault(group, {})
+                if phase not in phases:
+                    phases[phase] = LatencyHistogram()
+                phases[phase].merge(histogram)
+
+        def summarize(groups: dict) -> dict:
+            return {group: {phase: phases[phase].summary(percentiles) for phase in PHASES if phase in phases}
+                    for group, phases in sorted(groups.items())}
+
+        return {'order_type': summarize(by_type), 'instrument': summarize(by_instrument)}
+
+    def reset(self):
+        """Drops all recorded latencies"""
+        self._histograms.clear()
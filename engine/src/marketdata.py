@@ -0,0 +1,171 @@
+from engine.src.enums import Side
+
+
+class LevelUpdate:
+    """New displayed quantity of a price level, quantity 0 means the level is gone"""
+    __slots__ = ('instrument', 'side', 'price', 'displayed_quantity', 'sequence')
+
+    def __init__(self, instrument: str, side: Side, price: float, displayed_quantity: int, sequence: int):
+        self.instrument = instrument
+        self.side = side
+        self.price = price
+        self.displayed_quantity = displayed_quantity
+        # Engine's sequence number after the event which changed the level
+        self.sequence = sequence
+
+    def __repr__(self):
+        return f'{self.instrument} {self.side.name} {self.price}: {self.displayed_quantity}'
+
+
+class TopOfBook:
+    """Best bid and ask of an instrument, prices are None when the side is empty"""
+    __slots__ = ('instrument', 'bid_price', 'bid_quantity', 'ask_price', 'ask_quantity', 'sequence')
+
+    def __init__(self,
+                 instrument: str,
+                 bid_price: float,
+                 bid_quantity: int,
+                 ask_price: float,
+                 ask_quantity: int,
+                 sequence: int):
+
+        self.instrument = instrument
+        self.bid_price = bid_price
+        self.bid_quantity = bid_quantity
+        self.ask_price = ask_price
+        self.ask_quantity = ask_quantity
+        self.sequence = sequence
+
+    def __repr__(self):
+        return f'{self.instrument} {self.bid_quantity} @ {self.bid_price} / {self.ask_quantity} @ {self.ask_price}'
+
+    def same_quote(self, other) -> bool:
+        return other is not None and \
+            (self.bid_price, self.bid_quantity, self.ask_price, self.ask_quantity) == \
+            (other.bid_price, other.bid_quantity, other.ask_price, other.ask_quantity)
+
+
+class ConflatedTopOfBook:
+    """
+    Top-of-book subscription keeping only the latest quote of every instrument, so a slow consumer gets
+    the current state when it polls instead of a growing backlog of quotes
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    def __len__(self):
+        """Number of instruments with a quote not polled yet"""
+        return len(self._pending)
+
+    def update(self, top: TopOfBook):
+        self._pending[top.instrument] = top
+
+    def poll(self) -> list:
+        """
+        Takes the quotes which changed since the last poll
+
+        :return: list of TopOfBook, at most one per instrument
+        """
+        tops = list(self._pending.values())
+        self._pending.clear()
+        return tops
+
+
+class MarketDataFeed:
+    """
+    Level 2 market data of the engine's OrderBooks. After every inbound event (new order including the stop orders
+    it triggered, cancel, modification) the engine publishes the levels whose displayed quantity changed, so
+    publishing costs O(levels changed). Prices are presented in the outside world units.
+
+    Subscribers either receive every list of LevelUpdates synchronously, or subscribe to the conflated top of book
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._top_subscriptions = []
+        # Instrument -> last published TopOfBook
+        self._tops = {}
+
+    def subscribe(self, callback):
+        """
+        Subscribes to the incremental level updates
+
+        :param callback: Called with the list of LevelUpdates of every event which changed the displayed book
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def subscribe_top_of_book(self) -> ConflatedTopOfBook:
+        """
+        Subscribes to the conflated top of book
+
+        :return: ConflatedTopOfBook to be polled
+        """
+        subscription = ConflatedTopOfBook()
+        for top in self._tops.values():
+            subscription.update(top)
+        self._top_subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe_top_of_book(self, subscription: ConflatedTopOfBook):
+        self._top_subscriptions.remove(subscription)
+
+    def top_of_book(self, instrument: str):
+        """Gets the last published TopOfBook of the instrument or None"""
+        return self._tops.get(instrument)
+
+    def book_levels(self, book, sequence: int = 0) -> list:
+        """
+        Gets all displayed levels of the OrderBook as LevelUpdates, e.g. the initial state of a new subscriber
+
+        :param book: OrderBook of the instrument
+        :param sequence: Engine's current sequence number
+        :return: list of LevelUpdates, bids then asks from the best to the worst price
+        """
+        to_price = book.spec.to_price if book.spec is not None else None
+        return [LevelUpdate(book.instrument, side.side, to_price(level.price) if to_price else level.price,
+                            level.displayed_quantity, sequence)
+                for side in (book.bid_side, book.ask_side) for level in side.levels()]
+
+    def publish(self, book, sequence: int):
+        """
+        Publishes the changes of the OrderBook since its last publication
+
+        :param book: OrderBook of the instrument, tracking its changes
+        :param sequence: Engine's current sequence number
+        """
+        bids, asks = book.pop_changes()
+        if not bids and not asks:
+            return
+
+        instrument = book.instrument
+        if self._subscribers:
+            to_price = book.spec.to_price if book.spec is not None else None
+            updates = [LevelUpdate(instrument, Side.BUY, to_price(price) if to_price else price, quantity, sequence)
+                       for price, quantity in bids]
+            updates.extend(LevelUpdate(instrument, Side.SELL, to_price(price) if to_price else price, quantity,
+                                       sequence) for price, quantity in asks)
+            for callback in self._subscribers:
+                callback(updates)
+
+        top = self._top(book, sequence)
+        if not top.same_quote(self._tops.get(instrument)):
+            self._tops[instrument] = top
+            for subscription in self._top_subscriptions:
+                subscription.update(top)
+
+    @staticmethod
+    def _top(book, sequence: int) -> TopOfBook:
+        to_price = book.spec.to_price if book.spec is not None else None
+        bid, ask = book.bid_side.best_level(), book.ask_side.best_level()
+        bid_price = None if bid is None else to_price(bid.price) if to_price else bid.price
+        ask_price = None if ask is None else to_price(ask.price) if to_price else ask.price
+        return TopOfBook(book.instrument,
+                         bid_price,
+                         bid.displayed_quantity if bid is not None else 0,
+                         ask_price,
+                         ask.displayed_quantity if ask is not None else 0,
+                         sequence)
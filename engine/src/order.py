@@ -1,10 +1,71 @@
-from datetime import datetime
-import math
-from random import randint
-from engine.src.enums import Side, OrderType
+from itertools import count
+import sys
+from engine.src.enums import Side, OrderType, TimeInForce
+
+# Sequence used to generate unique order IDs
+_order_ids = count(1)
+_order_id_step = 1
+
+# Integer price sentinels of MARKET orders, beyond any valid price so they cross every level of the OrderBook
+MARKET_BUY_PRICE = sys.maxsize
+MARKET_SELL_PRICE = 0
+
+
+def reset_order_ids(start: int = 1, step: int = 1):
+    """
+    Restarts the sequence of generated order IDs, e.g. to give each engine process its own disjoint set of IDs
+    or to continue the sequence of a restored engine
+
+    :param start: Next generated ID
+    :param step: Difference between two consecutive IDs
+    """
+    global _order_ids, _order_id_step
+    _order_ids = count(start, step)
+    _order_id_step = step
+
+
+def next_order_id() -> int:
+    """Gets the ID the next created order will get, without consuming it"""
+    value = next(_order_ids)
+    reset_order_ids(value, _order_id_step)
+    return value
+
+
+def advance_order_ids(last_id: int):
+    """
+    Moves the sequence of generated order IDs past the given ID, e.g. after restoring or replaying orders with their
+    recorded IDs. The sequence never moves backwards, so the IDs other engines of the process already use are not
+    generated again, and keeps its step, so the disjoint sequences of the shards stay disjoint
+
+    :param last_id: Highest ID in use
+    """
+    value = next_order_id()
+    if value <= last_id:
+        reset_order_ids(value + -(-(last_id + 1 - value) // _order_id_step) * _order_id_step, _order_id_step)
+
+
+def order_key(order_id) -> int:
+    """
+    Converts an order ID, given either as the numeric ID or as its string form (e.g. 'o000042'),
+    to the key used by the order indexes
+
+    :param order_id: Order ID to be converted
+    :return: int, or None if the ID is malformed
+    """
+    if isinstance(order_id, int):
+        return order_id
+    try:
+        return int(order_id[1:])
+    except (TypeError, ValueError):
+        return None
 
 
 class Order:
+    # Slots keep the per-order memory footprint small, the OrderBook may hold millions of working orders
+    __slots__ = ('client_id', 'instrument', 'order_type', 'side', 'total_quantity', 'id', 'iceberg_flag',
+                 'displayed_quantity', 'show_quantity', 'fok_flag', 'stop_flag', 'trigger_price', 'sequence',
+                 'timestamp', 'price', 'time_in_force', 'expire_time', '_level', '_prev', '_next')
+
     def __init__(self,
                  client_id: str,
                  instrument: str,
@@ -16,17 +77,19 @@ class Order:
                  displayed_quantity: int,
                  fok_flag: bool,
                  stop_flag: bool,
-                 trigger_price: float):
+                 trigger_price: float,
+                 time_in_force: TimeInForce = TimeInForce.GTC,
+                 expire_time: int = None):
 
-        # Obligatory variables
-        self.client_id = client_id
-        self.instrument = instrument
+        # Obligatory variables, IDs are interned so all orders of a client/instrument share a single string
+        self.client_id = sys.intern(client_id)
+        self.instrument = sys.intern(instrument)
         self.order_type = order_type
         self.side = side
         self.total_quantity = total_quantity
 
         # ID generated just for simulation purposes, in PROD this should be communicated with the database
-        self.order_id = f'o{randint(0, 100000):06}'
+        self.id = next(_order_ids)
 
         # Variables necessary for the iceberg orders
         self.iceberg_flag = iceberg_flag
@@ -42,12 +105,25 @@ class Order:
         if self.stop_flag:
             assert self.trigger_price, 'Trigger price needs to be defined for STOP orders'
 
-        # Order creation timestamp necessary for queuing the orders in OrderBook
-        self.timestamp = datetime.now().strftime("%H:%M:%S.%f")
+        # Time in force and the expiry time (engine's clock ns) of Good-Till-Date orders
+        self.time_in_force = time_in_force
+        self.expire_time = expire_time
+        if time_in_force == TimeInForce.GTD:
+            assert expire_time is not None, 'Expiry time needs to be defined for GTD orders'
+
+        # Sequence number and clock timestamp (ns) stamped by the engine when the order arrives,
+        # the sequence number determines the order's time priority
+        self.sequence = 0
+        self.timestamp = 0
 
-        # For MARKET order price is either infinity (bid) or 0 (ask)
+        # Links to the price level queue the order is working in, maintained by the OrderBook
+        self._level = None
+        self._prev = None
+        self._next = None
+
+        # For MARKET order price is either the highest possible price (bid) or 0 (ask)
         if self.order_type == OrderType.MARKET:
-            self.price = math.inf if side == Side.BUY else 0
+            self.price = MARKET_BUY_PRICE if side == Side.BUY else MARKET_SELL_PRICE
 
         elif self.order_type == OrderType.LIMIT:
             assert price, f'Price needs to be defined for the {self.order_type} order'
@@ -61,6 +137,20 @@ class Order:
         assert self.displayed_quantity <= self.total_quantity, 'Displayed quantity cannot be larger than real order size'
         assert self.displayed_quantity > 0, 'Displayed quantity has to be at least 1'
 
+    def __getstate__(self):
+        # Links to the OrderBook's level queue are not part of the order's state
+        return {name: getattr(self, name) for name in self.__slots__ if name not in ('_level', '_prev', '_next')}
+
+    def __setstate__(self, state: dict):
+        self._level = self._prev = self._next = None
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
+    def order_id(self) -> str:
+        """String form of the order's ID, only formatted when read"""
+        return f'o{self.id:06}'
+
     def __repr__(self):
         return f'ID: {self.order_id}, Instrument: {self.instrument}, Type: {self.order_type}, Price: {self.price}, ' \
                f'Quantity: {self.total_quantity}'
@@ -69,6 +159,97 @@ class Order:
         """Function deactivates the flag enabling the engine to process the order when the trigger price gets traded"""
         self.stop_flag = False
 
-    def update_timestamp(self):
-        """Function used to update order's timestamp in case it's modified"""
-        self.timestamp = datetime.now().strftime("%H:%M:%S.%f")
+    def fill(self, quantity: int):
+        """
+        Function reduces the quantity of the order working in the OrderBook after it was partially traded
+
+        :param quantity: Traded quantity, smaller than the order's total quantity
+        """
+        self.total_quantity -= quantity
+
+        # Special logic for passive iceberg orders to have the proper qty displayed in the OrderBook
+        if self.iceberg_flag is True:
+            if quantity < self.show_quantity:
+                self.show_quantity -= quantity
+            else:
+                qty = quantity - self.displayed_quantity
+                self.show_quantity -= qty
+        else:
+            self.show_quantity -= quantity
+
+    def modify(self, price: float, total_quantity: int, displayed_quantity: int = None):
+        """
+        Function used to change the price and/or quantity of the order
+
+        :param price: New order price
+        :param total_quantity: New order quantity
+        :param displayed_quantity: New displayed quantity (applicable only to Iceberg orders)
+        """
+        assert total_quantity > 0, 'Quantity has to be positive'
+        self.price, self.total_quantity = price, total_quantity
+
+        if self.iceberg_flag is True:
+            if displayed_quantity:
+                self.displayed_quantity = self.show_quantity = displayed_quantity
+            self.displayed_quantity = min(self.displayed_quantity, total_quantity)
+            self.show_quantity = min(self.show_quantity, total_quantity)
+        else:
+            self.displayed_quantity = self.show_quantity = total_quantity
+
+    def update_timestamp(self, sequence: int, timestamp: int):
+        """
+        Function used to stamp the order when it reaches the engine or when it's modified and loses its priority
+
+        :param sequence: Engine's sequence number
+        :param timestamp: Engine's clock time in nanoseconds
+        """
+        self.sequence = sequence
+        self.timestamp = timestamp
+
+
+class OrderPool:
+    """
+    Free list of Orders for the engine's pooled mode. Orders which left the engine (fully filled, killed or cancelled)
+    are released to the pool and re-initialized for new orders, so sustained order flow does not allocate an Order
+    per inbound order
+    """
+
+    def __init__(self, capacity: int = 65536):
+        """
+        :param capacity: Maximum number of free Orders kept
+        """
+        assert capacity > 0, 'Pool capacity has to be positive'
+        self.capacity = capacity
+        self._free = []
+        # Orders allocated by the pool and re-used from its free list
+        self.created = 0
+        self.reused = 0
+
+    def __len__(self):
+        """Number of free Orders"""
+        return len(self._free)
+
+    def acquire(self, *args) -> Order:
+        """
+        Gets an Order initialized with the given parameters, re-using a free one if available
+
+        :param args: Parameters of Order.__init__
+        :return: Order
+        """
+        if self._free:
+            order = self._free.pop()
+            order.__init__(*args)
+            self.reused += 1
+            return order
+        self.created += 1
+        return Order(*args)
+
+    def release(self, order: Order):
+        """
+        Returns the Order which left the engine to the free list, it must not be referenced by the OrderBooks
+        or the stop queues anymore
+
+        :param order: Order to be re-used
+        """
+        if len(self._free) < self.capacity:
+            self._free.append(order)
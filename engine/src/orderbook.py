@@ -1,12 +1,398 @@
-from collections import defaultdict
+from array import array
+from bisect import bisect_left, bisect_right, insort
 from itertools import zip_longest
 import math
 from engine.src.enums import Side
-from engine.src.order import Order
+from engine.src.instrument import InstrumentSpec
+from engine.src.order import Order, order_key
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional, depth arrays fall back to the standard library arrays
+    numpy = None
+
+
+class PriceLevel:
+    """
+    FIFO queue of all the orders working at a single price, kept as a doubly-linked list of orders.
+    The level keeps running totals of its orders' total and displayed quantities
+    """
+    __slots__ = ('price', 'head', 'tail', '_count', 'total_quantity', 'displayed_quantity')
+
+    def __init__(self, price: float):
+        self.price = price
+        self.head = None
+        self.tail = None
+        self._count = 0
+        self.total_quantity = 0
+        self.displayed_quantity = 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        order = self.head
+        while order is not None:
+            # Next link is read before yielding, so the current order can be removed while iterating
+            next_order = order._next
+            yield order
+            order = next_order
+
+    def __repr__(self):
+        return f'Price: {self.price}, Orders: {self._count}'
+
+    def __getstate__(self):
+        # Orders are pickled without their links, the queue is relinked from their order
+        return self.price, list(self)
+
+    def __setstate__(self, state: tuple):
+        price, orders = state
+        self.__init__(price)
+        for order in orders:
+            self.append(order)
+
+    def append(self, order: Order):
+        """
+        Adds the order at the back of the queue
+
+        :param order: Order object to be queued
+        """
+        order._level = self
+        order._prev = self.tail
+        order._next = None
+        if self.tail is None:
+            self.head = order
+        else:
+            self.tail._next = order
+        self.tail = order
+        self._count += 1
+        self.total_quantity += order.total_quantity
+        self.displayed_quantity += order.show_quantity
+
+    def remove(self, order: Order):
+        """
+        Unlinks the order from the queue, wherever it is placed
+
+        :param order: Order object to be removed
+        """
+        if order._prev is None:
+            self.head = order._next
+        else:
+            order._prev._next = order._next
+        if order._next is None:
+            self.tail = order._prev
+        else:
+            order._next._prev = order._prev
+        order._level = order._prev = order._next = None
+        self._count -= 1
+        self.total_quantity -= order.total_quantity
+        self.displayed_quantity -= order.show_quantity
+
+    def fill(self, order: Order, quantity: int):
+        """
+        Reduces the quantity of the order working at the level after it was partially traded
+
+        :param order: Order object which traded
+        :param quantity: Traded quantity
+        """
+        show_quantity = order.show_quantity
+        order.fill(quantity)
+        self.total_quantity -= quantity
+        self.displayed_quantity += order.show_quantity - show_quantity
+
+
+class BookSide:
+    """
+    One side of the OrderBook: a sorted index of distinct price levels with a FIFO queue of orders at each level.
+    Level keys are stored in ascending order with the best level always at the end of the index
+    (prices for bids, negated prices for asks), so both the best level lookup and its removal are O(1).
+
+    Levels emptied away from the top of the book are left in the index and dropped lazily once they reach
+    the top or once they make up half of the index, so removing any order is O(1) regardless of the book depth
+    """
+
+    def __init__(self, side: Side, index: dict = None, clients: dict = None, int_prices: bool = False):
+        self.side = side
+        # Prices are integer ticks (OrderBooks of instruments with a spec), floats otherwise
+        self._int_prices = int_prices
+        self._sign = 1 if side == Side.BUY else -1
+        self._levels = {}
+        self._keys = []
+        self._count = 0
+        self._empty_levels = 0
+        # Order ID -> Order index, shared by both sides of the OrderBook
+        self._index = index if index is not None else {}
+        # Client ID -> instrument -> order ID -> Order index, may be shared by all OrderBooks of the engine
+        self._clients = clients if clients is not None else {}
+        # Price -> displayed quantity before the first change of the level since the changes were last collected,
+        # None unless the changes are tracked
+        self._changes = None
+        # Number of levels -> cached depth arrays, and the key of the worst level any of them covers,
+        # a change at or above it invalidates the cache (None when nothing is cached)
+        self._depth = {}
+        self._depth_bound = None
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        """Iterates over all orders in priority order"""
+        for level in self.levels():
+            yield from level
+
+    def __contains__(self, order: Order):
+        return self._index.get(order.id) is order and order.side == self.side
+
+    def levels(self):
+        """Iterates over the non-empty price levels from the best to the worst price"""
+        levels = self._levels
+        for key in reversed(self._keys):
+            level = levels[key * self._sign]
+            if level:
+                yield level
+
+    def best_level(self):
+        """Gets the best price level or None if the side is empty"""
+        keys = self._keys
+        while keys:
+            level = self._levels[keys[-1] * self._sign]
+            if level:
+                return level
+            # Drop the empty level left behind by a removal
+            keys.pop()
+            del self._levels[level.price]
+            self._empty_levels -= 1
+        return None
+
+    def best(self):
+        """Gets the order with the highest priority or None if the side is empty"""
+        level = self.best_level()
+        return level.head if level is not None else None
+
+    def orders_between(self, min_price: float = None, max_price: float = None) -> list:
+        """
+        Gets the orders with prices within the range, only the levels within the range are visited
+
+        :param min_price: Lowest price, unbounded if not given
+        :param max_price: Highest price, unbounded if not given
+        :return: list of Orders from the best to the worst price
+        """
+        low = -math.inf if min_price is None else min_price
+        high = math.inf if max_price is None else max_price
+        if low > high:
+            return []
+        # Keys are negated prices for asks
+        start, stop = (low, high) if self._sign == 1 else (-high, -low)
+        keys = self._keys
+        levels = self._levels
+        orders = []
+        for idx in range(bisect_right(keys, stop) - 1, bisect_left(keys, start) - 1, -1):
+            orders.extend(levels[keys[idx] * self._sign])
+        return orders
+
+    def get_level(self, price: float):
+        """Gets the price level at the given price or None if there are no orders at it"""
+        level = self._levels.get(price)
+        return level if level else None
+
+    def quantity_to(self, price: float, limit: int = None, displayed: bool = False) -> int:
+        """
+        Sums up the quantity of all levels from the best price until the given price, only the levels
+        within that range are visited
+
+        :param price: Price until which the levels should be summed up
+        :param limit: Optional quantity after which the summing stops early
+        :param displayed: If True sums up the displayed quantity instead of the total quantity
+        :return: int
+        """
+        bound = price * self._sign
+        levels = self._levels
+        qty = 0
+        for key in reversed(self._keys):
+            if key < bound:
+                break
+            level = levels[key * self._sign]
+            qty += level.displayed_quantity if displayed else level.total_quantity
+            if limit is not None and qty >= limit:
+                break
+        return qty
+
+    def add(self, order: Order):
+        """
+        Queues the order at the back of its price level, creating the level if necessary
+
+        :param order: Order object to be added
+        """
+        level = self._levels.get(order.price)
+        if level is None:
+            level = self._levels[order.price] = PriceLevel(order.price)
+            insort(self._keys, order.price * self._sign)
+        elif not level:
+            self._empty_levels -= 1
+        changes = self._changes
+        if changes is not None and order.price not in changes:
+            changes[order.price] = level.displayed_quantity
+        if self._depth_bound is not None and order.price * self._sign >= self._depth_bound:
+            self._clear_depth()
+        level.append(order)
+        self._index[order.id] = order
+        self._count += 1
+        instruments = self._clients.get(order.client_id)
+        if instruments is None:
+            instruments = self._clients[order.client_id] = {}
+        client_orders = instruments.get(order.instrument)
+        if client_orders is None:
+            client_orders = instruments[order.instrument] = {}
+        client_orders[order.id] = order
+
+    def remove(self, order: Order):
+        """
+        Removes the order from its price level
+
+        :param order: Order object to be removed
+        """
+        level = order._level
+        changes = self._changes
+        if changes is not None and level.price not in changes:
+            changes[level.price] = level.displayed_quantity
+        if self._depth_bound is not None and level.price * self._sign >= self._depth_bound:
+            self._clear_depth()
+        level.remove(order)
+        del self._index[order.id]
+        self._count -= 1
+        instruments = self._clients[order.client_id]
+        client_orders = instruments[order.instrument]
+        del client_orders[order.id]
+        if not client_orders:
+            del instruments[order.instrument]
+            if not instruments:
+                del self._clients[order.client_id]
+        if not level:
+            if self._keys[-1] == level.price * self._sign:
+                self._keys.pop()
+                del self._levels[level.price]
+            else:
+                self._empty_levels += 1
+                if self._empty_levels > 16 and self._empty_levels * 2 > len(self._keys):
+                    self._compact()
+
+    def fill(self, order: Order, quantity: int):
+        """
+        Reduces the quantity of the working order after it was partially traded
+
+        :param order: Order object which traded
+        :param quantity: Traded quantity
+        """
+        level = order._level
+        changes = self._changes
+        if changes is not None and level.price not in changes:
+            changes[level.price] = level.displayed_quantity
+        if self._depth_bound is not None and level.price * self._sign >= self._depth_bound:
+            self._clear_depth()
+        level.fill(order, quantity)
+
+    def depth(self, n: int) -> tuple:
+        """
+        Gets the top levels as numeric arrays (NumPy arrays if NumPy is installed, array.array otherwise).
+        The result is cached until an order touches one of the covered levels, the arrays must not be modified
+
+        :param n: Maximum number of levels
+        :return: tuple of the price, displayed quantity and total quantity arrays from the best to the worst price
+        """
+        cached = self._depth.get(n)
+        if cached is not None:
+            return cached
+
+        prices, displayed, total = [], [], []
+        for level in self.levels():
+            if len(prices) == n:
+                break
+            prices.append(level.price)
+            displayed.append(level.displayed_quantity)
+            total.append(level.total_quantity)
+
+        # Fewer than n levels, a new level anywhere would be covered
+        bound = prices[-1] * self._sign if len(prices) == n and prices else -math.inf
+        price_type = 'q' if self._int_prices else 'd'
+        depth = self._depth[n] = (_array(price_type, prices), _array('q', displayed), _array('q', total))
+        self._depth_bound = bound if self._depth_bound is None else min(self._depth_bound, bound)
+        return depth
+
+    def _clear_depth(self):
+        self._depth.clear()
+        self._depth_bound = None
+
+    def track_changes(self):
+        """Starts tracking the changes of the levels' displayed quantities, see pop_changes"""
+        if self._changes is None:
+            self._changes = {}
+
+    def pop_changes(self) -> list:
+        """
+        Collects the levels whose displayed quantity changed since the last call. Only the levels touched
+        in the meantime are visited
+
+        :return: list of (price, displayed quantity) tuples in the order the levels were first touched,
+                 quantity 0 means the level is gone
+        """
+        changes = self._changes
+        if not changes:
+            return []
+        self._changes = {}
+        levels = self._levels
+        updates = []
+        for price, displayed_before in changes.items():
+            level = levels.get(price)
+            displayed = level.displayed_quantity if level is not None else 0
+            if displayed != displayed_before:
+                updates.append((price, displayed))
+        return updates
+
+    def load(self, levels):
+        """
+        Bulk-loads the price levels into the empty side, e.g. when restoring a snapshot. The levels are already
+        in the priority order, so nothing has to be sorted
+
+        :param levels: Iterable of (price, orders) tuples from the best to the worst price, with the orders of each
+                       level in their time priority
+        """
+        assert not self._levels, 'Only an empty side can be loaded'
+        sign = self._sign
+        index = self._index
+        clients = self._clients
+        for price, orders in levels:
+            level = self._levels[price] = PriceLevel(price)
+            self._keys.append(price * sign)
+            for order in orders:
+                level.append(order)
+                index[order.id] = order
+                clients.setdefault(order.client_id, {}).setdefault(order.instrument, {})[order.id] = order
+            self._count += len(level)
+        # Best level has to be at the end of the index
+        self._keys.reverse()
+
+    def _compact(self):
+        """Drops all empty levels from the index"""
+        self._levels = {price: level for price, level in self._levels.items() if level}
+        self._keys = [key for key in self._keys if key * self._sign in self._levels]
+        self._empty_levels = 0
+
+
+def _array(typecode: str, values: list):
+    if numpy is None:
+        return array(typecode, values)
+    values = numpy.array(values, dtype=numpy.int64 if typecode == 'q' else numpy.float64)
+    values.flags.writeable = False
+    return values
 
 
 class OrderBook:
-    def __init__(self, instrument: str, bids: list = None, asks: list = None):
+    def __init__(self,
+                 instrument: str,
+                 bids: list = None,
+                 asks: list = None,
+                 spec: InstrumentSpec = None,
+                 client_orders: dict = None):
 
         if bids is None:
             bids = []
@@ -14,33 +400,74 @@ class OrderBook:
             asks = []
 
         self.instrument = instrument
-
-        self._bids = sorted(bids, key=lambda order: (-order.price, order.timestamp))
-        self._asks = sorted(asks, key=lambda order: (order.price, order.timestamp))
+        # Trading parameters of instruments traded in integer ticks, used only to present the prices
+        self.spec = spec
+
+        # Order ID -> Order index of all working orders, maintained by both sides of the book
+        self._orders = {}
+        # Client ID -> instrument -> order ID -> Order index of the working orders, the engine shares one
+        # among all its OrderBooks
+        self._client_orders = client_orders if client_orders is not None else {}
+        self._bids = BookSide(Side.BUY, self._orders, self._client_orders, int_prices=spec is not None)
+        self._asks = BookSide(Side.SELL, self._orders, self._client_orders, int_prices=spec is not None)
+
+        for order in sorted(bids, key=lambda order: order.sequence):
+            self._bids.add(order)
+        for order in sorted(asks, key=lambda order: order.sequence):
+            self._asks.add(order)
 
     def __len__(self):
         return len(self._bids) + len(self._asks)
 
     @property
     def bids(self):
-        return self._bids
+        return list(self._bids)
 
     @property
     def asks(self):
+        return list(self._asks)
+
+    @property
+    def bid_side(self):
+        return self._bids
+
+    @property
+    def ask_side(self):
         return self._asks
 
+    def load(self, bid_levels, ask_levels):
+        """
+        Bulk-loads the price levels into the empty OrderBook, see BookSide.load
+
+        :param bid_levels: Bid (price, orders) tuples from the best to the worst price
+        :param ask_levels: Ask (price, orders) tuples from the best to the worst price
+        """
+        self._bids.load(bid_levels)
+        self._asks.load(ask_levels)
+
+    def track_changes(self):
+        """Starts tracking the changes of the levels' displayed quantities on both sides, see pop_changes"""
+        self._bids.track_changes()
+        self._asks.track_changes()
+
+    def pop_changes(self) -> tuple:
+        """
+        Collects the levels whose displayed quantity changed since the last call, see BookSide.pop_changes
+
+        :return: tuple of the bid and ask (price, displayed quantity) lists
+        """
+        return self._bids.pop_changes(), self._asks.pop_changes()
+
     def add_order(self, order: Order):
         """
-        Adds the order to the OrderBook and sorts it
+        Adds the order to the back of the queue at its price level
 
         :param order: Order object to be added to the OrderBook
         """
         if order.side == Side.BUY:
-            self._bids.append(order)
-            self._bids.sort(key=lambda elem: (-elem.price, elem.timestamp))
+            self._bids.add(order)
         elif order.side == Side.SELL:
-            self._asks.append(order)
-            self._asks.sort(key=lambda elem: (elem.price, elem.timestamp))
+            self._asks.add(order)
 
     def remove_order(self, order: Order):
         """
@@ -53,6 +480,27 @@ class OrderBook:
         elif order.side == Side.SELL and order in self._asks:
             self._asks.remove(order)
 
+    def get_order(self, order_id):
+        """
+        Gets the working order with the given ID
+
+        :param order_id: ID of the searched order
+        :return: Order, or None if the order is not present in the OrderBook
+        """
+        return self._orders.get(order_key(order_id))
+
+    def cancel_order(self, order_id):
+        """
+        Removes the working order with the given ID from the OrderBook
+
+        :param order_id: ID of the order to be cancelled
+        :return: Cancelled Order, or None if the order is not present in the OrderBook
+        """
+        order = self._orders.get(order_key(order_id))
+        if order is not None:
+            self.remove_order(order)
+        return order
+
     def modify_order(self,
                      searched_id: str,
                      side: Side,
@@ -67,107 +515,84 @@ class OrderBook:
         :param modified_price: New order price
         :param modified_qty: New order quantity
         :param modified_disp_qty: New displayed quantity (applicable only to Iceberg orders)
+        :return: Modified Order, or None if the order is not present in the OrderBook
         """
-        if side == Side.BUY:
-            try:
-                # Search for the specific order
-                idx = self._bids.index(next(order for order in self._bids if order.order_id == searched_id))
-            except (ValueError, StopIteration):
-                print('Order not present in the order book')
-            else:
-                # Modify the order price and/or quantity
-                self._bids[idx].price, self._bids[idx].total_quantity = modified_price, modified_qty
-
-                if modified_disp_qty and self._bids[idx].iceberg_flag is True:
-                    self._bids[idx].displayed_quantity, self._bids[idx].show_quantity = modified_disp_qty
-
-                # As the order was modified, generate a new timestamp for it and sort the OrderBook
-                self._bids[idx].update_timestamp()
-                self._bids.sort(key=lambda order: (-order.price, order.timestamp))
-
-        elif side == Side.SELL:
-            try:
-                # Search for the specific order
-                idx = self._asks.index(next(order for order in self._asks if order.order_id == searched_id))
-            except (ValueError, StopIteration):
-                print('Order not present in the order book')
-            else:
-                # Modify the order price and/or quantity
-                self._asks[idx].price, self._asks[idx].total_quantity = modified_price, modified_qty
-
-                if modified_disp_qty and self._asks[idx].iceberg_flag is True:
-                    self._asks[idx].displayed_quantity, self._asks[idx].show_quantity = modified_disp_qty
+        order = self._orders.get(order_key(searched_id))
+        if order is None or order.side != side:
+            return None
 
-                # As the order was modified, generate a new timestamp for it and sort the OrderBook
-                self._asks[idx].update_timestamp()
-                self._asks.sort(key=lambda order: (order.price, order.timestamp))
+        # Modify the order price and/or quantity, the order loses its priority and goes to the back of the queue
+        book_side = self._bids if side == Side.BUY else self._asks
+        book_side.remove(order)
+        order.modify(modified_price, modified_qty, modified_disp_qty)
+        book_side.add(order)
+        return order
 
     def best_bid(self):
         """Gets the best working bid in the OrderBook"""
-        try:
-            return self._bids[0]
-        except IndexError:
-            return None
+        return self._bids.best()
 
     def best_ask(self):
         """Gets the best working ask in the OrderBook"""
-        try:
-            return self._asks[0]
-        except IndexError:
-            return None
+        return self._asks.best()
 
     def best_bid_price(self) -> float:
         """Gets the price of best bid"""
-        try:
-            return self._bids[0].price
-        except IndexError:
-            return 0
+        level = self._bids.best_level()
+        return level.price if level is not None else 0
 
     def best_ask_price(self) -> float:
         """Gets the price of best ask"""
-        try:
-            return self._asks[0].price
-        except IndexError:
-            return math.inf
+        level = self._asks.best_level()
+        return level.price if level is not None else math.inf
 
-    def get_level_quantity(self, side: Side, price: float) -> int:
-        """Method gets the lot quantity at the given price level"""
-        qty = 0
-        if side == Side.BUY:
-            for order in self._bids:
-                qty += order.total_quantity if order.price == price else 0
-        elif side == Side.Sell:
-            for order in self._asks:
-                qty += order.total_quantity if order.price == price else 0
-        return qty
+    def get_depth(self, n: int) -> tuple:
+        """
+        Gets the top n aggregated levels of both sides as numeric arrays, prices are in the OrderBook's units
+        (ticks for instruments with a spec). Results are cached, repeated reads between changes of those levels
+        return the same arrays, see BookSide.depth
+
+        :param n: Maximum number of levels per side
+        :return: tuple of the bid and ask (prices, displayed quantities, total quantities) tuples
+        """
+        return self._bids.depth(n), self._asks.depth(n)
+
+    def get_level_quantity(self, side: Side, price: float, displayed: bool = False) -> int:
+        """
+        Method gets the lot quantity at the given price level
 
-    def get_levels_quantity(self, side: Side, threshold_price: float) -> int:
+        :param side: Side of the OrderBook to search
+        :param price: Price of the level
+        :param displayed: If True returns the displayed quantity instead of the total quantity
+        :return: int
+        """
+        level = (self._bids if side == Side.BUY else self._asks).get_level(price)
+        if level is None:
+            return 0
+        return level.displayed_quantity if displayed else level.total_quantity
+
+    def get_levels_quantity(self, side: Side, threshold_price: float, displayed: bool = False) -> int:
         """
         Method sums up and returns the lot quantity for all levels until selected threshold_price.
         Necessary for proper processing of Fill-or-Kill orders
 
         :param side: Side of the OrderBook to search
         :param threshold_price: Price until which the OrderBook should be searched
+        :param displayed: If True sums up the displayed quantity instead of the total quantity
         :return: int
         """
-        qty = 0
-        if side == Side.BUY:
-            for order in self._bids:
-                qty += order.total_quantity if order.price >= threshold_price else 0
-        elif side == Side.SELL:
-            for order in self._asks:
-                qty += order.total_quantity if order.price <= threshold_price else 0
-        return qty
+        return (self._bids if side == Side.BUY else self._asks).quantity_to(threshold_price, displayed=displayed)
 
     def get_client_orders(self, searched_id: str) -> tuple:
         """
         Function returns all orders that are currently working for a given user
 
         :param searched_id: Client ID to be searched for
-        :return: tuple
+        :return: tuple of the client's bids and asks in the order they were added to the OrderBook
         """
-        bids = [order for order in self._bids if order.client_id == searched_id]
-        asks = [order for order in self._asks if order.client_id == searched_id]
+        orders = self._client_orders.get(searched_id, {}).get(self.instrument, {}).values()
+        bids = [order for order in orders if order.side == Side.BUY]
+        asks = [order for order in orders if order.side == Side.SELL]
         return bids, asks
 
     def show_book(self, cumulative: bool = True):
@@ -184,32 +609,22 @@ class OrderBook:
         print("| Quantity | Price   |  Price  | Quantity |")
         print("+----------+---------+---------+----------+")
 
-        if cumulative:
-            grouped_bids = defaultdict(list)
-            grouped_asks = defaultdict(list)
-
-            for order in self._bids:
-                grouped_bids[order.price].append(order)
+        to_price = self.spec.to_price if self.spec is not None else lambda px: px
 
-            for order in self._asks:
-                grouped_asks[order.price].append(order)
-
-            grouped_bids = sorted(grouped_bids.items(), reverse=True)
-            grouped_asks = sorted(grouped_asks.items())
-
-            for bids, asks in zip_longest(grouped_bids, grouped_asks):
+        if cumulative:
+            for bids, asks in zip_longest(self._bids.levels(), self._asks.levels()):
                 if bids and asks:
-                    print(f"    {sum(bid.show_quantity for bid in bids[1])}        {bids[0]}      {asks[0]}        {sum(ask.show_quantity for ask in asks[1])}     ")
+                    print(f"    {bids.displayed_quantity}        {to_price(bids.price)}      {to_price(asks.price)}        {asks.displayed_quantity}     ")
                 elif bids:
-                    print(f"    {sum(bid.show_quantity for bid in bids[1])}        {bids[0]}                       ")
+                    print(f"    {bids.displayed_quantity}        {to_price(bids.price)}                       ")
                 elif asks:
-                    print(f"                        {asks[0]}        {sum(ask.show_quantity for ask in asks[1])}     ")
+                    print(f"                        {to_price(asks.price)}        {asks.displayed_quantity}     ")
 
         else:
             for bid, ask in zip_longest(self._bids, self._asks):
                 if bid and ask:
-                    print(f"    {bid.show_quantity}        {bid.price}      {ask.price}        {ask.show_quantity}     ")
+                    print(f"    {bid.show_quantity}        {to_price(bid.price)}      {to_price(ask.price)}        {ask.show_quantity}     ")
                 elif bid:
-                    print(f"    {bid.show_quantity}        {bid.price}                       ")
+                    print(f"    {bid.show_quantity}        {to_price(bid.price)}                       ")
                 elif ask:
-                    print(f"                        {ask.price}        {ask.show_quantity}     ")
+                    print(f"                        {to_price(ask.price)}        {ask.show_quantity}     ")
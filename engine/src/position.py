@@ -0,0 +1,114 @@
+from engine.src.enums import Side
+
+
+class Position:
+    """
+    Client's position in one instrument, updated on every fill. Prices and P&L are in the engine's price units
+    (ticks for instruments with a spec, see MatchingEngine.to_price)
+    """
+    __slots__ = ('client_id', 'instrument', 'quantity', 'average_price', 'realized_pnl', 'volume', 'trades')
+
+    def __init__(self, client_id: str, instrument: str):
+        self.client_id = client_id
+        self.instrument = instrument
+        # Net position, negative when short
+        self.quantity = 0
+        # Average cost of the open position, 0 when flat
+        self.average_price = 0
+        self.realized_pnl = 0
+        # Bought plus sold quantity
+        self.volume = 0
+        self.trades = 0
+
+    def __repr__(self):
+        return f'Client: {self.client_id}, Instrument: {self.instrument}, Position: {self.quantity} @ ' \
+               f'{self.average_price}, Realized P&L: {self.realized_pnl}, Volume: {self.volume}'
+
+    def fill(self, side: Side, price: float, quantity: int):
+        """
+        Updates the position with the client's fill in O(1). Fills reducing the position realize the P&L against
+        the average cost, a fill reversing it opens the rest at the fill price
+
+        :param side: Side of the client's order
+        :param price: Fill price
+        :param quantity: Filled quantity
+        """
+        signed = quantity if side == Side.BUY else -quantity
+        position = self.quantity
+        self.volume += quantity
+        self.trades += 1
+
+        if position == 0 or (position > 0) == (signed > 0):
+            self.average_price = (self.average_price * abs(position) + price * quantity) / abs(position + signed)
+        else:
+            closed = min(quantity, abs(position))
+            self.realized_pnl += (price - self.average_price) * (closed if position > 0 else -closed)
+            if quantity > abs(position):
+                self.average_price = price
+            elif quantity == abs(position):
+                self.average_price = 0
+        self.quantity = position + signed
+
+    def unrealized_pnl(self, price: float) -> float:
+        """
+        Gets the P&L of the open position marked at the given price
+
+        :param price: Mark price, e.g. the last traded price
+        :return: float
+        """
+        return (price - self.average_price) * self.quantity if self.quantity else 0
+
+
+class PositionBook:
+    """Per-client, per-instrument Positions of the engine's clients"""
+
+    def __init__(self):
+        # Client ID -> instrument -> Position
+        self._positions = {}
+
+    def __len__(self):
+        return sum(len(positions) for positions in self._positions.values())
+
+    def __iter__(self):
+        for positions in self._positions.values():
+            yield from positions.values()
+
+    def position(self, client_id: str, instrument: str) -> Position:
+        """
+        Gets the client's Position in the instrument, creating it if the client has not traded it yet
+
+        :return: Position
+        """
+        positions = self._positions.get(client_id)
+        if positions is None:
+            positions = self._positions[client_id] = {}
+        position = positions.get(instrument)
+        if position is None:
+            position = positions[instrument] = Position(client_id, instrument)
+        return position
+
+    def get(self, client_id: str, instrument: str):
+        """Gets the client's Position in the instrument or None if the client has not traded it"""
+        positions = self._positions.get(client_id)
+        return positions.get(instrument) if positions is not None else None
+
+    def client_positions(self, client_id: str) -> dict:
+        """
+        Gets all Positions of the client
+
+        :return: dict instrument -> Position
+        """
+        return dict(self._positions.get(client_id, {}))
+
+    def trade(self, instrument: str, price: float, quantity: int, client_id_b: str, client_id_a: str):
+        """
+        Updates the Positions of both counterparties of the trade
+
+        :param instrument: Traded instrument
+        :param price: Trade price
+        :param quantity: Traded quantity
+        :param client_id_b: Client of the buy order
+        :param client_id_a: Client of the sell order
+        """
+        self.position(client_id_b, instrument).fill(Side.BUY, price, quantity)
+        self.position(client_id_a, instrument).fill(Side.SELL, price, quantity)
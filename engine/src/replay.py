@@ -0,0 +1,374 @@
+"""
+Streaming historical replay of order events through the Matching Engine, e.g. for backtests.
+
+Events are read lazily, fed to the engine on a simulated clock set to every event's timestamp, and the fills and
+book level updates they produce are written to the output file as they happen, so the memory used does not depend
+on the length of the input. Events are tuples (timestamp, reference, message type, fields) with the codec's message
+types and fields (see codec.decode), the same shape Journal.read produces. Orders are identified by the integer
+references of the source, the replay maps them to the engine's order IDs.
+
+Input formats:
+* CSV with a header row naming the columns, missing columns are empty:
+
+      timestamp,event,reference,instrument,client_id,order_type,side,quantity,price,displayed_quantity,
+      trigger_price,time_in_force,expire_time
+
+  event is one of new, cancel, modify, auction_start and auction_end. A displayed quantity makes the order an
+  iceberg, a trigger price makes it a stop, time in force FOK makes it fill-or-kill. Cancels refer to the order
+  by its reference, modifications give the new price, quantity and displayed quantity.
+* Binary records in the Journal's layout, a header (size, checksum, timestamp, reference of a new order) and the codec
+  message, with the references in place of the order IDs and the prices in the outside world units.
+
+Output is a CSV file of the rows
+
+    fill,timestamp,trade number,instrument,price,quantity,aggressor side,buy reference,sell reference
+    level,timestamp,instrument,side,price,displayed quantity (0 when the level is gone)
+
+Usage: python -m engine.src.replay INPUT [--output FILE] [--speed X] [--no-levels] [--convert FILE]
+"""
+import argparse
+import csv
+import json
+import time
+
+from engine.matching_engine import MatchingEngine
+from engine.src import codec
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType, TimeInForce
+from engine.src.journal import Journal, MAX_RECORD_SIZE, pack_record
+from engine.src.marketdata import MarketDataFeed
+from engine.src.order import order_key
+
+CSV_COLUMNS = ('timestamp', 'event', 'reference', 'instrument', 'client_id', 'order_type', 'side', 'quantity',
+               'price', 'displayed_quantity', 'trigger_price', 'time_in_force', 'expire_time')
+
+
+
+def read_csv(path: str):
+    """
+    Reads the events of a CSV file row by row
+
+    :param path: Path of the CSV file
+    :return: generator of (timestamp, reference, message type, fields) tuples
+    """
+    with open(path, newline='') as file:
+        rows = csv.reader(file)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = {name.strip(): idx for idx, name in enumerate(header)}
+        # Missing columns point right behind the row, where the rows are padded with an empty value
+        width = len(header) + 1
+        pick = [columns.get(name, len(header)) for name in CSV_COLUMNS]
+        for row in rows:
+            if not row:
+                continue
+            row.extend([''] * (width - len(row)))
+            try:
+                yield _parse(*[row[idx] for idx in pick])
+            except (KeyError, ValueError) as error:
+                raise ValueError(f'Invalid replay event on line {rows.line_num} of {path}: {error!r}') from None
+
+
+def _parse(timestamp, event, reference, instrument, client_id, order_type, side, quantity, price, displayed_quantity,
+           trigger_price, time_in_force, expire_time) -> tuple:
+    if event == 'new':
+        fok = time_in_force == 'FOK'
+        return (int(timestamp), int(reference), codec.NEW_ORDER,
+                (client_id,
+                 instrument,
+                 OrderType[order_type],
+                 Side[side],
+                 int(quantity),
+                 float(price) if price else None,
+                 bool(displayed_quantity),
+                 int(displayed_quantity) if displayed_quantity else None,
+                 fok,
+                 bool(trigger_price),
+                 float(trigger_price) if trigger_price else None,
+                 TimeInForce[time_in_force] if time_in_force and not fok else TimeInForce.GTC,
+                 int(expire_time) if expire_time else None))
+    if event == 'cancel':
+        return int(timestamp), 0, codec.CANCEL, (instrument, int(reference))
+    if event == 'modify':
+        return (int(timestamp), 0, codec.MODIFY,
+                (instrument, int(reference), float(price), int(quantity),
+                 int(displayed_quantity) if displayed_quantity else None))
+    if event in ('auction_start', 'auction_end'):
+        return int(timestamp), 0, codec.AUCTION, (instrument, event == 'auction_start')
+    raise ValueError(f'Unknown event {event}')
+
+
+def read_binary(path: str):
+    """
+    Reads the events of a binary file through a memory map
+
+    :param path: Path of the binary file
+    :return: generator of (timestamp, reference, message type, fields) tuples
+    """
+    return Journal.read(path)
+
+
+def read_events(path: str):
+    """Reads the events of a CSV (.csv extension) or a binary file"""
+    return read_csv(path) if path.lower().endswith('.csv') else read_binary(path)
+
+
+def write_csv(events, path: str) -> int:
+    """
+    Writes the events as a CSV file, e.g. to convert a binary file
+
+    :param events: Iterable of (timestamp, reference, message type, fields) tuples
+    :param path: Path of the CSV file
+    :return: int, number of written events
+    """
+    count = 0
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_COLUMNS)
+        for timestamp, reference, message_type, fields in events:
+            if message_type == codec.NEW_ORDER:
+                (client_id, instrument, order_type, side, quantity, price, iceberg_flag, displayed_quantity, fok_flag,
+                 stop_flag, trigger_price, time_in_force, expire_time) = fields
+                writer.writerow((timestamp, 'new', reference, instrument, client_id, order_type.name, side.name,
+                                 quantity, _value(price), _value(displayed_quantity if iceberg_flag else None),
+                                 _value(trigger_price if stop_flag else None),
+                                 'FOK' if fok_flag else time_in_force.name, _value(expire_time)))
+            elif message_type == codec.CANCEL:
+                instrument, reference = fields
+                writer.writerow((timestamp, 'cancel', reference, instrument))
+            elif message_type == codec.MODIFY:
+                instrument, reference, price, quantity, displayed_quantity = fields
+                writer.writerow((timestamp, 'modify', reference, instrument, '', '', '', quantity, price,
+                                 _value(displayed_quantity)))
+            elif message_type == codec.AUCTION:
+                instrument, start = fields
+                writer.writerow((timestamp, 'auction_start' if start else 'auction_end', 0, instrument))
+            else:
+                raise ValueError(f'Message type {message_type} is not an inbound message')
+            count += 1
+    return count
+
+
+def _value(value):
+    return '' if value is None else value
+
+
+def write_binary(events, path: str) -> int:
+    """
+    Writes the events in the binary format, e.g. to convert a CSV file into the faster replayed form
+
+    :param events: Iterable of (timestamp, reference, message type, fields) tuples
+    :param path: Path of the binary file
+    :return: int, number of written events
+    """
+    encoders = {codec.NEW_ORDER: codec.encode_new_order,
+                codec.CANCEL: codec.encode_cancel,
+                codec.MODIFY: codec.encode_modify,
+                codec.AUCTION: codec.encode_auction}
+    buffer = bytearray(MAX_RECORD_SIZE)
+    view = memoryview(buffer)
+    count = 0
+    try:
+        with open(path, 'wb', buffering=1 << 20) as file:
+            for timestamp, reference, message_type, fields in events:
+                encode = encoders.get(message_type)
+                if encode is None:
+                    raise ValueError(f'Message type {message_type} is not an inbound message')
+                file.write(view[:pack_record(buffer, timestamp, reference, encode, *fields)])
+                count += 1
+    finally:
+        view.release()
+    return count
+
+
+class ReplayDriver:
+    """
+    Feeds a stream of events through the engine and streams the resulting fills and book level updates to a file.
+
+    The engine's clock is replaced by a simulated one for the replay, set to the timestamp of every event. Memory
+    stays bounded by the engine's working orders: the events are consumed one at a time, the output is written as
+    it's produced, and the references of the orders which stopped working are dropped from the reference map once it
+    doubles in size. The engine should keep a trade retention window (MatchingEngine(trade_retention=...)) larger than
+    the trades of any single event, otherwise its trade tape grows with the replayed history
+    """
+
+    def __init__(self,
+                 engine: MatchingEngine,
+                 output: str = None,
+                 levels: bool = True,
+                 speed: float = None,
+                 prune_size: int = 1 << 16):
+        """
+        :param engine: MatchingEngine the events are replayed through, must not be journaling
+        :param output: Path of the CSV file the fills and level updates are written to, None writes nothing
+        :param levels: Whether the book level updates are written, the engine gets a MarketDataFeed if it has none
+        :param speed: Replay speed as a multiple of the recorded pace, None replays at the maximum speed
+        :param prune_size: Size of the reference map first triggering the removal of the orders which stopped working
+        """
+        assert engine.journal is None, 'Engine replaying the events cannot be journaling'
+        assert speed is None or speed > 0, 'Replay speed has to be positive'
+        assert prune_size > 0, 'Prune size has to be positive'
+        self._engine = engine
+        self.output = output
+        self.levels = levels
+        self.speed = speed
+        # Reference -> (instrument, order ID) and order ID -> reference of the orders which may still be working
+        self._references = {}
+        self._order_refs = {}
+        # Size of the reference map triggering the removal of the orders which stopped working
+        self._prune_size = prune_size
+
+    @property
+    def engine(self):
+        return self._engine
+
+    @property
+    def references(self) -> int:
+        """Number of references currently mapped to the engine's order IDs"""
+        return len(self._references)
+
+    def run(self, events) -> dict:
+        """
+        Replays the events
+
+        :param events: Iterable of (timestamp, reference, message type, fields) tuples, e.g. read_events(path)
+        :return: dict with the replay statistics, including the events per second
+        """
+        engine = self._engine
+        clock = engine.clock
+        replay_clock = engine.clock = SimulatedClock()
+        feed = engine.feed
+        updates = []
+        if self.levels and self.output is not None:
+            if feed is None:
+                engine.feed = MarketDataFeed()
+            engine.feed.subscribe(updates.extend)
+        file = open(self.output, 'w', newline='', buffering=1 << 20) if self.output is not None else None
+        write = csv.writer(file).writerow if file is not None else None
+
+        tape = engine.trades
+        trade_count = tape.count
+        references, order_refs = self._references, self._order_refs
+        stats = dict.fromkeys(('events', 'orders', 'cancels', 'modifications', 'auctions', 'rejected', 'trades',
+                               'level_updates'), 0)
+        perf_counter_ns = time.perf_counter_ns
+        speed = self.speed
+        first_timestamp = None
+        start = perf_counter_ns()
+        try:
+            for timestamp, reference, message_type, fields in events:
+                if speed is not None:
+                    # Waits until the event is due at the replay pace
+                    if first_timestamp is None:
+                        first_timestamp = timestamp
+                    delay = start + (timestamp - first_timestamp) / speed - perf_counter_ns()
+                    if delay > 0:
+                        time.sleep(delay / 1e9)
+                replay_clock.set(timestamp)
+                stats['events'] += 1
+                finished = None
+                try:
+                    if message_type == codec.NEW_ORDER:
+                        stats['orders'] += 1
+                        order = engine.new_order(*fields)
+                        order_id = order.id
+                        references[reference] = (order.instrument, order_id)
+                        order_refs[order_id] = reference
+                        if engine.match_order(order).leaves_quantity == 0:
+                            # Fully filled, killed or rejected, forgotten once its fills are written
+                            finished = reference
+                    elif message_type == codec.CANCEL:
+                        stats['cancels'] += 1
+                        instrument, reference = fields
+                        entry = references.pop(reference, None)
+                        if entry is None or engine.cancel_order(instrument, entry[1]) is None:
+                            stats['rejected'] += 1
+                        else:
+                            order_refs.pop(entry[1], None)
+                    elif message_type == codec.MODIFY:
+                        stats['modifications'] += 1
+                        instrument, reference, price, quantity, displayed_quantity = fields
+                        entry = references.get(reference)
+                        if entry is None or \
+                                engine.modify_order(instrument, entry[1], price, quantity, displayed_quantity) is None:
+                            stats['rejected'] += 1
+                    elif message_type == codec.AUCTION:
+                        stats['auctions'] += 1
+                        instrument, begin = fields
+                        if begin:
+                            engine.start_auction(instrument)
+                        else:
+                            engine.end_auction(instrument)
+                except (AssertionError, ValueError):
+                    # Events the engine rejects, e.g. invalid orders or auctions of instruments not in the auction
+                    stats['rejected'] += 1
+
+                if tape.count != trade_count:
+                    trades = tape.trades_since(trade_count)
+                    stats['trades'] += tape.count - trade_count
+                    if write is not None:
+                        number = tape.count - len(trades)
+                        for trade in trades:
+                            number += 1
+                            write(('fill', trade.timestamp, number, trade.instrument,
+                                   engine.to_price(trade.instrument, trade.price), trade.quantity, trade.side.name,
+                                   order_refs.get(order_key(trade.order_id_b), ''),
+                                   order_refs.get(order_key(trade.order_id_a), '')))
+                    trade_count = tape.count
+                if updates:
+                    stats['level_updates'] += len(updates)
+                    for update in updates:
+                        write(('level', timestamp, update.instrument, update.side.name, update.price,
+                               update.displayed_quantity))
+                    updates.clear()
+                if finished is not None:
+                    order_refs.pop(references.pop(finished)[1], None)
+                if len(references) >= self._prune_size:
+                    self._prune()
+        finally:
+            elapsed = perf_counter_ns() - start
+            engine.clock = clock
+            if self.levels and self.output is not None:
+                engine.feed.unsubscribe(updates.extend)
+                if feed is None:
+                    engine.feed = None
+            if file is not None:
+                file.close()
+
+        stats['seconds'] = round(elapsed / 1e9, 6)
+        stats['events_per_second'] = round(stats['events'] * 1e9 / max(elapsed, 1))
+        return stats
+
+    def _prune(self):
+        """Drops the references of the orders which were filled or expired while resting"""
+        # The maps are pruned in place, run keeps them in local variables
+        get_order = self._engine.get_order
+        references, order_refs = self._references, self._order_refs
+        for reference in [reference for reference, entry in references.items() if get_order(*entry) is None]:
+            order_refs.pop(references.pop(reference)[1], None)
+        self._prune_size = max(self._prune_size, 2 * len(references))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Matching Engine historical replay')
+    parser.add_argument('input', help='CSV (.csv) or binary file of the replayed events')
+    parser.add_argument('--output', help='CSV file the fills and book level updates are written to')
+    parser.add_argument('--speed', type=float, help='multiple of the recorded pace, the maximum speed by default')
+    parser.add_argument('--no-levels', action='store_true', help='do not write the book level updates')
+    parser.add_argument('--retention', type=int, default=100_000, help='number of trades kept in memory')
+    parser.add_argument('--convert', help='writes the events to this CSV (.csv) or binary file instead of replaying')
+    args = parser.parse_args()
+
+    events = read_events(args.input)
+    if args.convert:
+        write = write_csv if args.convert.lower().endswith('.csv') else write_binary
+        print(json.dumps({'events': write(events, args.convert)}))
+        return
+    driver = ReplayDriver(MatchingEngine(trade_retention=args.retention), args.output, not args.no_levels,
+                          args.speed)
+    print(json.dumps(driver.run(events), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+from engine.src.enums import OrderStatus
+
+
+class ExecutionReport:
+    """Result of processing a single order by the engine"""
+    __slots__ = ('_order_id', 'status', 'filled_quantity', 'leaves_quantity', 'trade_numbers', 'reason')
+    _FIELDS = ('order_id', 'status', 'filled_quantity', 'leaves_quantity', 'trade_numbers', 'reason')
+
+    def __init__(self,
+                 order_id,
+                 status: OrderStatus,
+                 filled_quantity: int,
+                 leaves_quantity: int,
+                 trade_numbers: range = range(0),
+                 reason: str = None):
+
+        # Numeric ID or its string form, the string is only formatted when read
+        self._order_id = order_id
+        self.status = status
+        self.filled_quantity = filled_quantity
+        # Quantity left working in the OrderBook or waiting in the stop queue
+        self.leaves_quantity = leaves_quantity
+        # Numbers of the trades the order executed as the attacking order, see MatchingEngine.trades
+        self.trade_numbers = trade_numbers
+        # Reason of the rejection
+        self.reason = reason
+
+    @property
+    def order_id(self):
+        order_id = self._order_id
+        return f'o{order_id:06}' if isinstance(order_id, int) else order_id
+
+    @order_id.setter
+    def order_id(self, order_id):
+        self._order_id = order_id
+
+    def __repr__(self):
+        return f'Order ID: {self.order_id}, Status: {self.status.name}, Filled: {self.filled_quantity}, ' \
+               f'Leaves: {self.leaves_quantity}'
+
+    def __eq__(self, other):
+        if not isinstance(other, ExecutionReport):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self._FIELDS)
@@ -0,0 +1,173 @@
+import multiprocessing
+import os
+import zlib
+
+from engine.matching_engine import MatchingEngine
+from engine.src.order import reset_order_ids
+
+_ORDERS = 'orders'
+_CALL = 'call'
+_STOP = 'stop'
+
+
+def _worker(connection, shard: int, shards: int, engine_options: dict):
+    """
+    Worker process owning the MatchingEngine of one shard. Serves the front-end's requests in the order they arrive
+
+    :param connection: Worker's end of the pipe to the front-end
+    :param shard: Index of the shard
+    :param shards: Number of all shards
+    :param engine_options: Keyword arguments of the MatchingEngine
+    """
+    # Every shard generates its own disjoint set of order IDs
+    reset_order_ids(shard + 1, shards)
+    engine = MatchingEngine(**engine_options)
+    trades = engine.trades
+
+    while True:
+        command, payload = connection.recv()
+        try:
+            if command == _ORDERS:
+                start = trades.count
+                # Trade count after each order, including the trades of the stops it triggered
+                trade_counts = []
+                reports = engine.match_orders(payload, trade_counts)
+                result = reports, start, [count - start for count in trade_counts], trades.trades_since(start)
+            elif command == _CALL:
+                name, args, kwargs = payload
+                attribute = getattr(engine, name)
+                result = attribute(*args, **kwargs) if callable(attribute) else attribute
+            else:
+                connection.send((True, None))
+                break
+        except Exception as error:
+            connection.send((False, error))
+        else:
+            connection.send((True, result))
+    connection.close()
+
+
+class ShardedMatchingEngine:
+    """
+    Front-end distributing the instruments across worker processes, each owning its own MatchingEngine.
+    Instruments never interact during matching, so every instrument is routed to a single worker, which keeps its
+    orders in the arrival order, while the workers match different instruments in parallel
+    """
+
+    def __init__(self, workers: int = None, **engine_options):
+        """
+        :param workers: Number of worker processes, the number of CPUs by default
+        :param engine_options: Keyword arguments passed to each worker's MatchingEngine, e.g. instruments or clock
+        """
+        self._shards = workers or os.cpu_count() or 1
+        self._connections = []
+        self._processes = []
+        # Trades of all shards are renumbered into one stream
+        self._trade_counter = 0
+
+        for shard in range(self._shards):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker,
+                                              args=(worker_connection, shard, self._shards, engine_options),
+                                              daemon=True)
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def shards(self) -> int:
+        return self._shards
+
+    def shard(self, instrument: str) -> int:
+        """Gets the index of the shard owning the instrument, stable across processes and runs"""
+        return zlib.crc32(instrument.encode()) % self._shards
+
+    def match_orders(self, orders) -> tuple:
+        """
+        Matches the order records in the workers. Each worker receives its part of the batch at once, so the shards
+        match in parallel, and the results are merged back in the arrival order
+
+        :param orders: Iterable of order records, i.e. tuples or dicts of the MatchingEngine.new_order parameters
+        :return: tuple of the list of ExecutionReports (one per order) and the list of executed trades, both in the
+                 arrival order of the orders which caused them. Trade IDs and the reports' trade numbers refer to
+                 the merged trade stream
+        """
+        batches = [[] for _ in range(self._shards)]
+        routing = []
+        for record in orders:
+            shard = self.shard(record['instrument'] if isinstance(record, dict) else record[1])
+            routing.append((shard, len(batches[shard])))
+            batches[shard].append(record)
+
+        for shard, batch in enumerate(batches):
+            if batch:
+                self._connections[shard].send((_ORDERS, batch))
+        # Every shard sent work is answered before an error is raised, so no reply is left unread in the pipes
+        results, error = [None] * self._shards, None
+        for shard, batch in enumerate(batches):
+            if batch:
+                try:
+                    results[shard] = self._receive(shard)
+                except Exception as shard_error:
+                    error = error or shard_error
+        if error is not None:
+            raise error
+
+        reports, trades = [], []
+        for shard, idx in routing:
+            shard_reports, start, trade_counts, shard_trades = results[shard]
+            first = trade_counts[idx - 1] if idx else 0
+            report = shard_reports[idx]
+            # Shift the shard's trade numbers to the numbers of the merged stream
+            offset = self._trade_counter - start - first
+            report.trade_numbers = range(report.trade_numbers.start + offset, report.trade_numbers.stop + offset)
+            reports.append(report)
+            for trade in shard_trades[first:trade_counts[idx]]:
+                self._trade_counter += 1
+                trade.trade_id = f't{self._trade_counter:06}'
+                trades.append(trade)
+        return reports, trades
+
+    def call(self, instrument: str, name: str, *args, **kwargs):
+        """
+        Calls the method of the MatchingEngine owning the instrument, e.g. call('BTC', 'get_last_trade_price', 'BTC'),
+        or gets a copy of its property, e.g. call('BTC', 'orderbooks')
+
+        :param instrument: Instrument routing the call
+        :param name: Name of the MatchingEngine method or property
+        :return: Result of the method or value of the property
+        """
+        shard = self.shard(instrument)
+        self._connections[shard].send((_CALL, (name, args, kwargs)))
+        return self._receive(shard)
+
+    def cancel_order(self, instrument: str, order_id):
+        """Cancels the order in the worker owning the instrument, see MatchingEngine.cancel_order"""
+        return self.call(instrument, 'cancel_order', instrument, order_id)
+
+    def modify_order(self, instrument: str, order_id, price: float, quantity: int, displayed_quantity: int = None):
+        """Modifies the order in the worker owning the instrument, see MatchingEngine.modify_order"""
+        return self.call(instrument, 'modify_order', instrument, order_id, price, quantity, displayed_quantity)
+
+    def close(self):
+        """Stops all worker processes"""
+        for connection, process in zip(self._connections, self._processes):
+            if process.is_alive():
+                connection.send((_STOP, None))
+                connection.recv()
+            connection.close()
+            process.join()
+        self._connections, self._processes = [], []
+
+    def _receive(self, shard: int):
+        success, result = self._connections[shard].recv()
+        if not success:
+            raise result
+        return result
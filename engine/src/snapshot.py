@@ -0,0 +1,325 @@
+"""
+Compact binary snapshots of the engine's state: OrderBooks, stop queues, deferred stops, instruments in the auction
+phase, client positions, trade counter, last traded prices, the engine's sequence number and the order ID sequence.
+
+Layout (little-endian): header, symbol table, then per instrument a record followed by its bid levels, ask levels
+(each level a price and an order count followed by its orders), BUY stops, SELL stops and the triggered stops
+deferred by the engine's cascade limit, followed by the client positions. Levels are written from
+the best to the worst price and orders in their priority, so restoring bulk-loads them without any sorting.
+The expiry timer wheel is not stored, it's rebuilt from the time in force of the restored orders
+"""
+import math
+import os
+import struct
+import sys
+import threading
+from collections import deque
+
+from engine.src.enums import Side, OrderType, TimeInForce
+from engine.src.journal import Journal
+from engine.src.order import Order, MARKET_BUY_PRICE, MARKET_SELL_PRICE, advance_order_ids, next_order_id
+from engine.src.orderbook import OrderBook
+from engine.src.stopbook import StopBook
+
+MAGIC = b'MESNAP04'
+
+# magic, engine sequence, trade count, next order ID, journal offset, number of symbols, number of instruments,
+# number of positions
+_HEADER = struct.Struct('<8sqqqqIII')
+_SYMBOL = struct.Struct('<H')
+# symbol index, flags, last traded price, bid levels, ask levels, BUY stops, SELL stops, deferred stops
+_INSTRUMENT = struct.Struct('<IBdIIIII')
+# price, number of orders
+_LEVEL = struct.Struct('<dI')
+# ID, client symbol index, order type, side, flags, time in force, total quantity, displayed quantity, show quantity,
+# sequence, timestamp, expiry time, price, trigger price
+_ORDER = struct.Struct('<qIBBBBqqqqqqdd')
+# client symbol index, instrument symbol index, quantity, average price, realized P&L, volume, trades
+_POSITION = struct.Struct('<IIqddqq')
+
+# Instrument flags, an instrument may have an empty OrderBook or stop queue
+_INT_PRICES = 1
+_LAST_PRICE = 2
+_BOOK = 4
+_BUY_STOPS = 8
+_SELL_STOPS = 16
+_AUCTION = 32
+# Order flags
+_ICEBERG = 1
+_FOK = 2
+_STOP = 4
+
+_NO_PRICE = float('nan')
+_SIDES = {side.value: side for side in Side}
+_ORDER_TYPES = {order_type.value: order_type for order_type in OrderType}
+_TIMES_IN_FORCE = {time_in_force.value: time_in_force for time_in_force in TimeInForce}
+
+
+def capture(engine, journal: Journal = None) -> bytearray:
+    """
+    Serializes the engine's state. Matching has to wait only for this in-memory copy, which costs
+    a single struct pack per working order
+
+    :param engine: MatchingEngine to be captured
+    :param journal: Journal of the engine, the engine's own by default. Its current offset is recorded,
+                    so recovery replays only the later records
+    :return: bytearray with the snapshot
+    """
+    journal = journal if journal is not None else engine.journal
+    symbols = {}
+    body = bytearray()
+    order_struct = _ORDER
+
+    def symbol(name: str) -> int:
+        idx = symbols.get(name)
+        if idx is None:
+            idx = symbols[name] = len(symbols)
+        return idx
+
+    def pack_order(order: Order):
+        flags = (_ICEBERG if order.iceberg_flag else 0) | (_FOK if order.fok_flag else 0) | \
+                (_STOP if order.stop_flag else 0)
+        body.extend(order_struct.pack(order.id, symbol(order.client_id), order.order_type, order.side, flags,
+                                      order.time_in_force, order.total_quantity, order.displayed_quantity,
+                                      order.show_quantity, order.sequence, order.timestamp,
+                                      0 if order.expire_time is None else order.expire_time,
+                                      _NO_PRICE if order.order_type == OrderType.MARKET else order.price,
+                                      _NO_PRICE if order.trigger_price is None else order.trigger_price))
+
+    instruments = set(engine.orderbooks) | set(engine.stop_bids) | set(engine.stop_asks) | \
+        set(engine.deferred_stops) | engine.auctions
+    for instrument in sorted(instruments):
+        book = engine.orderbooks.get(instrument)
+        stop_bids = engine.stop_bids.get(instrument)
+        stop_asks = engine.stop_asks.get(instrument)
+        last_price = engine.trades.last_price(instrument)
+        flags = (_INT_PRICES if instrument in engine.instruments else 0) | \
+                (_LAST_PRICE if last_price is not None else 0) | (_BOOK if book is not None else 0) | \
+                (_BUY_STOPS if stop_bids is not None else 0) | (_SELL_STOPS if stop_asks is not None else 0) | \
+                (_AUCTION if instrument in engine.auctions else 0)
+
+        # Level counts are only known after the levels are written
+        position = len(body)
+        body.extend(bytes(_INSTRUMENT.size))
+        counts = []
+        for side in (book.bid_side, book.ask_side) if book is not None else ():
+            levels = 0
+            for level in side.levels():
+                body.extend(_LEVEL.pack(level.price, len(level)))
+                for order in level:
+                    pack_order(order)
+                levels += 1
+            counts.append(levels)
+        if book is None:
+            counts = [0, 0]
+        for stops in (stop_bids, stop_asks):
+            stop_orders = list(stops) if stops is not None else []
+            for order in stop_orders:
+                pack_order(order)
+            counts.append(len(stop_orders))
+        deferred = engine.deferred_stops.get(instrument, ())
+        for order in deferred:
+            pack_order(order)
+        counts.append(len(deferred))
+        _INSTRUMENT.pack_into(body, position, symbol(instrument), flags,
+                              last_price if last_price is not None else 0.0, *counts)
+
+    positions = 0
+    for position in engine.positions:
+        body.extend(_POSITION.pack(symbol(position.client_id), symbol(position.instrument), position.quantity,
+                                   position.average_price, position.realized_pnl, position.volume, position.trades))
+        positions += 1
+
+    snapshot = bytearray(_HEADER.pack(MAGIC, engine.sequence, engine.trades.count, next_order_id(),
+                                      journal.offset if journal is not None else 0, len(symbols), len(instruments),
+                                      positions))
+    for name in symbols:
+        raw = name.encode()
+        snapshot.extend(_SYMBOL.pack(len(raw)) + raw)
+    snapshot.extend(body)
+    return snapshot
+
+
+def write(snapshot: bytearray, path: str):
+    """
+    Writes the captured snapshot to disk. The file is replaced atomically, so a crash never leaves
+    a partially written snapshot behind
+
+    :param snapshot: Snapshot returned by capture
+    :param path: Path of the snapshot file
+    """
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(snapshot)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def save(engine, path: str, journal: Journal = None, background: bool = False):
+    """
+    Takes a snapshot of the engine. Only capturing the state pauses matching, the snapshot can be written to disk
+    in a background thread while the engine keeps matching
+
+    :param engine: MatchingEngine to be captured
+    :param path: Path of the snapshot file
+    :param journal: Journal of the engine, see capture
+    :param background: If True the snapshot is written by a background thread
+    :return: the started writer Thread if written in the background, otherwise None
+    """
+    snapshot = capture(engine, journal)
+    if not background:
+        write(snapshot, path)
+        return None
+    thread = threading.Thread(target=write, args=(snapshot, path), name='snapshot-writer', daemon=True)
+    thread.start()
+    return thread
+
+
+def load(path: str, engine) -> int:
+    """
+    Restores the snapshot into an empty engine configured with the same instruments. OrderBooks and stop queues
+    are bulk-loaded in their priority order, the trade numbering, the sequence numbers and the order IDs continue
+    from the snapshot
+
+    :param path: Path of the snapshot file
+    :param engine: Empty MatchingEngine
+    :return: int, journal offset the snapshot was taken at
+    """
+    assert not engine.orderbooks and not engine.trades.count, 'Snapshot can only be loaded into an empty engine'
+    with open(path, 'rb') as file:
+        data = file.read()
+    view = memoryview(data)
+
+    magic = bytes(view[:len(MAGIC)])
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not an engine snapshot')
+    _, sequence, trade_count, next_id, journal_offset, symbol_count, instrument_count, position_count = \
+        _HEADER.unpack_from(view, 0)
+    offset = _HEADER.size
+
+    symbols = []
+    for _ in range(symbol_count):
+        (length,) = _SYMBOL.unpack_from(view, offset)
+        offset += _SYMBOL.size
+        symbols.append(sys.intern(bytes(view[offset:offset + length]).decode()))
+        offset += length
+
+    order_struct = _ORDER
+    order_size = _ORDER.size
+    order_new = Order.__new__
+
+    def unpack_orders(count: int, instrument: str, int_prices: bool, working: bool = True) -> list:
+        nonlocal offset
+        orders = []
+        for _ in range(count):
+            (order_id, client_idx, order_type, side, flags, time_in_force, total_quantity, displayed_quantity,
+             show_quantity, order_sequence, timestamp, expire_time, price, trigger_price) = \
+                order_struct.unpack_from(view, offset)
+            offset += order_size
+            side = _SIDES[side]
+            order_type = _ORDER_TYPES[order_type]
+            if order_type == OrderType.MARKET:
+                price = MARKET_BUY_PRICE if side == Side.BUY else MARKET_SELL_PRICE
+            elif int_prices:
+                price = int(price)
+            if math.isnan(trigger_price):
+                trigger_price = None
+            elif int_prices:
+                trigger_price = int(trigger_price)
+
+            # Orders are rebuilt field by field, Order.__init__ would generate new IDs
+            order = order_new(Order)
+            order.client_id = symbols[client_idx]
+            order.instrument = instrument
+            order.order_type = order_type
+            order.side = side
+            order.total_quantity = total_quantity
+            order.id = order_id
+            order.iceberg_flag = bool(flags & _ICEBERG)
+            order.displayed_quantity = displayed_quantity
+            order.show_quantity = show_quantity
+            order.fok_flag = bool(flags & _FOK)
+            order.stop_flag = bool(flags & _STOP)
+            order.trigger_price = trigger_price
+            order.sequence = order_sequence
+            order.timestamp = timestamp
+            order.price = price
+            order.time_in_force = _TIMES_IN_FORCE[time_in_force]
+            order.expire_time = expire_time if order.time_in_force == TimeInForce.GTD else None
+            order._level = order._prev = order._next = None
+            # Expiries of the working GTD and DAY orders are scheduled again
+            if working and order.time_in_force != TimeInForce.GTC:
+                engine.track_expiry(order)
+            orders.append(order)
+        return orders
+
+    def unpack_levels(count: int, instrument: str, int_prices: bool) -> list:
+        nonlocal offset
+        levels = []
+        for _ in range(count):
+            price, orders = _LEVEL.unpack_from(view, offset)
+            offset += _LEVEL.size
+            levels.append((int(price) if int_prices else price, unpack_orders(orders, instrument, int_prices)))
+        return levels
+
+    last_prices = {}
+    for _ in range(instrument_count):
+        symbol_idx, flags, last_price, bid_levels, ask_levels, buy_stops, sell_stops, deferred = \
+            _INSTRUMENT.unpack_from(view, offset)
+        offset += _INSTRUMENT.size
+        instrument = symbols[symbol_idx]
+        int_prices = bool(flags & _INT_PRICES)
+        if flags & _LAST_PRICE:
+            last_prices[instrument] = int(last_price) if int_prices else last_price
+
+        bids = unpack_levels(bid_levels, instrument, int_prices)
+        asks = unpack_levels(ask_levels, instrument, int_prices)
+        if flags & _BOOK:
+            book = engine.orderbooks[instrument] = OrderBook(instrument, spec=engine.instruments.get(instrument),
+                                                            client_orders=engine.client_orders)
+            book.load(bids, asks)
+            # Changes of the restored levels are published like the ones of the engine's own books
+            if engine.feed is not None:
+                book.track_changes()
+        for count, flag, side, stops in ((buy_stops, _BUY_STOPS, Side.BUY, engine.stop_bids),
+                                         (sell_stops, _SELL_STOPS, Side.SELL, engine.stop_asks)):
+            if flags & flag:
+                stop_book = stops[instrument] = StopBook(instrument, side, client_stops=engine.client_stops)
+                stop_book.load(unpack_orders(count, instrument, int_prices))
+        if flags & _AUCTION:
+            engine.auctions.add(instrument)
+        if deferred:
+            engine.deferred_stops[instrument] = deque(unpack_orders(deferred, instrument, int_prices, working=False))
+
+    for _ in range(position_count):
+        client_idx, instrument_idx, quantity, average_price, realized_pnl, volume, trades = \
+            _POSITION.unpack_from(view, offset)
+        offset += _POSITION.size
+        position = engine.positions.position(symbols[client_idx], symbols[instrument_idx])
+        position.quantity = quantity
+        position.average_price = average_price
+        position.realized_pnl = realized_pnl
+        position.volume = volume
+        position.trades = trades
+
+    engine.trades.restore(trade_count, last_prices)
+    engine.sequence = sequence
+    # Continues the ID sequence past the restored orders, never rewinding it nor changing its step
+    advance_order_ids(next_id - 1)
+    return journal_offset
+
+
+def recover(engine, snapshot_path: str = None, journal_path: str = None) -> int:
+    """
+    Recovers the engine's state from the latest snapshot and the tail of the journal written after it
+
+    :param engine: Empty MatchingEngine configured with the same instruments, not journaling
+    :param snapshot_path: Path of the snapshot file, the journal is replayed from its start if not given
+    :param journal_path: Path of the journal, only the snapshot is restored if not given
+    :return: int, number of replayed journal records
+    """
+    offset = load(snapshot_path, engine) if snapshot_path is not None and os.path.exists(snapshot_path) else 0
+    if journal_path is None or not os.path.exists(journal_path):
+        return 0
+    return Journal.replay(journal_path, engine, offset)
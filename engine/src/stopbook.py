@@ -0,0 +1,188 @@
+from heapq import heappush, heappop, heapify
+from engine.src.enums import Side
+from engine.src.order import Order, order_key
+
+
+class StopBook:
+    """
+    Queue of the STOP orders of one instrument and side waiting for their trigger price to be traded.
+    Orders are kept in a heap keyed on the trigger price and the engine's arrival sequence number:
+    BUY stops are triggered by prices at or above their trigger price (lowest trigger first), SELL stops
+    by prices at or below it (highest trigger first). Cancelled orders are dropped lazily when they reach
+    the top of the heap
+    """
+
+    def __init__(self, instrument: str, side: Side, client_stops: dict = None):
+        """
+        :param instrument: Instrument of the queued orders
+        :param side: Side of the queued orders
+        :param client_stops: Client ID -> instrument -> order ID -> Order index of the live stop orders, shared by
+                             all StopBooks of the engine
+        """
+        self.instrument = instrument
+        self.side = side
+        self._sign = 1 if side == Side.BUY else -1
+        self._heap = []
+        # Order ID -> Order index of the live stop orders
+        self._orders = {}
+        self._clients = client_stops if client_stops is not None else {}
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __iter__(self):
+        """Iterates over the live stop orders in the trigger priority"""
+        orders = self._orders
+        for _, _, order_id, order in sorted(self._heap):
+            if orders.get(order_id) is order:
+                yield order
+
+    def __getitem__(self, idx: int):
+        if idx == 0:
+            order = self.peek()
+            if order is None:
+                raise IndexError('StopBook index out of range')
+            return order
+        return list(self)[idx]
+
+    def peek(self):
+        """Gets the stop order which would be triggered first or None if the queue is empty"""
+        heap, orders = self._heap, self._orders
+        while heap:
+            _, _, order_id, order = heap[0]
+            if orders.get(order_id) is order:
+                return order
+            heappop(heap)
+        return None
+
+    def add(self, order: Order):
+        """
+        Adds the stop order to the queue
+
+        :param order: Stop order to be added to the queue
+        """
+        heappush(self._heap, (order.trigger_price * self._sign, order.sequence, order.id, order))
+        self._orders[order.id] = order
+        self._index(order)
+
+    def load(self, orders):
+        """
+        Bulk-loads the stop orders into the empty queue, e.g. when restoring a snapshot. A list sorted
+        in the trigger priority already is a heap, so nothing has to be sorted
+
+        :param orders: Iterable of stop orders in the trigger priority
+        """
+        assert not self._heap, 'Only an empty queue can be loaded'
+        sign = self._sign
+        for order in orders:
+            self._heap.append((order.trigger_price * sign, order.sequence, order.id, order))
+            self._orders[order.id] = order
+            self._index(order)
+
+    def get_order(self, order_id):
+        """
+        Gets the live stop order with the given ID
+
+        :param order_id: ID of the searched order
+        :return: Order, or None if the order is not present in the queue
+        """
+        return self._orders.get(order_key(order_id))
+
+    def cancel(self, order_id):
+        """
+        Removes the stop order with the given ID from the queue
+
+        :param order_id: ID of the order to be cancelled
+        :return: Cancelled Order, or None if the order is not present in the queue
+        """
+        order = self._orders.pop(order_key(order_id), None)
+        if order is not None:
+            self._unindex(order)
+        # Cancelled orders stay in the heap until they reach its top, rebuild it once they make up most of it.
+        # Liveness is checked by the ID stored in the entry, a pooled Order may have been re-used with a new ID
+        if order is not None and len(self._heap) > 2 * len(self._orders) + 32:
+            orders = self._orders
+            self._heap = [entry for entry in self._heap if orders.get(entry[2]) is entry[3]]
+            heapify(self._heap)
+        return order
+
+    def pop_triggered(self, price: float) -> list:
+        """
+        Removes from the queue and returns all stop orders triggered by the given traded price
+
+        :param price: Most recently traded price
+        :return: list of triggered orders in the trigger priority
+        """
+        bound = price * self._sign
+        heap, orders = self._heap, self._orders
+        triggered = []
+        while heap and heap[0][0] <= bound:
+            _, _, order_id, order = heappop(heap)
+            if orders.get(order_id) is order:
+                del orders[order_id]
+                self._unindex(order)
+                triggered.append(order)
+        return triggered
+
+    def _index(self, order: Order):
+        instruments = self._clients.get(order.client_id)
+        if instruments is None:
+            instruments = self._clients[order.client_id] = {}
+        client_stops = instruments.get(self.instrument)
+        if client_stops is None:
+            client_stops = instruments[self.instrument] = {}
+        client_stops[order.id] = order
+
+    def _unindex(self, order: Order):
+        instruments = self._clients[order.client_id]
+        client_stops = instruments[self.instrument]
+        del client_stops[order.id]
+        if not client_stops:
+            del instruments[self.instrument]
+            if not instruments:
+                del self._clients[order.client_id]
+
+
+class CascadeStats:
+    """Statistics of the stop order cascades, i.e. of the inbound events whose trades triggered stop orders"""
+    __slots__ = ('cascades', 'stops_fired', 'max_fired', 'max_depth', 'deferred', 'time_ns')
+
+    def __init__(self):
+        self.cascades = 0
+        self.stops_fired = 0
+        # Most stops fired by a single event
+        self.max_fired = 0
+        # Longest chain of stops triggered by the trades of the previous stop
+        self.max_depth = 0
+        # Stops left for the following events by the engine's cascade limit
+        self.deferred = 0
+        self.time_ns = 0
+
+    def __repr__(self):
+        return f'Cascades: {self.cascades}, Stops fired: {self.stops_fired}, Max depth: {self.max_depth}, ' \
+               f'Deferred: {self.deferred}'
+
+    def record(self, fired: int, depth: int, deferred: int, elapsed: int):
+        """
+        Records one cascade
+
+        :param fired: Number of stop orders matched
+        :param depth: Depth of the cascade
+        :param deferred: Number of triggered stop orders deferred to the following events
+        :param elapsed: Time spent in nanoseconds
+        """
+        self.cascades += 1
+        self.stops_fired += fired
+        self.max_fired = max(self.max_fired, fired)
+        self.max_depth = max(self.max_depth, depth)
+        self.deferred += deferred
+        self.time_ns += elapsed
+
+    def summary(self) -> dict:
+        return {'cascades': self.cascades,
+                'stops_fired': self.stops_fired,
+                'max_fired': self.max_fired,
+                'mean_fired': round(self.stops_fired / self.cascades, 2) if self.cascades else 0,
+                'max_depth': self.max_depth,
+                'deferred': self.deferred,
+                'seconds': round(self.time_ns / 1e9, 6)}
@@ -0,0 +1,174 @@
+import sys
+
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel scheduling items by their expiry time, in nanoseconds of the engine's clock.
+
+    Time is divided into ticks of the given resolution. Each level is a wheel of 2 ** bits slots, a level 0 slot
+    spans one tick and a slot of every higher level spans a whole wheel of the level below. An item is placed into
+    the lowest level whose wheel still covers its expiry and is moved down a level once the clock reaches its slot,
+    so scheduling is O(1) and an item is moved at most once per level. Empty slots are skipped through per-level
+    bitmaps, so advancing the clock costs O(1) amortized per fired item regardless of how far the clock jumps.
+
+    Items fire at the first tick boundary at or after their expiry time, i.e. never early and at most one resolution
+    late. Scheduled items cannot be cancelled, the owner checks whether a fired item is still live
+    """
+
+    def __init__(self, resolution: int = 1_000_000, bits: int = 6, levels: int = 8, start: int = 0):
+        """
+        :param resolution: Length of a tick in nanoseconds
+        :param bits: Number of bits of the slot index, each level has 2 ** bits slots
+        :param levels: Number of levels, items beyond the top level's wheel wait in an overflow list
+        :param start: Clock time the wheel starts at
+        """
+        assert resolution > 0, 'Timer resolution has to be positive'
+        assert bits > 0 and levels > 0, 'Timer wheel needs at least one level with one slot bit'
+        self.resolution = resolution
+        self._bits = bits
+        self._mask = (1 << bits) - 1
+        self._wheels = [[[] for _ in range(1 << bits)] for _ in range(levels)]
+        # Per-level bitmaps of the non-empty slots
+        self._occupied = [0] * levels
+        self._overflow = []
+        # Last tick the wheel was advanced to, all items scheduled up to it have fired
+        self._tick = start // resolution
+        self._count = 0
+        # Clock time before which no item can fire, lets the owner skip advancing the wheel
+        self.next_expiry = sys.maxsize
+
+    def __len__(self):
+        """Number of scheduled items which have not fired yet"""
+        return self._count
+
+    @property
+    def time(self) -> int:
+        """Clock time of the last tick the wheel was advanced to"""
+        return self._tick * self.resolution
+
+    def schedule(self, expiry: int, item) -> bool:
+        """
+        Schedules the item to fire once the clock reaches its expiry time
+
+        :param expiry: Expiry time in nanoseconds
+        :param item: Scheduled item, returned by advance when it fires
+        :return: bool, False if the expiry time has already been reached and the item was not scheduled
+        """
+        tick = -(-expiry // self.resolution)
+        if tick <= self._tick:
+            return False
+        self._place(tick, item)
+        self._count += 1
+        if tick * self.resolution < self.next_expiry:
+            self.next_expiry = tick * self.resolution
+        return True
+
+    def _place(self, tick: int, item):
+        # Level of the highest bit in which the tick differs from the current one
+        level = ((tick ^ self._tick).bit_length() - 1) // self._bits
+        if level >= len(self._wheels):
+            self._overflow.append((tick, item))
+            return
+        slot = (tick >> (level * self._bits)) & self._mask
+        self._wheels[level][slot].append((tick, item))
+        self._occupied[level] |= 1 << slot
+
+    def advance(self, time: int) -> list:
+        """
+        Moves the wheel to the given clock time
+
+        :param time: Current clock time in nanoseconds, the wheel never goes backwards
+        :return: list of the items which fired, in their expiry order up to the resolution
+        """
+        target = time // self.resolution
+        current = self._tick
+        if target <= current:
+            return []
+        if not self._count:
+            self._tick = target
+            self.next_expiry = sys.maxsize
+            return []
+
+        fired = []
+        bits, mask = self._bits, self._mask
+        wheels, occupied = self._wheels, self._occupied
+        levels = len(wheels)
+        next_tick = None
+        while True:
+            # The first non-empty slot ahead of the current tick, a lower level slot always comes before
+            # the slots of the higher levels
+            level = 0
+            while level < levels:
+                slots = occupied[level]
+                if slots:
+                    shift = level * bits
+                    index = (current >> shift) & mask
+                    ahead = slots >> (index + 1)
+                    if ahead:
+                        slot = index + (ahead & -ahead).bit_length()
+                        break
+                level += 1
+            else:
+                if not self._overflow:
+                    current = target
+                    break
+                # All wheels are empty, jump straight to the earliest overflowing item. Once the clock enters
+                # the top level wheel's next turn the overflowing items are placed into the wheels again
+                tick = min(tick for tick, _ in self._overflow)
+                top = levels * bits
+                if tick > target:
+                    moved = target >> top != current >> top
+                    current = target
+                    next_tick = tick
+                    if not moved:
+                        break
+                else:
+                    current = tick
+                overflow, self._overflow = self._overflow, []
+                self._tick = current
+                for tick, item in overflow:
+                    if tick == current:
+                        fired.append(item)
+                    else:
+                        self._place(tick, item)
+                continue
+
+            start = (current >> (shift + bits) << (shift + bits)) | (slot << shift)
+            if start > target:
+                current = target
+                next_tick = start
+                break
+            if level == 0:
+                # All due slots of the level 0 wheel fire in one go
+                base = start - slot
+                last = target - base if target - base < mask else mask
+                due = (slots >> slot << slot) & ((2 << last) - 1)
+                occupied[0] = slots ^ due
+                wheel = wheels[0]
+                while due:
+                    low = due & -due
+                    due ^= low
+                    slot = low.bit_length() - 1
+                    fired.extend([item for _, item in wheel[slot]])
+                    wheel[slot] = []
+                current = base + slot
+            else:
+                current = start
+                entries = wheels[level][slot]
+                wheels[level][slot] = []
+                occupied[level] ^= 1 << slot
+                # Items move to the lower levels, the ones expiring right at the slot's start fire
+                for entry in entries:
+                    tick = entry[0]
+                    if tick == start:
+                        fired.append(entry[1])
+                    else:
+                        lower = ((tick ^ start).bit_length() - 1) // bits
+                        index = (tick >> (lower * bits)) & mask
+                        wheels[lower][index].append(entry)
+                        occupied[lower] |= 1 << index
+
+        self._tick = current
+        self._count -= len(fired)
+        self.next_expiry = sys.maxsize if next_tick is None else next_tick * self.resolution
+        return fired
@@ -1,7 +1,12 @@
-from datetime import datetime
+import sys
+
+from engine.src.enums import Side
 
 
 class Trade:
+    __slots__ = ('trade_id', 'client_id', 'passive_client_id', 'side', 'instrument', 'price', 'quantity', 'timestamp',
+                 'order_id_b', 'order_id_a')
+
     def __init__(self,
                  trade_id: str,
                  client_id: str,
@@ -9,17 +14,35 @@ class Trade:
                  price: float,
                  quantity: int,
                  order_id_b: str,
-                 order_id_a: str):
+                 order_id_a: str,
+                 timestamp: int = 0,
+                 passive_client_id: str = None,
+                 side: Side = Side.BUY):
 
         self.trade_id = trade_id
-        self.client_id = client_id
-        self.instrument = instrument
+        # Clients of the attacking and the passive order
+        self.client_id = sys.intern(client_id)
+        self.passive_client_id = sys.intern(passive_client_id) if passive_client_id is not None else None
+        # Side of the attacking order
+        self.side = side
+        self.instrument = sys.intern(instrument)
         self.price = price
         self.quantity = quantity
-        self.timestamp = datetime.now().strftime("%H:%M:%S.%f")
+        # Engine's clock time (ns) of the matching event
+        self.timestamp = timestamp
         self.order_id_b = order_id_b
         self.order_id_a = order_id_a
 
+    @property
+    def client_id_b(self):
+        """Client of the buy order"""
+        return self.client_id if self.side == Side.BUY else self.passive_client_id
+
+    @property
+    def client_id_a(self):
+        """Client of the sell order"""
+        return self.passive_client_id if self.side == Side.BUY else self.client_id
+
     def __repr__(self):
         return f'Trade ID: {self.trade_id}, Client: {self.client_id} Instrument: {self.instrument}, ' \
                f'Price: {self.price}, Quantity: {self.quantity}, Matched Orders: ({self.order_id_b}, {self.order_id_a})'
@@ -0,0 +1,302 @@
+from array import array
+from bisect import bisect_left
+import struct
+from engine.src.enums import Side
+from engine.src.trade import Trade
+
+# Spill file chunk header: first trade number, number of trades, number of new instruments, number of new clients
+_CHUNK_HEADER = struct.Struct('<QQII')
+# Symbol entry: length of the symbol, flag marking the instruments traded in integer tick prices
+_SYMBOL = struct.Struct('<HB')
+_SIDES = {side.value: side for side in Side}
+
+
+class TradeTape:
+    """
+    Columnar store of the trades executed by the engine. Trade fields are kept in typed arrays and Trade objects
+    are only created when the trades are read. Trades are numbered from 1 in the order they were executed.
+
+    The tape keeps per-client (both counterparties) and per-instrument indexes of trade numbers and the last traded price of every
+    instrument, so queries cost O(results). With a retention window only the most recent trades are kept in memory,
+    the older ones are dropped or, if a spill file is given, appended to it
+    """
+
+    def __init__(self, retention: int = None, spill_path: str = None, tick_instruments=()):
+        """
+        :param retention: Number of the most recent trades kept in memory, all trades are kept by default
+        :param spill_path: Path of the file the trades dropped from memory are appended to
+        :param tick_instruments: Container of the instruments traded in integer tick prices, e.g. the engine's
+                                 InstrumentSpecs, prices of the other instruments are read back as floats
+        """
+        assert retention is None or retention > 0, 'Retention has to be positive'
+
+        self.retention = retention
+        self.spill_path = spill_path
+        self._tick_instruments = tick_instruments
+
+        # Number of the first trade held in memory and number of all trades executed so far
+        self._base = 1
+        self._count = 0
+
+        # Interned instrument and client IDs, trades refer to them by their position
+        self._instrument_ids = []
+        self._instrument_idx = {}
+        self._client_ids = []
+        self._client_idx = {}
+        self._int_prices = []
+        # Symbols not yet written to the spill file
+        self._spilled_instruments = 0
+        self._spilled_clients = 0
+
+        # Trade columns
+        self._instruments = array('I')
+        self._clients = array('I')
+        self._prices = array('d')
+        self._quantities = array('q')
+        self._timestamps = array('q')
+        self._order_ids_b = array('q')
+        self._order_ids_a = array('q')
+        self._passive_clients = array('I')
+        self._sides = array('B')
+
+        # Indexes of trade numbers
+        self._by_client = {}
+        self._by_instrument = {}
+        self._last_prices = {}
+
+    def __len__(self):
+        """Number of trades held in memory"""
+        return self._count - self._base + 1
+
+    def __getitem__(self, idx: int) -> Trade:
+        """Gets the trade at the given position among the trades held in memory"""
+        size = len(self)
+        if idx < 0:
+            idx += size
+        if not 0 <= idx < size:
+            raise IndexError('TradeTape index out of range')
+        return self._trade(idx)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self._trade(idx)
+
+    @property
+    def count(self) -> int:
+        """Number of all trades executed so far, including the ones dropped from memory"""
+        return self._count
+
+    def append(self,
+               instrument: str,
+               client_id: str,
+               price: float,
+               quantity: int,
+               order_id_b: int,
+               order_id_a: int,
+               timestamp: int,
+               passive_client_id: str,
+               side: Side) -> int:
+        """
+        Records the trade
+
+        :param instrument: Traded instrument
+        :param client_id: Client ID of the attacking order
+        :param price: Trade price
+        :param quantity: Traded quantity
+        :param order_id_b: Numeric ID of the buy order
+        :param order_id_a: Numeric ID of the sell order
+        :param timestamp: Engine's clock time (ns) of the trade
+        :param passive_client_id: Client ID of the passive order
+        :param side: Side of the attacking order
+        :return: int, trade number
+        """
+        instr_idx = self._instrument_idx.get(instrument)
+        if instr_idx is None:
+            instr_idx = self._instrument_idx[instrument] = len(self._instrument_ids)
+            self._instrument_ids.append(instrument)
+            self._int_prices.append(instrument in self._tick_instruments)
+            self._by_instrument[instr_idx] = array('q')
+        client_idx = self._client_idx.get(client_id)
+        if client_idx is None:
+            client_idx = self._client_idx[client_id] = len(self._client_ids)
+            self._client_ids.append(client_id)
+            self._by_client[client_idx] = array('q')
+        passive_idx = self._client_idx.get(passive_client_id)
+        if passive_idx is None:
+            passive_idx = self._client_idx[passive_client_id] = len(self._client_ids)
+            self._client_ids.append(passive_client_id)
+            self._by_client[passive_idx] = array('q')
+
+        self._count += 1
+        number = self._count
+        self._instruments.append(instr_idx)
+        self._clients.append(client_idx)
+        self._prices.append(price)
+        self._quantities.append(quantity)
+        self._timestamps.append(timestamp)
+        self._order_ids_b.append(order_id_b)
+        self._order_ids_a.append(order_id_a)
+        self._passive_clients.append(passive_idx)
+        self._sides.append(side)
+
+        self._by_instrument[instr_idx].append(number)
+        self._by_client[client_idx].append(number)
+        if passive_idx != client_idx:
+            self._by_client[passive_idx].append(number)
+        self._last_prices[instrument] = price
+
+        # Drop the oldest trades in chunks, so the cost of trimming the columns is amortized
+        if self.retention is not None and number - self._base + 1 >= self.retention + max(self.retention // 4, 1):
+            self._evict(number - self._base + 1 - self.retention)
+        return number
+
+    def restore(self, count: int, last_prices: dict):
+        """
+        Continues the trade numbering of a restored engine in the empty tape, e.g. when restoring a snapshot
+
+        :param count: Number of all trades executed before
+        :param last_prices: Instrument -> last traded price
+        """
+        assert not self._count, 'Only an empty tape can be restored'
+        self._count = count
+        self._base = count + 1
+        self._last_prices.update(last_prices)
+
+    def last_price(self, instrument: str = None):
+        """
+        Gets the most recently traded price
+
+        :param instrument: Instrument to get the price for, any instrument if not given
+        :return: price, or None if nothing traded yet
+        """
+        if instrument is None:
+            if not len(self):
+                return None
+            return self._price(len(self) - 1)
+        return self._last_prices.get(instrument)
+
+    def client_trades(self, client_id: str) -> list:
+        """
+        Gets all trades of the client held in memory, as the attacking or the passive counterparty
+
+        :param client_id: Client ID to be searched for
+        :return: list of Trade objects
+        """
+        idx = self._client_idx.get(client_id)
+        return self._from_index(self._by_client[idx]) if idx is not None else []
+
+    def instrument_trades(self, instrument: str) -> list:
+        """
+        Gets all trades of the instrument held in memory
+
+        :param instrument: Instrument to be searched for
+        :return: list of Trade objects
+        """
+        idx = self._instrument_idx.get(instrument)
+        return self._from_index(self._by_instrument[idx]) if idx is not None else []
+
+    def trades_since(self, number: int) -> list:
+        """
+        Gets all trades held in memory with the trade number larger than the given one
+
+        :param number: Trade number, e.g. the tape's count before an order was matched
+        :return: list of Trade objects
+        """
+        start = max(number + 1, self._base) - self._base
+        return [self._trade(idx) for idx in range(start, len(self))]
+
+    def _from_index(self, numbers: array) -> list:
+        base = self._base
+        return [self._trade(number - base) for number in numbers[bisect_left(numbers, base):]]
+
+    def _price(self, idx: int):
+        price = self._prices[idx]
+        return int(price) if self._int_prices[self._instruments[idx]] else price
+
+    def _trade(self, idx: int) -> Trade:
+        return Trade(trade_id=f't{self._base + idx:06}',
+                     client_id=self._client_ids[self._clients[idx]],
+                     instrument=self._instrument_ids[self._instruments[idx]],
+                     price=self._price(idx),
+                     quantity=self._quantities[idx],
+                     order_id_b=f'o{self._order_ids_b[idx]:06}',
+                     order_id_a=f'o{self._order_ids_a[idx]:06}',
+                     timestamp=self._timestamps[idx],
+                     passive_client_id=self._client_ids[self._passive_clients[idx]],
+                     side=_SIDES[self._sides[idx]])
+
+    def _columns(self) -> tuple:
+        return (self._instruments, self._clients, self._prices, self._quantities,
+                self._timestamps, self._order_ids_b, self._order_ids_a, self._passive_clients, self._sides)
+
+    def _evict(self, size: int):
+        """Drops the given number of the oldest trades from memory, spilling them to disk if configured"""
+        if self.spill_path is not None:
+            self._spill(size)
+
+        for column in self._columns():
+            del column[:size]
+        self._base += size
+
+        base = self._base
+        for numbers in (*self._by_client.values(), *self._by_instrument.values()):
+            if numbers and numbers[0] < base:
+                del numbers[:bisect_left(numbers, base)]
+
+    def _spill(self, size: int):
+        """Appends the given number of the oldest trades to the spill file"""
+        new_instruments = self._instrument_ids[self._spilled_instruments:]
+        new_clients = self._client_ids[self._spilled_clients:]
+        with open(self.spill_path, 'ab') as file:
+            file.write(_CHUNK_HEADER.pack(self._base, size, len(new_instruments), len(new_clients)))
+            for idx, instrument in enumerate(new_instruments, self._spilled_instruments):
+                symbol = instrument.encode()
+                file.write(_SYMBOL.pack(len(symbol), self._int_prices[idx]) + symbol)
+            for client_id in new_clients:
+                symbol = client_id.encode()
+                file.write(_SYMBOL.pack(len(symbol), 0) + symbol)
+            for column in self._columns():
+                column[:size].tofile(file)
+        self._spilled_instruments += len(new_instruments)
+        self._spilled_clients += len(new_clients)
+
+    @staticmethod
+    def read_spilled(spill_path: str):
+        """
+        Reads back the trades spilled to disk
+
+        :param spill_path: Path of the spill file
+        :return: generator of Trade objects in the order they were executed
+        """
+        instruments, int_prices, clients = [], [], []
+        with open(spill_path, 'rb') as file:
+            while True:
+                header = file.read(_CHUNK_HEADER.size)
+                if not header:
+                    break
+                base, size, new_instruments, new_clients = _CHUNK_HEADER.unpack(header)
+                for symbols, count in ((instruments, new_instruments), (clients, new_clients)):
+                    for _ in range(count):
+                        length, int_price = _SYMBOL.unpack(file.read(_SYMBOL.size))
+                        symbols.append(file.read(length).decode())
+                        if symbols is instruments:
+                            int_prices.append(bool(int_price))
+
+                columns = []
+                for typecode in ('I', 'I', 'd', 'q', 'q', 'q', 'q', 'I', 'B'):
+                    column = array(typecode)
+                    column.fromfile(file, size)
+                    columns.append(column)
+
+                for idx, (instr_idx, client_idx, price, quantity, timestamp, order_id_b, order_id_a, passive_idx,
+                          side) in enumerate(zip(*columns)):
+                    yield Trade(trade_id=f't{base + idx:06}',
+                                client_id=clients[client_idx],
+                                instrument=instruments[instr_idx],
+                                price=int(price) if int_prices[instr_idx] else price,
+                                quantity=quantity,
+                                order_id_b=f'o{order_id_b:06}',
+                                order_id_a=f'o{order_id_a:06}',
+                                timestamp=timestamp,
+                                passive_client_id=clients[passive_idx],
+                                side=_SIDES[side])
@@ -0,0 +1,135 @@
+import os
+import random
+import tempfile
+import unittest
+
+from engine.matching_engine import MatchingEngine
+from engine.src import auction, snapshot
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType, OrderStatus, TimeInForce
+from engine.src.instrument import InstrumentSpec
+from engine.src.journal import Journal
+
+
+class TestAuction(unittest.TestCase):
+    def setUp(self):
+        self.exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', 1.0)], clock=SimulatedClock())
+        self.exchange.start_auction('BTC')
+
+    def place(self, client_id: str, side: Side, quantity: int, price: float = None, **options):
+        order_type = OrderType.LIMIT if price is not None else OrderType.MARKET
+        return self.exchange.match_order(self.exchange.new_order(client_id, 'BTC', order_type, side, quantity, price,
+                                                                 **options))
+
+    def test_Equilibrium(self):
+        # Volume 15, 35, 30 and 10 at the prices 101, 103, 104 and 105
+        levels = ([105, 104, 103], [10, 20, 30], [101, 103, 104], [15, 20, 30])
+        self.assertTrue(auction.equilibrium(*levels) == (103, 35, 25))
+        self.assertTrue(auction._equilibrium_python(*levels, None) == (103, 35, 25))
+        self.assertTrue(auction.equilibrium([100], [10], [101], [10]) is None)
+
+        # Equal volume and surplus: market pressure, then the reference price
+        self.assertTrue(auction.equilibrium([102, 101], [10, 5], [100], [10]) == (102, 10, 0))
+        self.assertTrue(auction.equilibrium([102], [20], [100, 101], [10, 5]) == (102, 15, 5))
+        self.assertTrue(auction.equilibrium([102], [10], [100], [20]) == (100, 10, -10))
+        self.assertTrue(auction.equilibrium([102], [10], [100], [10]) == (100, 10, 0))
+        self.assertTrue(auction.equilibrium([102], [10], [100], [10], reference=103) == (102, 10, 0))
+
+    def test_VectorizedMatchesFallback(self):
+        rnd = random.Random(3)
+        for _ in range(300):
+            bids = sorted(rnd.sample(range(90, 111), rnd.randrange(1, 12)), reverse=True)
+            asks = sorted(rnd.sample(range(90, 111), rnd.randrange(1, 12)))
+            levels = (bids, [rnd.randrange(1, 6) * 10 for _ in bids], asks, [rnd.randrange(1, 6) * 10 for _ in asks])
+            reference = rnd.choice((None, rnd.randrange(85, 116)))
+            expected = auction._equilibrium_python(*levels, reference) if bids[0] >= asks[0] else None
+            self.assertTrue(auction.equilibrium(*levels, reference=reference) == expected)
+
+    def test_Uncross(self):
+        for client_id, side, quantity, price in (('c000001', Side.BUY, 10, 105.0), ('c000001', Side.BUY, 20, 104.0),
+                                                 ('c000002', Side.BUY, 30, 103.0), ('c000003', Side.SELL, 15, 101.0),
+                                                 ('c000003', Side.SELL, 20, 103.0), ('c000004', Side.SELL, 30, 104.0)):
+            self.assertTrue(self.place(client_id, side, quantity, price).status == OrderStatus.NEW)
+        self.assertTrue(self.place('c000005', Side.BUY, 5).status == OrderStatus.REJECTED)
+        self.assertTrue(self.place('c000005', Side.BUY, 5, 110.0, fok_flag=True).status == OrderStatus.REJECTED)
+        self.assertTrue(self.exchange.trades.count == 0)
+        self.assertTrue(self.exchange.auction_price('BTC') == (103, 35, 25))
+
+        result = self.exchange.end_auction('BTC')
+        self.assertTrue((result.price, result.volume, result.imbalance) == (103, 35, 25))
+        trades = [self.exchange.trades[number - 1] for number in result.trade_numbers]
+        self.assertTrue({trade.price for trade in trades} == {103} and sum(trade.quantity for trade in trades) == 35)
+        self.assertTrue(self.exchange.get_position('c000002', 'BTC').quantity == 5)
+        self.assertTrue(self.exchange.get_position('c000003', 'BTC').quantity == -35)
+
+        # Continuous trading resumes on an uncrossed OrderBook
+        book = self.exchange.orderbooks['BTC']
+        self.assertTrue(book.best_bid_price() == 103 and book.best_bid().total_quantity == 25)
+        self.assertTrue(book.best_ask_price() == 104 and 'BTC' not in self.exchange.auctions)
+        self.assertTrue(self.place('c000005', Side.BUY, 5).status == OrderStatus.FILLED)
+
+    def test_ModifyAndStops(self):
+        self.place('c000001', Side.SELL, 10, 100.0)
+        bid = self.place('c000002', Side.BUY, 10, 99.0)
+        self.exchange.modify_order('BTC', bid.order_id, 101.0, 10)
+        self.assertTrue(self.exchange.trades.count == 0 and self.exchange.orderbooks['BTC'].best_bid_price() == 101)
+        self.place('c000003', Side.SELL, 5, 99.0, time_in_force=TimeInForce.DAY)
+        stop = self.place('c000004', Side.SELL, 5, stop_flag=True, trigger_price=100.0)
+        self.assertTrue(stop.status == OrderStatus.PENDING)
+        self.place('c000005', Side.BUY, 5, 98.0)
+
+        # Equal volume and surplus at 100 and 101, the lowest price as there's no reference price
+        result = self.exchange.end_auction('BTC')
+        self.assertTrue((result.price, result.volume) == (100, 10))
+        self.assertTrue(len(self.exchange.stop_asks['BTC']) == 0 and self.exchange.trades.count == 3)
+        self.assertTrue(self.exchange.get_last_trade_price('BTC') == 98)
+        with self.assertRaises(AssertionError):
+            self.exchange.end_auction('BTC')
+
+    def test_NothingCrossed(self):
+        self.place('c000001', Side.BUY, 10, 99.0)
+        self.place('c000002', Side.SELL, 10, 100.0)
+        result = self.exchange.end_auction('BTC')
+        self.assertTrue(result.price is None and result.volume == 0 and len(self.exchange.orderbooks['BTC']) == 2)
+        self.exchange.start_auction('ETH')
+        self.assertTrue(self.exchange.end_auction('ETH').price is None)
+
+    def test_LargeUncross(self):
+        rnd = random.Random(7)
+        for idx in range(20000):
+            side = rnd.choice((Side.BUY, Side.SELL))
+            price = float(rnd.randrange(950, 1051))
+            self.place(f'c{idx % 100:06}', side, rnd.randrange(1, 10), price)
+        price, volume, imbalance = self.exchange.auction_price('BTC')
+        result = self.exchange.end_auction('BTC')
+        self.assertTrue(result.price == price and result.volume == volume > 0)
+        self.assertTrue(sum(position.quantity for position in self.exchange.positions) == 0)
+        book = self.exchange.orderbooks['BTC']
+        self.assertTrue(book.best_bid_price() < book.best_ask_price())
+
+    def test_JournalAndSnapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            journal_path = os.path.join(directory, 'engine.journal')
+            snapshot_path = os.path.join(directory, 'engine.snapshot')
+            exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', 1.0)], clock=SimulatedClock())
+            with Journal(journal_path, sync_every=None) as journal:
+                exchange.journal = journal
+                exchange.start_auction('BTC')
+                self.exchange = exchange
+                self.place('c000001', Side.BUY, 10, 101.0)
+                snapshot.save(exchange, snapshot_path)
+                self.place('c000002', Side.SELL, 15, 100.0)
+                exchange.end_auction('BTC')
+                self.place('c000003', Side.BUY, 2, 100.0)
+
+            for restore in (lambda engine: Journal.replay(journal_path, engine),
+                            lambda engine: snapshot.recover(engine, snapshot_path, journal_path)):
+                restored = MatchingEngine(instruments=[InstrumentSpec('BTC', 1.0)])
+                restore(restored)
+                self.assertTrue([(trade.price, trade.quantity) for trade in restored.trades] ==
+                                [(trade.price, trade.quantity) for trade in exchange.trades] == [(100, 10), (100, 2)])
+                self.assertTrue(not restored.auctions and len(restored.orderbooks['BTC']) == 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
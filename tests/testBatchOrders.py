@@ -0,0 +1,81 @@
+import random
+import unittest
+
+from engine.matching_engine import MatchingEngine
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType, OrderStatus
+
+
+def order_flow(size: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    records = []
+    for _ in range(size):
+        side = rng.choice((Side.BUY, Side.SELL))
+        instrument = rng.choice(('BTC', 'ETH'))
+        kind = rng.random()
+        if kind < 0.1:
+            records.append((f'c{rng.randint(1, 5):06}', instrument, OrderType.MARKET, side, rng.randint(1, 30)))
+        elif kind < 0.2:
+            trigger = rng.randint(95, 105)
+            records.append((f'c{rng.randint(1, 5):06}', instrument, OrderType.MARKET, side, rng.randint(1, 30), None,
+                            False, None, False, True, float(trigger)))
+        else:
+            price = float(rng.randint(95, 105))
+            iceberg = kind > 0.9
+            records.append((f'c{rng.randint(1, 5):06}', instrument, OrderType.LIMIT, side, rng.randint(10, 50), price,
+                            iceberg, 5 if iceberg else None, 0.8 < kind < 0.85))
+    return records
+
+
+class TestBatchOrders(unittest.TestCase):
+    def test_SameResultsAsSingleOrders(self):
+        records = order_flow(2000)
+
+        single = MatchingEngine(clock=SimulatedClock())
+        single_reports = [single.match_order(single.new_order(*record)) for record in records]
+
+        batch = MatchingEngine(clock=SimulatedClock())
+        batch_reports = batch.match_orders(records)
+
+        self.assertTrue(len(batch.trades) > 100)
+        self.assertTrue([report.status for report in batch_reports] == [report.status for report in single_reports])
+        self.assertTrue([report.filled_quantity for report in batch_reports] ==
+                        [report.filled_quantity for report in single_reports])
+
+        single_trades = [(trade.instrument, trade.price, trade.quantity, trade.client_id) for trade in single.trades]
+        batch_trades = [(trade.instrument, trade.price, trade.quantity, trade.client_id) for trade in batch.trades]
+        self.assertTrue(single_trades == batch_trades)
+
+        for instrument in ('BTC', 'ETH'):
+            single_book = [(order.price, order.total_quantity) for order in single.orderbooks[instrument].bids]
+            batch_book = [(order.price, order.total_quantity) for order in batch.orderbooks[instrument].bids]
+            self.assertTrue(single_book == batch_book)
+
+    def test_Reports(self):
+        exchange = MatchingEngine()
+        trade_counts = []
+        reports = exchange.match_orders([
+            ('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.00),
+            ('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 101.00),
+            ('c000002', 'BTC', OrderType.LIMIT, Side.BUY, 15, 101.00),
+            {'client_id': 'c000002', 'instrument': 'BTC', 'order_type': OrderType.MARKET, 'side': Side.BUY,
+             'total_quantity': 10},
+            ('c000002', 'BTC', OrderType.LIMIT, Side.BUY, 10, 99.00, False, None, True),
+            ('c000003', 'BTC', OrderType.MARKET, Side.SELL, 5, None, False, None, False, True, 98.00),
+            ('c000003', 'BTC', OrderType.LIMIT, Side.SELL, -5, 100.00),
+            ('c000004', 'BTC', OrderType.LIMIT, Side.BUY, 30, 98.00),
+        ], trade_counts)
+
+        statuses = [report.status for report in reports]
+        self.assertTrue(statuses == [OrderStatus.NEW, OrderStatus.NEW, OrderStatus.FILLED, OrderStatus.KILLED,
+                                     OrderStatus.KILLED, OrderStatus.PENDING, OrderStatus.REJECTED, OrderStatus.NEW])
+        self.assertTrue(list(reports[2].trade_numbers) == [1, 2])
+        self.assertTrue(reports[3].filled_quantity == 5)
+        self.assertTrue(reports[5].leaves_quantity == 5)
+        self.assertTrue(reports[6].reason == 'Quantity has to be positive')
+        self.assertTrue(reports[7].leaves_quantity == 30)
+        self.assertTrue(trade_counts == [0, 0, 2, 3, 3, 3, 3, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+
+from engine.matching_engine import MatchingEngine
+from engine.src.client import Client
+from engine.src.enums import Side, OrderType
+
+
+class TestCancelOrder(unittest.TestCase):
+    def test_CancelOrder(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        order_id = client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 99.00)
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 20, 99.00)
+
+        cancelled = exchange.cancel_order('BTC', order_id)
+        self.assertTrue(cancelled.order_id == order_id)
+        self.assertTrue(len(exchange.orderbooks['BTC'].bids) == 1)
+        self.assertTrue(exchange.orderbooks['BTC'].best_bid().total_quantity == 20)
+        self.assertTrue(exchange.orderbooks['BTC'].get_order(order_id) is None)
+
+    def test_CancelUnknownOrder(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        order_id = client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 10, 99.00)
+
+        self.assertTrue(exchange.cancel_order('ETH', order_id) is None)
+        self.assertTrue(exchange.cancel_order('BTC', 'o999999999') is None)
+        self.assertTrue(exchange.cancel_order('BTC', 'unknown') is None)
+
+        # Cancelled order cannot be cancelled again
+        self.assertTrue(exchange.cancel_order('BTC', order_id) is not None)
+        self.assertTrue(exchange.cancel_order('BTC', order_id) is None)
+
+    def test_CancelFilledOrder(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        order_id = client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.00)
+
+        client_2 = Client(client_name='Jack Jones')
+        client_2.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 100.00)
+
+        self.assertTrue(len(exchange.trades) == 1)
+        self.assertTrue(exchange.cancel_order('BTC', order_id) is None)
+
+    def test_CancelBestLevel(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        order_id = client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.00)
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 10, 101.00)
+
+        exchange.cancel_order('BTC', order_id)
+        self.assertTrue(exchange.orderbooks['BTC'].best_ask_price() == 101.00)
+
+        client_2 = Client(client_name='Jack Jones')
+        client_2.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 5, 101.00)
+        self.assertTrue(exchange.trades[-1].price == 101.00)
+
+    def test_ClientCancel(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        order_id = client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 99.00)
+
+        client_2 = Client(client_name='Jack Jones')
+        self.assertTrue(client_2.cancel_order(exchange, 'BTC', order_id) is None)
+        self.assertTrue(client_1.cancel_order(exchange, 'BTC', order_id) is not None)
+        self.assertTrue(len(exchange.orderbooks['BTC']) == 0)
+
+    def test_ModifyOrder(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        order_id = client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 99.00)
+
+        client_2 = Client(client_name='Jack Jones')
+        client_2.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 20, 99.00)
+
+        # Modified order loses its priority
+        order = exchange.modify_order('BTC', order_id, 99.00, 15)
+        self.assertTrue(order.total_quantity == 15)
+        self.assertTrue(order.show_quantity == 15)
+        self.assertTrue(exchange.orderbooks['BTC'].best_bid().client_id == client_2.client_id)
+
+        exchange.modify_order('BTC', order_id, 100.00, 15)
+        self.assertTrue(exchange.orderbooks['BTC'].best_bid().order_id == order_id)
+        self.assertTrue(exchange.modify_order('BTC', 'o999999999', 100.00, 15) is None)
+
+    def test_ModifyIcebergOrder(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        order_id = client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 50, 100.00, iceberg_flag=True,
+                                        displayed_quantity=10)
+
+        order = exchange.modify_order('BTC', order_id, 100.00, 40, 5)
+        self.assertTrue(order.total_quantity == 40)
+        self.assertTrue(order.displayed_quantity == 5)
+        self.assertTrue(order.show_quantity == 5)
+
+    def test_ModifyCrossingOrder(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.00)
+
+        client_2 = Client(client_name='Jack Jones')
+        order_id = client_2.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 15, 99.00)
+
+        exchange.modify_order('BTC', order_id, 100.00, 15)
+        self.assertTrue(len(exchange.trades) == 1)
+        self.assertTrue(len(exchange.orderbooks['BTC'].asks) == 0)
+
+        best_bid = exchange.orderbooks['BTC'].best_bid()
+        self.assertTrue(best_bid.order_id == order_id)
+        self.assertTrue(best_bid.total_quantity == 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from engine.matching_engine import MatchingEngine
+from engine.src import codec
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType, OrderStatus, TimeInForce
+from engine.src.instrument import InstrumentSpec
+from engine.src.order import order_key
+
+
+class TestCodec(unittest.TestCase):
+    def test_RoundTrip(self):
+        buffer = bytearray(1024)
+        stop = ('c000001', 'BTC', OrderType.MARKET, Side.SELL, 10, None, False, None, False, True, 99.5,
+                TimeInForce.GTC, None)
+        iceberg = ('c000002', 'ETH', OrderType.LIMIT, Side.BUY, 50, 101.25, True, 5, False, False, None,
+                   TimeInForce.GTD, 1_700_000_000_000_000_000)
+
+        offset = codec.encode_new_order(buffer, 0, *stop, tag=1)
+        self.assertTrue(offset == codec.MESSAGE_SIZES[codec.NEW_ORDER])
+        offset = codec.encode_new_order(buffer, offset, *iceberg, tag=2)
+        offset = codec.encode_cancel(buffer, offset, 'BTC', 42, tag=3)
+        offset = codec.encode_modify(buffer, offset, 'ETH', 43, 100.5, 20, tag=4)
+        offset = codec.encode_fill(buffer, offset, 7, 'BTC', 100.0, 3, 42, 44, 123456789)
+        offset = codec.encode_reject(buffer, offset, 'Invalid price' * 10, order_id=45, tag=5)
+
+        messages = list(codec.decode_all(buffer, end=offset))
+        self.assertTrue(messages[0] == (codec.NEW_ORDER, 1, stop))
+        self.assertTrue(messages[1] == (codec.NEW_ORDER, 2, iceberg))
+        self.assertTrue(messages[2] == (codec.CANCEL, 3, ('BTC', 42)))
+        self.assertTrue(messages[3] == (codec.MODIFY, 4, ('ETH', 43, 100.5, 20, None)))
+        self.assertTrue(messages[4] == (codec.FILL, 0, (7, 'BTC', 100.0, 3, 42, 44, 123456789)))
+        self.assertTrue(messages[5][2] == (45, ('Invalid price' * 10)[:codec.REASON_SIZE]))
+        self.assertTrue(messages[0][2][1] is messages[4][2][1])
+
+    def test_Errors(self):
+        buffer = bytearray(128)
+        with self.assertRaises(ValueError):
+            codec.encode_cancel(buffer, 0, 'VERY_LONG_SYMBOL', 1)
+        buffer[0] = 99
+        with self.assertRaises(ValueError):
+            codec.decode(buffer)
+
+    def test_SubmitAll(self):
+        exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.5)], clock=SimulatedClock())
+        buffer = bytearray(1024)
+        offset = codec.encode_new_order(buffer, 0, 'c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.5, tag=1)
+        offset = codec.encode_new_order(buffer, offset, 'c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.2, tag=2)
+        offset = codec.encode_new_order(buffer, offset, 'c000002', 'BTC', OrderType.LIMIT, Side.BUY, 5, 101.0, tag=3)
+        results = codec.submit_all(exchange, memoryview(buffer)[:offset])
+        self.assertTrue([tag for tag, _ in results] == [1, 2, 3])
+        self.assertTrue(results[1][1].status == OrderStatus.REJECTED)
+        self.assertTrue(results[2][1].status == OrderStatus.FILLED)
+
+        resting_id = order_key(results[0][1].order_id)
+        offset = codec.encode_modify(buffer, 0, 'BTC', resting_id, 102.0, 4, tag=4)
+        offset = codec.encode_cancel(buffer, offset, 'BTC', resting_id, tag=5)
+        offset = codec.encode_cancel(buffer, offset, 'BTC', resting_id, tag=6)
+        results = codec.submit_all(exchange, buffer, end=offset)
+        self.assertTrue(results[0][1].price == 204 and results[0][1].total_quantity == 4)
+        self.assertTrue(results[1][1].order_id == results[0][1].order_id and results[2][1] is None)
+
+        report = exchange.match_order(exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 101.0))
+        codec.encode_report(buffer, 0, report, tag=7)
+        self.assertTrue(codec.decode(buffer)[:3] ==
+                        (codec.REPORT, 7, (order_key(report.order_id), OrderStatus.NEW, 0, 10, range(2, 2))))
+
+
+if __name__ == '__main__':
+    unittest.main()
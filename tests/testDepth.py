@@ -0,0 +1,115 @@
+import unittest
+
+from benchmarks.orderflow import generate_order_flow, CANCEL
+from engine.matching_engine import MatchingEngine
+from engine.src import orderbook
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType
+from engine.src.instrument import InstrumentSpec
+
+
+class TestDepth(unittest.TestCase):
+    def setUp(self):
+        self.exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.5)])
+        for price in (100.0, 100.5, 101.0, 101.5):
+            self.place(Side.SELL, 10, price)
+            self.place(Side.BUY, 10, price - 2)
+        self.book = self.exchange.orderbooks['BTC']
+
+    def place(self, side: Side, quantity: int, price: float = None, **options):
+        order_type = OrderType.LIMIT if price is not None else OrderType.MARKET
+        return self.exchange.match_order(self.exchange.new_order('c000001', 'BTC', order_type, side, quantity, price,
+                                                                 **options))
+
+    @staticmethod
+    def expected(side, n: int) -> list:
+        return [(level.price, level.displayed_quantity, level.total_quantity) for level in side.levels()][:n]
+
+    def assertDepth(self, n: int):
+        bids, asks = self.book.get_depth(n)
+        for side, depth in ((self.book.bid_side, bids), (self.book.ask_side, asks)):
+            self.assertTrue(list(zip(*map(list, depth))) == self.expected(side, n))
+
+    def cached(self, depth: tuple, n: int) -> bool:
+        bids, asks = self.book.get_depth(n)
+        return bids is depth[0] and asks is depth[1]
+
+    def test_Depth(self):
+        bids, asks = self.book.get_depth(2)
+        self.assertTrue(list(bids[0]) == [199, 198] and list(asks[0]) == [200, 201])
+        self.assertTrue(list(asks[1]) == [10, 10] and list(asks[2]) == [10, 10])
+
+        self.place(Side.SELL, 20, 100.5, iceberg_flag=True, displayed_quantity=5)
+        self.assertDepth(2)
+        self.assertTrue(list(self.book.get_depth(2)[1][2]) == [10, 30])
+        # More levels than the book has
+        self.assertDepth(10)
+
+    def test_Caching(self):
+        depth = self.book.get_depth(2)
+        self.assertTrue(self.cached(depth, 2))
+
+        # Changes below the cached levels keep the cache
+        self.place(Side.SELL, 5, 101.5)
+        self.place(Side.BUY, 5, 95.0)
+        self.assertTrue(self.cached(depth, 2))
+
+        # Any change of a covered level invalidates it
+        report = self.place(Side.SELL, 5, 100.5)
+        self.assertTrue(self.book.get_depth(2)[0] is depth[0] and self.book.get_depth(2)[1] is not depth[1])
+        self.assertDepth(2)
+
+        depth = self.book.get_depth(2)
+        self.exchange.cancel_order('BTC', report.order_id)
+        self.assertTrue(not self.cached(depth, 2))
+        self.assertDepth(2)
+
+        depth = self.book.get_depth(2)
+        self.place(Side.BUY, 3, 100.0)
+        self.assertTrue(not self.cached(depth, 2))
+        self.assertDepth(2)
+
+        # Cache covering the whole side is invalidated by a new worst level
+        depth = self.book.get_depth(10)
+        self.place(Side.SELL, 5, 110.0)
+        self.assertTrue(not self.cached(depth, 10))
+        self.assertDepth(10)
+
+    def test_ArrayFallback(self):
+        numpy = orderbook.numpy
+        orderbook.numpy = None
+        try:
+            self.place(Side.BUY, 1, 90.0)
+            bids, asks = self.book.get_depth(3)
+            self.assertTrue(bids[0].typecode == 'q' and bids[1].typecode == 'q')
+            self.assertDepth(5)
+        finally:
+            orderbook.numpy = numpy
+
+    def test_MixedPricesWithoutSpec(self):
+        # Integer and fractional prices of an instrument without a spec keep their values
+        exchange = MatchingEngine()
+        for price in (100, 99.5):
+            exchange.match_order(exchange.new_order('c000001', 'ETH', OrderType.LIMIT, Side.BUY, 10, price))
+        bids, _ = exchange.orderbooks['ETH'].get_depth(5)
+        self.assertTrue(list(bids[0]) == [100, 99.5])
+        # Spec'd books keep integer ticks
+        self.assertTrue(all(isinstance(price, int) for price in self.book.get_depth(5)[0][0].tolist()))
+
+    def test_DepthFollowsOrderFlow(self):
+        exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.01)], clock=SimulatedClock())
+        order_ids = {}
+        for idx, (kind, timestamp, payload) in enumerate(generate_order_flow(3000, instruments=('BTC', 'ETH'),
+                                                                             seed=5)):
+            exchange.clock.set(timestamp)
+            if kind == CANCEL:
+                exchange.cancel_order(payload[0], order_ids.get(payload[1], 'o000000'))
+            else:
+                order_ids[idx] = exchange.match_orders([payload])[0].order_id
+            if idx % 7 == 0:
+                for self.book in exchange.orderbooks.values():
+                    self.assertDepth(5)
+
+
+if __name__ == '__main__':
+    unittest.main()
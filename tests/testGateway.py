@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from engine.matching_engine import MatchingEngine
+from engine.src.gateway import Gateway
+from engine.src.instrument import InstrumentSpec
+
+
+class Session:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def send(self, **message):
+        self.writer.write(json.dumps(message).encode() + b'\n')
+        await self.writer.drain()
+
+    async def receive(self) -> dict:
+        return json.loads(await asyncio.wait_for(self.reader.readline(), 5))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def limit(tag, client_id, side, quantity, price, instrument='BTC') -> dict:
+    return dict(type='new', id=tag, client_id=client_id, instrument=instrument, order_type='LIMIT', side=side,
+                quantity=quantity, price=price)
+
+
+class TestGateway(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.5)])
+        self.gateway = Gateway(self.exchange, queue_size=4)
+        self.host, self.port = await self.gateway.listen_tcp()
+
+    async def asyncTearDown(self):
+        await self.gateway.close()
+
+    async def connect(self) -> Session:
+        return Session(*await asyncio.open_connection(self.host, self.port))
+
+    async def test_AcksAndFills(self):
+        seller, buyer = await self.connect(), await self.connect()
+
+        await seller.send(**limit(1, 'c000001', 'SELL', 10, 100.5))
+        resting = await seller.receive()
+        self.assertTrue(resting['type'] == 'ack' and resting['id'] == 1 and resting['status'] == 'NEW' and
+                        resting['leaves'] == 10)
+
+        await buyer.send(**limit(7, 'c000002', 'BUY', 4, 101.0))
+        ack = await buyer.receive()
+        self.assertTrue(ack['status'] == 'FILLED' and ack['filled'] == 4)
+        buyer_fill, seller_fill = await buyer.receive(), await seller.receive()
+        self.assertTrue(buyer_fill['type'] == 'fill' and buyer_fill['side'] == 'BUY' and buyer_fill['price'] == 100.5)
+        self.assertTrue(seller_fill['order_id'] == resting['order_id'] and seller_fill['quantity'] == 4)
+        self.assertTrue(buyer_fill['trade_id'] == seller_fill['trade_id'])
+
+        # Only the owner can modify and cancel the order
+        resting_id = resting['order_id']
+        await buyer.send(type='cancel', id=8, instrument='BTC', order_id=resting_id)
+        self.assertTrue((await buyer.receive())['type'] == 'reject')
+        await seller.send(type='modify', id=2, instrument='BTC', order_id=resting_id, price=102.0, quantity=5)
+        modified = await seller.receive()
+        self.assertTrue(modified['type'] == 'modified' and modified['price'] == 102.0 and modified['quantity'] == 5)
+        await seller.send(type='cancel', id=3, instrument='BTC', order_id=resting_id)
+        self.assertTrue((await seller.receive())['type'] == 'cancelled')
+        self.assertTrue(len(self.exchange.orderbooks['BTC']) == 0)
+
+        await seller.close()
+        await buyer.close()
+
+    async def test_Rejects(self):
+        session = await self.connect()
+        await session.send(**limit(1, 'c000001', 'SELL', 10, 100.2))
+        reject = await session.receive()
+        self.assertTrue(reject['type'] == 'reject' and reject['id'] == 1)
+
+        session.writer.write(b'not json\n')
+        self.assertTrue((await session.receive())['type'] == 'reject')
+        await session.send(**limit(2, 'c000001', 'HOLD', 10, 100.0))
+        self.assertTrue((await session.receive())['id'] == 2)
+        await session.close()
+
+    async def test_ManySessions(self):
+        sessions = [await self.connect() for _ in range(200)]
+
+        async def trade(idx, session):
+            await session.send(**limit(idx, f'c{idx:06}', 'SELL' if idx % 2 else 'BUY', 1, 100.0,
+                                       instrument=('BTC', 'ETH')[idx % 4 // 2]))
+            return await session.receive()
+
+        acks = await asyncio.gather(*(trade(idx, session) for idx, session in enumerate(sessions)))
+        self.assertTrue(all(ack['type'] == 'ack' and ack['id'] == idx for idx, ack in enumerate(acks)))
+        await self.gateway.join()
+        self.assertTrue(self.gateway.sessions == 200)
+        self.assertTrue(self.exchange.trades.count == 100)
+        for session in sessions:
+            await session.close()
+
+    async def test_OwnersAreForgotten(self):
+        gateway = Gateway(self.exchange, prune_size=2)
+        host, port = await gateway.listen_tcp()
+        session = Session(*await asyncio.open_connection(host, port))
+        for tag in (1, 2):
+            await session.send(**limit(tag, 'c000001', 'BUY', 10, 90.0 + tag), time_in_force='DAY')
+            self.assertTrue((await session.receive())['status'] == 'NEW')
+        self.assertTrue(gateway.orders == 2)
+
+        # Expired orders are dropped once the gateway reaches the prune threshold
+        self.assertTrue(len(self.exchange.expire_day()) == 2)
+        for tag in (3, 4):
+            await session.send(**limit(tag, 'c000001', 'BUY', 10, 90.0 + tag))
+            self.assertTrue((await session.receive())['status'] == 'NEW')
+        self.assertTrue(gateway.orders == 2)
+
+        # Disconnected sessions leave no orders behind, the orders of the other sessions are kept
+        other = Session(*await asyncio.open_connection(host, port))
+        await other.send(**limit(5, 'c000002', 'SELL', 10, 110.0))
+        order_id = (await other.receive())['order_id']
+        await session.close()
+        while gateway.sessions > 1:
+            await asyncio.sleep(0.01)
+        self.assertTrue(gateway.orders == 1)
+        await other.send(type='cancel', id=6, instrument='BTC', order_id=order_id)
+        self.assertTrue((await other.receive())['type'] == 'cancelled')
+        self.assertTrue(gateway.orders == 0)
+        await other.close()
+        await gateway.close()
+
+    async def test_UnixSocket(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'gateway.sock')
+            await self.gateway.listen_unix(path)
+            session = Session(*await asyncio.open_unix_connection(path))
+            await session.send(**limit(1, 'c000001', 'BUY', 10, 100.0))
+            self.assertTrue((await session.receive())['status'] == 'NEW')
+            await session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from engine.matching_engine import MatchingEngine
+from engine.src.client import Client
+from engine.src.enums import Side, OrderType
+from engine.src.instrument import InstrumentSpec
+
+
+class TestInstrumentSpec(unittest.TestCase):
+    def test_TickConversion(self):
+        spec = InstrumentSpec('BTC', tick_size=0.01)
+        self.assertTrue(spec.to_ticks(100.01) == 10001)
+        self.assertTrue(spec.to_price(10001) == 100.01)
+        self.assertRaises(ValueError, spec.to_ticks, 100.015)
+
+    def test_TickPrices(self):
+        exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', tick_size=0.5)])
+        client_1 = Client(client_name='John Adams')
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.50)
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 10, 101.00)
+
+        best_ask = exchange.orderbooks['BTC'].best_ask()
+        self.assertTrue(best_ask.price == 201)
+        self.assertTrue(isinstance(best_ask.price, int))
+
+        client_2 = Client(client_name='Jack Jones')
+        client_2.place_order(exchange, 'BTC', OrderType.MARKET, Side.BUY, 15)
+
+        self.assertTrue(len(exchange.trades) == 2)
+        self.assertTrue(exchange.trades[-1].price == 202)
+        self.assertTrue(exchange.to_price('BTC', exchange.get_last_trade_price()) == 101.00)
+        self.assertTrue(exchange.orderbooks['BTC'].get_level_quantity(Side.SELL, 202) == 5)
+
+    def test_TickStopAndModify(self):
+        exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', tick_size=0.01)])
+        client_1 = Client(client_name='John Adams')
+        client_1.place_order(exchange, 'BTC', OrderType.MARKET, Side.BUY, 5, stop_flag=True, trigger_price=100.01)
+        order_id = client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.02)
+        self.assertTrue(exchange.stop_bids['BTC'][0].trigger_price == 10001)
+
+        exchange.modify_order('BTC', order_id, 100.01, 10)
+        self.assertTrue(exchange.orderbooks['BTC'].best_ask_price() == 10001)
+
+        client_2 = Client(client_name='Jack Jones')
+        client_2.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 1, 100.01)
+        self.assertTrue(len(exchange.trades) == 2)
+        self.assertTrue(exchange.orderbooks['BTC'].best_ask().total_quantity == 4)
+
+    def test_OrderValidation(self):
+        exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', tick_size=0.01, lot_size=5,
+                                                              min_price=50.00, max_price=150.00)])
+        client_1 = Client(client_name='John Adams')
+        self.assertRaises(ValueError, client_1.place_order, exchange, 'BTC', OrderType.LIMIT, Side.BUY, 7, 100.00)
+        self.assertRaises(ValueError, client_1.place_order, exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 100.001)
+        self.assertRaises(ValueError, client_1.place_order, exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 160.00)
+        self.assertRaises(ValueError, client_1.place_order, exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 40.00)
+
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 100.00)
+        self.assertTrue(len(exchange.orderbooks['BTC'].bids) == 1)
+
+    def test_MarketSentinels(self):
+        exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', tick_size=0.01)])
+        client_1 = Client(client_name='John Adams')
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 100.00)
+
+        client_2 = Client(client_name='Jack Jones')
+        client_2.place_order(exchange, 'BTC', OrderType.MARKET, Side.SELL, 10)
+        self.assertTrue(isinstance(exchange.trades[-1].price, int))
+        self.assertTrue(len(exchange.orderbooks['BTC']) == 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from benchmarks.orderflow import generate_order_flow, CANCEL
+from engine.matching_engine import MatchingEngine
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType, OrderStatus
+from engine.src.instrument import InstrumentSpec
+from engine.src.journal import Journal
+from engine.src.order import Order, next_order_id, reset_order_ids
+
+
+def engine_state(engine: MatchingEngine) -> bytes:
+    books = {instrument: [(order.id, order.side, order.price, order.total_quantity, order.displayed_quantity,
+                           order.show_quantity, order.sequence, order.timestamp) for order in book.bids + book.asks]
+             for instrument, book in engine.orderbooks.items()}
+    stops = [(instrument, [(order.id, order.trigger_price, order.sequence) for order in stop_book])
+             for stops in (engine.stop_bids, engine.stop_asks) for instrument, stop_book in stops.items()]
+    trades = [(trade.trade_id, trade.client_id, trade.instrument, trade.price, trade.quantity, trade.order_id_b,
+               trade.order_id_a, trade.timestamp) for trade in engine.trades]
+    return pickle.dumps((books, stops, trades, engine.sequence))
+
+
+def create_engine(**options) -> MatchingEngine:
+    return MatchingEngine(instruments=[InstrumentSpec('BTC', 0.01), InstrumentSpec('ETH', 0.01)], **options)
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'engine.journal')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_ReplayRebuildsState(self):
+        clock = SimulatedClock()
+        with Journal(self.path, sync_every=64) as journal:
+            exchange = create_engine(clock=clock, journal=journal)
+            order_ids = {}
+            for idx, (kind, timestamp, payload) in enumerate(generate_order_flow(3000, instruments=('BTC', 'ETH'),
+                                                                                 seed=5)):
+                clock.set(timestamp)
+                if kind == CANCEL:
+                    exchange.cancel_order(payload[0], order_ids.get(payload[1], 'o000000'))
+                    continue
+                report = exchange.match_order(exchange.new_order(*payload))
+                order_ids[idx] = report.order_id
+                if idx % 10 == 0 and exchange.orderbooks[payload[1]].best_bid():
+                    # Reprice the best bid one tick up, crossing the book now and then
+                    best = exchange.orderbooks[payload[1]].best_bid()
+                    exchange.modify_order(payload[1], best.order_id, exchange.to_price(payload[1], best.price + 1),
+                                          best.total_quantity)
+            # Orders rejected by new_order never reach the engine and are not journaled
+            records = journal.records
+            exchange.match_orders([('c000001', 'BTC', OrderType.LIMIT, Side.BUY, 10, 100.001)])
+            self.assertTrue(journal.records == records)
+            # Modifications are journaled before the engine rejects them and are rejected again on replay
+            best = exchange.orderbooks['BTC'].best_bid()
+            with self.assertRaises(ValueError):
+                exchange.modify_order('BTC', best.order_id, 100.001, best.total_quantity)
+            records = journal.records
+
+        recovered = create_engine()
+        self.assertTrue(Journal.replay(self.path, recovered) == records)
+        self.assertTrue(recovered.trades.count > 500)
+        self.assertTrue(engine_state(recovered) == engine_state(exchange))
+
+        # Recovered engine continues the order ID sequence
+        order = recovered.new_order('c000001', 'BTC', OrderType.LIMIT, Side.BUY, 1, 1.0)
+        self.assertTrue(order.id > max(int(order_id[1:]) for order_id in order_ids.values()))
+
+    def test_ReplayKeepsIdSequence(self):
+        with Journal(self.path) as journal:
+            exchange = create_engine(journal=journal)
+            exchange.match_order(exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.0))
+        # Another engine of the process keeps generating IDs on a sequence with its own step
+        reset_order_ids(next_order_id() + 100, 3)
+        start = next_order_id()
+
+        Journal.replay(self.path, create_engine())
+        # Replaying the older records neither rewinds the sequence nor changes its step
+        first, second = (create_engine().new_order('c000001', 'BTC', OrderType.LIMIT, Side.BUY, 1, 1.0).id
+                         for _ in range(2))
+        self.assertTrue(first >= start and (first - start) % 3 == 0 and second == first + 3)
+        reset_order_ids(second + 1)
+
+    def test_TornRecord(self):
+        with Journal(self.path, sync_every=None) as journal:
+            exchange = create_engine(journal=journal)
+            exchange.match_order(exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.0))
+            exchange.match_order(exchange.new_order('c000002', 'BTC', OrderType.LIMIT, Side.BUY, 4, 100.0))
+        with open(self.path, 'r+b') as file:
+            file.truncate(os.path.getsize(self.path) - 3)
+
+        recovered = create_engine()
+        self.assertTrue(Journal.replay(self.path, recovered) == 1)
+        self.assertTrue(len(recovered.orderbooks['BTC'].asks) == 1 and recovered.trades.count == 0)
+
+    def test_ReopenAfterTornRecord(self):
+        with Journal(self.path, sync_every=None) as journal:
+            exchange = create_engine(journal=journal)
+            exchange.match_order(exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.0))
+            exchange.match_order(exchange.new_order('c000002', 'BTC', OrderType.LIMIT, Side.BUY, 4, 100.0))
+            complete = journal.offset
+        with open(self.path, 'r+b') as file:
+            file.truncate(complete - 3)
+
+        # The torn record is cut off before the new records are appended
+        with Journal(self.path, sync_every=None) as journal:
+            self.assertTrue(journal.offset < complete - 3)
+            exchange.journal = journal
+            exchange.match_order(exchange.new_order('c000003', 'BTC', OrderType.LIMIT, Side.BUY, 6, 100.0))
+            exchange.journal = None
+        self.assertTrue(os.path.getsize(self.path) == complete)
+
+        recovered = create_engine()
+        self.assertTrue(Journal.replay(self.path, recovered) == 2)
+        self.assertTrue([trade.quantity for trade in recovered.trades] == [6])
+
+    def test_CorruptedRecord(self):
+        with Journal(self.path, sync_every=None) as journal:
+            exchange = create_engine(journal=journal)
+            for client_id in ('c000001', 'c000002', 'c000003'):
+                exchange.match_order(exchange.new_order(client_id, 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.0))
+            size = journal.offset // 3
+        with open(self.path, 'r+b') as file:
+            file.seek(size + 30)
+            file.write(b'\xff')
+
+        # The log ends at the record failing its checksum, reopening it cuts the rest off
+        self.assertTrue([order_id for _, order_id, _, _ in Journal.read(self.path)] ==
+                        [order.id for order in exchange.orderbooks['BTC'].asks[:1]])
+        with Journal(self.path) as journal:
+            self.assertTrue(journal.offset == size == os.path.getsize(self.path))
+
+    def test_LongSymbols(self):
+        with Journal(self.path) as journal:
+            exchange = create_engine(journal=journal)
+            with self.assertRaises(ValueError):
+                exchange.new_order('client-000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.0)
+            # Records not fitting the journal are rejected without stopping the batch
+            long_order = Order('c000001', 'BITCOIN-USD', OrderType.LIMIT, Side.SELL, 10, 100.0, False, None, False,
+                               False, None)
+            reports = exchange.match_orders([('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.0),
+                                             ('c000002', 'BITCOIN-USD', OrderType.LIMIT, Side.SELL, 10, 100.0),
+                                             long_order,
+                                             ('c000003', 'BTC', OrderType.LIMIT, Side.BUY, 4, 100.0)])
+            self.assertTrue([report.status for report in reports] ==
+                            [OrderStatus.NEW, OrderStatus.REJECTED, OrderStatus.REJECTED, OrderStatus.FILLED])
+            self.assertTrue(reports[2].order_id == long_order.order_id)
+            self.assertTrue(exchange.orderbooks['BITCOIN-USD'].asks == [])
+
+        recovered = create_engine()
+        self.assertTrue(Journal.replay(self.path, recovered) == 2)
+        self.assertTrue(recovered.trades.count == 1)
+
+    def test_ReplayRequiresDetachedJournal(self):
+        with Journal(self.path) as journal:
+            with self.assertRaises(AssertionError):
+                Journal.replay(self.path, create_engine(journal=journal))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+from engine.matching_engine import MatchingEngine
+from engine.src.enums import Side, OrderType
+from engine.src.latency import LatencyHistogram, LatencyRecorder, BOOK, FOK_CHECK, SWEEP, REMOVE, INSERT, STOPS
+
+
+class TestLatency(unittest.TestCase):
+    def setUp(self):
+        self.recorder = LatencyRecorder()
+        self.exchange = MatchingEngine(latency=self.recorder)
+
+    def place(self, instrument: str, side: Side, quantity: int, price: float = None, **options):
+        order_type = OrderType.LIMIT if price is not None else OrderType.MARKET
+        return self.exchange.match_order(self.exchange.new_order('c000001', instrument, order_type, side, quantity,
+                                                                 price, **options))
+
+    def test_Histogram(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 100_001):
+            histogram.record(value)
+        self.assertTrue(histogram.count == 100_000 and histogram.min == 1 and histogram.max == 100_000)
+        for percentile in (1, 50, 90, 99, 99.9):
+            exact = percentile * 1000
+            self.assertTrue(exact <= histogram.percentile(percentile) <= exact * 1.125)
+        self.assertTrue(histogram.percentile(100) == 100_000)
+
+        # Small values are exact, huge ones still fit
+        histogram = LatencyHistogram()
+        for value in (0, 3, 7, 2 ** 62):
+            histogram.record(value)
+        self.assertTrue(histogram.percentile(50) == 3 and histogram.percentile(75) == 7)
+        self.assertTrue(histogram.percentile(100) == 2 ** 62)
+        self.assertTrue(LatencyHistogram().percentile(50) is None)
+
+        merged = LatencyHistogram()
+        merged.merge(histogram)
+        self.assertTrue(merged.summary() == histogram.summary())
+
+    def test_Phases(self):
+        self.place('BTC', Side.SELL, 10, 100.0)
+        self.place('BTC', Side.SELL, 10, 101.0)
+        self.place('BTC', Side.BUY, 5, stop_flag=True, trigger_price=100.0)
+        self.place('ETH', Side.BUY, 20, 10.0, fok_flag=True)
+        # Sweeps a whole level, triggers the stop and rests the remainder
+        self.place('BTC', Side.BUY, 12, 100.0)
+
+        self.assertTrue(self.recorder.histogram(BOOK).count == 5)
+        self.assertTrue(self.recorder.histogram(FOK_CHECK).count == 1)
+        self.assertTrue(self.recorder.histogram(FOK_CHECK, instrument='ETH').count == 1)
+        self.assertTrue(self.recorder.histogram(REMOVE, OrderType.LIMIT, 'BTC').count == 1)
+        self.assertTrue(self.recorder.histogram(INSERT).count == 3)
+        # Cascade is measured once per inbound order, including the stops' own phases
+        self.assertTrue(self.recorder.histogram(STOPS).count == 1)
+        self.assertTrue(self.recorder.histogram(STOPS, OrderType.LIMIT).count == 1)
+        # Stop order reaching the book is measured as any other order
+        self.assertTrue(self.recorder.histogram(SWEEP, OrderType.MARKET).count == 1)
+
+        stats = self.exchange.latency_stats(percentiles=(50, 99.9))
+        self.assertTrue(sorted(stats['order_type']) == ['LIMIT', 'MARKET'])
+        self.assertTrue(sorted(stats['instrument']) == ['BTC', 'ETH'])
+        self.assertTrue(list(stats['instrument']['ETH']) == [BOOK, FOK_CHECK])
+        summary = stats['order_type']['LIMIT'][SWEEP]
+        self.assertTrue(summary['count'] == 3 and summary['p50'] <= summary['p99.9'] <= summary['max'])
+
+    def test_Disabled(self):
+        exchange = MatchingEngine()
+        exchange.match_orders([('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.0)])
+        self.assertTrue(exchange.latency_stats() is None)
+
+        # Recording can be switched on at any time
+        exchange.latency = self.recorder
+        exchange.match_orders([('c000002', 'BTC', OrderType.LIMIT, Side.BUY, 10, 100.0)])
+        self.assertTrue(self.recorder.histogram(BOOK).count == 1 and self.recorder.histogram(REMOVE).count == 1)
+        self.recorder.reset()
+        self.assertTrue(len(self.recorder) == 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+from benchmarks.orderflow import generate_order_flow, CANCEL
+from engine.matching_engine import MatchingEngine
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType
+from engine.src.instrument import InstrumentSpec
+from engine.src.marketdata import MarketDataFeed
+
+
+class TestMarketData(unittest.TestCase):
+    def setUp(self):
+        self.feed = MarketDataFeed()
+        self.exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.5)], feed=self.feed)
+        self.updates = []
+        self.feed.subscribe(self.updates.append)
+
+    def place(self, side: Side, quantity: int, price: float = None, **options):
+        order_type = OrderType.LIMIT if price is not None else OrderType.MARKET
+        return self.exchange.match_order(self.exchange.new_order('c000001', 'BTC', order_type, side, quantity, price,
+                                                                 **options))
+
+    def test_LevelUpdates(self):
+        self.place(Side.SELL, 10, 100.5)
+        self.assertTrue([(u.side, u.price, u.displayed_quantity) for u in self.updates.pop()] ==
+                        [(Side.SELL, 100.5, 10)])
+
+        report = self.place(Side.SELL, 20, 100.5, iceberg_flag=True, displayed_quantity=5)
+        self.assertTrue([(u.price, u.displayed_quantity) for u in self.updates.pop()] == [(100.5, 15)])
+
+        # Sweeps the first order and part of the iceberg's displayed quantity, which is replenished
+        self.place(Side.BUY, 12, 101.0)
+        self.assertTrue([(u.side, u.price, u.displayed_quantity) for u in self.updates.pop()] ==
+                        [(Side.SELL, 100.5, 3)])
+
+        # Iceberg's displayed quantity is used up and replenished from the hidden one
+        self.place(Side.BUY, 3, 100.5)
+        self.assertTrue([(u.price, u.displayed_quantity) for u in self.updates.pop()] == [(100.5, 5)])
+
+        self.place(Side.BUY, 4, 99.0)
+        self.exchange.modify_order('BTC', self.exchange.orderbooks['BTC'].best_bid().order_id, 98.5, 4)
+        self.assertTrue([(u.price, u.displayed_quantity) for u in self.updates[-1]] == [(99.0, 0), (98.5, 4)])
+
+        self.exchange.cancel_order('BTC', report.order_id)
+        self.assertTrue([(u.side, u.price, u.displayed_quantity) for u in self.updates[-1]] ==
+                        [(Side.SELL, 100.5, 0)])
+        self.assertTrue(self.exchange.cancel_order('BTC', report.order_id) is None)
+
+    def test_UpdatesRebuildTheBook(self):
+        exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.01)], clock=SimulatedClock())
+        levels = {}
+
+        def apply(updates):
+            for update in updates:
+                if update.displayed_quantity:
+                    levels[(update.instrument, update.side, update.price)] = update.displayed_quantity
+                else:
+                    del levels[(update.instrument, update.side, update.price)]
+
+        order_ids = {}
+        for idx, (kind, timestamp, payload) in enumerate(generate_order_flow(3000, instruments=('BTC', 'ETH'),
+                                                                             seed=9)):
+            if idx == 1000:
+                # Subscriber joining later starts from the full book
+                exchange.feed = feed = MarketDataFeed()
+                for book in exchange.orderbooks.values():
+                    apply(feed.book_levels(book))
+                feed.subscribe(apply)
+                tops = feed.subscribe_top_of_book()
+            exchange.clock.set(timestamp)
+            if kind == CANCEL:
+                exchange.cancel_order(payload[0], order_ids.get(payload[1], 'o000000'))
+            else:
+                order_ids[idx] = exchange.match_orders([payload])[0].order_id
+
+        to_price = exchange.to_price
+        expected = {(book.instrument, side.side, to_price(book.instrument, level.price)): level.displayed_quantity
+                    for book in exchange.orderbooks.values() for side in (book.bid_side, book.ask_side)
+                    for level in side.levels()}
+        self.assertTrue(len(expected) > 50)
+        self.assertTrue(levels == expected)
+
+        # Conflated stream holds only the latest quote of each instrument
+        quotes = tops.poll()
+        self.assertTrue(sorted(top.instrument for top in quotes) == ['BTC', 'ETH'])
+        for top in quotes:
+            book = exchange.orderbooks[top.instrument]
+            self.assertTrue(top.bid_price == exchange.to_price(top.instrument, book.best_bid_price()))
+            self.assertTrue(top.ask_quantity == book.ask_side.best_level().displayed_quantity)
+        self.assertTrue(tops.poll() == [])
+
+
+if __name__ == '__main__':
+    unittest.main()
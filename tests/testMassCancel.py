@@ -0,0 +1,160 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks.orderflow import generate_order_flow, CANCEL
+from engine.matching_engine import MatchingEngine
+from engine.src import snapshot
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType
+from engine.src.instrument import InstrumentSpec
+from engine.src.journal import Journal
+
+
+class TestMassCancel(unittest.TestCase):
+    def setUp(self):
+        self.exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.5)])
+        for client_id in ('c000001', 'c000002'):
+            for instrument, price in (('BTC', 100.0), ('ETH', 10.0)):
+                for offset in range(5):
+                    self.place(client_id, instrument, Side.BUY, price - offset - 1)
+                    self.place(client_id, instrument, Side.SELL, price + offset)
+
+    def place(self, client_id: str, instrument: str, side: Side, price: float, quantity: int = 10):
+        return self.exchange.match_order(self.exchange.new_order(client_id, instrument, OrderType.LIMIT, side,
+                                                                 quantity, price))
+
+    def test_ClientIndex(self):
+        self.assertTrue(len(self.exchange.get_client_orders('c000001')) == 20)
+        self.assertTrue(len(self.exchange.get_client_orders('c000001', 'ETH')) == 10)
+
+        # Filled orders leave the index, partially filled ones stay
+        self.place('c000003', 'BTC', Side.BUY, 100.0, 15)
+        self.assertTrue(len(self.exchange.get_client_orders('c000001', 'BTC')) == 9)
+        self.assertTrue(len(self.exchange.get_client_orders('c000002', 'BTC')) == 10)
+        self.assertTrue(self.exchange.orderbooks['BTC'].best_ask().client_id == 'c000002')
+        self.assertTrue(self.exchange.orderbooks['BTC'].best_ask().total_quantity == 5)
+        self.assertTrue(self.exchange.get_client_orders('c000003') == [])
+
+        bids, asks = self.exchange.orderbooks['ETH'].get_client_orders('c000002')
+        self.assertTrue(len(bids) == 5 and len(asks) == 5)
+        self.assertTrue(self.exchange.get_client_orders('unknown') == [])
+
+    def test_CancelClient(self):
+        cancelled = self.exchange.mass_cancel('c000001')
+        self.assertTrue(len(cancelled) == 20)
+        self.assertTrue('c000001' not in self.exchange.client_orders)
+        self.assertTrue(all(order.client_id == 'c000002' for book in self.exchange.orderbooks.values()
+                            for order in book.bids + book.asks))
+        self.assertTrue(self.exchange.mass_cancel('c000001') == [])
+
+        cancelled = self.exchange.mass_cancel('c000002', 'BTC', side=Side.SELL, max_price=101.0)
+        self.assertTrue(sorted(order.price for order in cancelled) == [200, 202])
+        self.assertTrue(len(self.exchange.get_client_orders('c000002')) == 18)
+
+    def test_CancelPriceRange(self):
+        # Range bounds are rounded inwards to whole ticks
+        cancelled = self.exchange.mass_cancel(instrument='BTC', min_price=96.8, max_price=101.2)
+        self.assertTrue(sorted({order.price for order in cancelled}) == [194, 196, 198, 200, 202])
+        self.assertTrue(len(cancelled) == 10)
+        book = self.exchange.orderbooks['BTC']
+        self.assertTrue(book.best_bid_price() == 192 and book.best_ask_price() == 204)
+
+        cancelled = self.exchange.mass_cancel(instrument='ETH', side=Side.BUY, max_price=7.0)
+        self.assertTrue([order.price for order in cancelled] == [7.0, 7.0, 6.0, 6.0, 5.0, 5.0])
+        self.assertTrue(self.exchange.mass_cancel(instrument='ETH', min_price=20.0, max_price=10.0) == [])
+        self.assertTrue(self.exchange.mass_cancel(instrument='XRP') == [])
+        self.assertTrue(len(self.exchange.get_client_orders('c000001')) == 12)
+
+        with self.assertRaises(AssertionError):
+            self.exchange.mass_cancel()
+
+    def test_UnknownInstrument(self):
+        self.assertTrue(self.exchange.mass_cancel('c000001', 'XRP') == [])
+        self.assertTrue(self.exchange.mass_cancel('unknown', 'XRP') == [])
+        self.assertTrue(len(self.exchange.get_client_orders('c000001')) == 20)
+
+    def test_CancelStops(self):
+        stop = self.exchange.match_order(self.exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.BUY, 5, 110.0,
+                                                                 stop_flag=True, trigger_price=105.0))
+        self.exchange.match_order(self.exchange.new_order('c000002', 'ETH', OrderType.LIMIT, Side.SELL, 5, 1.0,
+                                                          stop_flag=True, trigger_price=2.0))
+        # Stop orders are kept if asked to
+        self.assertTrue(len(self.exchange.mass_cancel('c000001', stops=False)) == 20)
+        self.assertTrue(self.exchange.get_order('BTC', stop.order_id) is not None)
+
+        # The price range applies to the trigger price of the stop orders
+        self.assertTrue(self.exchange.mass_cancel(instrument='BTC', min_price=106.0) == [])
+        cancelled = self.exchange.mass_cancel(instrument='BTC', min_price=104.5)
+        self.assertTrue([order.order_id for order in cancelled] == [stop.order_id])
+        self.assertTrue(self.exchange.get_order('BTC', stop.order_id) is None)
+
+        cancelled = self.exchange.mass_cancel('c000002', side=Side.SELL)
+        self.assertTrue(len(cancelled) == 11 and cancelled[-1].trigger_price == 2.0)
+        self.assertTrue(self.exchange.mass_cancel('c000002', side=Side.SELL) == [])
+
+    def test_ClientStopIndex(self):
+        def stop(client_id: str, instrument: str, side: Side, trigger_price: float):
+            return self.exchange.match_order(self.exchange.new_order(client_id, instrument, OrderType.LIMIT, side, 1,
+                                                                     trigger_price, stop_flag=True,
+                                                                     trigger_price=trigger_price)).order_id
+
+        stop('c000003', 'BTC', Side.BUY, 150.0)
+        triggered = stop('c000003', 'BTC', Side.BUY, 101.0)
+        stop('c000003', 'XRP', Side.SELL, 5.0)
+        stop('c000004', 'BTC', Side.SELL, 50.0)
+        self.assertTrue({client_id: {instrument: len(orders) for instrument, orders in instruments.items()}
+                         for client_id, instruments in self.exchange.client_stops.items()} ==
+                        {'c000003': {'BTC': 2, 'XRP': 1}, 'c000004': {'BTC': 1}})
+
+        # Triggered stop orders leave the index
+        self.place('c000001', 'BTC', Side.BUY, 101.0, 30)
+        self.assertTrue(triggered not in [order.order_id for order in
+                                          self.exchange.client_stops['c000003']['BTC'].values()])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'engine.snapshot')
+            snapshot.save(self.exchange, path)
+            restored = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.5)])
+            snapshot.load(path, restored)
+        self.assertTrue({client_id: {instrument: set(orders) for instrument, orders in instruments.items()}
+                         for client_id, instruments in restored.client_stops.items()} ==
+                        {client_id: {instrument: set(orders) for instrument, orders in instruments.items()}
+                         for client_id, instruments in self.exchange.client_stops.items()})
+
+        # The client without resting orders gets its stop orders cancelled through the index
+        cancelled = self.exchange.mass_cancel('c000003')
+        self.assertTrue(sorted(order.trigger_price for order in cancelled) == [5.0, 300])
+        self.assertTrue(list(self.exchange.client_stops) == ['c000004'])
+        self.assertTrue(len(self.exchange.stop_bids['BTC']) == 0 and len(self.exchange.stop_asks['XRP']) == 0)
+
+    def test_JournalReplay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'engine.journal')
+            with Journal(path, sync_every=None) as journal:
+                exchange = MatchingEngine(clock=SimulatedClock(), journal=journal)
+                order_ids = {}
+                for idx, (kind, timestamp, payload) in enumerate(generate_order_flow(2000, instruments=('BTC',),
+                                                                                     seed=4)):
+                    exchange.clock.set(timestamp)
+                    if kind == CANCEL:
+                        exchange.cancel_order(payload[0], order_ids.get(payload[1], 'o000000'))
+                    else:
+                        order_ids[idx] = exchange.match_order(exchange.new_order(*payload)).order_id
+                    if idx == 1000:
+                        client_id = exchange.orderbooks['BTC'].best_bid().client_id
+                        self.assertTrue(exchange.mass_cancel(client_id))
+
+            replayed = MatchingEngine()
+            Journal.replay(path, replayed)
+            self.assertTrue(replayed.trades.count == exchange.trades.count)
+            self.assertTrue([order.id for order in replayed.orderbooks['BTC'].bids] ==
+                            [order.id for order in exchange.orderbooks['BTC'].bids])
+            self.assertTrue({client_id: {instrument: list(orders) for instrument, orders in instruments.items()}
+                             for client_id, instruments in replayed.client_orders.items()} ==
+                            {client_id: {instrument: list(orders) for instrument, orders in instruments.items()}
+                             for client_id, instruments in exchange.client_orders.items()})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+from engine.src.order import Order
+from engine.src.orderbook import OrderBook
+from engine.src.enums import Side, OrderType
+
+
+def limit_order(side: Side, quantity: int, price: float) -> Order:
+    return Order('c000001', 'BTC', OrderType.LIMIT, side, quantity, price, False, None, False, False, None)
+
+
+class TestOrderBook(unittest.TestCase):
+    def test_LevelsSorted(self):
+        book = OrderBook('BTC')
+        for price in (99.00, 101.00, 100.00):
+            book.add_order(limit_order(Side.BUY, 10, price))
+            book.add_order(limit_order(Side.SELL, 10, price + 5))
+
+        self.assertTrue([order.price for order in book.bids] == [101.00, 100.00, 99.00])
+        self.assertTrue([order.price for order in book.asks] == [104.00, 105.00, 106.00])
+        self.assertTrue(book.best_bid_price() == 101.00)
+        self.assertTrue(book.best_ask_price() == 104.00)
+        self.assertTrue(len(book) == 6)
+
+    def test_LevelQueue(self):
+        book = OrderBook('BTC')
+        first = limit_order(Side.SELL, 10, 100.00)
+        second = limit_order(Side.SELL, 20, 100.00)
+        third = limit_order(Side.SELL, 30, 100.00)
+        for order in (first, second, third):
+            book.add_order(order)
+
+        self.assertTrue(len(book.ask_side.get_level(100.00)) == 3)
+        self.assertTrue(book.best_ask() is first)
+
+        book.remove_order(second)
+        self.assertTrue(book.asks == [first, third])
+
+        book.remove_order(first)
+        self.assertTrue(book.best_ask() is third)
+
+        book.remove_order(third)
+        self.assertTrue(book.best_ask() is None)
+        self.assertTrue(book.ask_side.get_level(100.00) is None)
+        self.assertTrue(len(book) == 0)
+
+    def test_RemoveInnerLevel(self):
+        book = OrderBook('BTC')
+        orders = [limit_order(Side.BUY, 10, price) for price in (98.00, 99.00, 100.00)]
+        for order in orders:
+            book.add_order(order)
+
+        book.remove_order(orders[1])
+        self.assertTrue([level.price for level in book.bid_side.levels()] == [100.00, 98.00])
+
+        # Removing an order which is not in the book does nothing
+        book.remove_order(orders[1])
+        self.assertTrue(len(book) == 2)
+
+    def test_LevelAggregates(self):
+        book = OrderBook('BTC')
+        order = limit_order(Side.SELL, 10, 100.00)
+        iceberg = Order('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 50, 100.00, True, 10, False, False, None)
+        book.add_order(order)
+        book.add_order(iceberg)
+
+        level = book.ask_side.get_level(100.00)
+        self.assertTrue(level.total_quantity == 60)
+        self.assertTrue(level.displayed_quantity == 20)
+
+        level.fill(iceberg, 15)
+        self.assertTrue(level.total_quantity == 45)
+        self.assertTrue(level.displayed_quantity == 15)
+
+        book.modify_order(order.order_id, Side.SELL, 100.00, 4)
+        self.assertTrue(level.total_quantity == 39)
+        self.assertTrue(level.displayed_quantity == 9)
+
+        book.cancel_order(iceberg.order_id)
+        self.assertTrue(book.get_level_quantity(Side.SELL, 100.00) == 4)
+        self.assertTrue(book.get_level_quantity(Side.SELL, 100.00, displayed=True) == 4)
+
+    def test_LevelsQuantity(self):
+        book = OrderBook('BTC')
+        for price in (100.00, 101.00, 102.00):
+            book.add_order(limit_order(Side.SELL, 10, price))
+            book.add_order(limit_order(Side.BUY, 5, price - 5))
+
+        self.assertTrue(book.get_level_quantity(Side.SELL, 101.00) == 10)
+        self.assertTrue(book.get_level_quantity(Side.SELL, 101.50) == 0)
+        self.assertTrue(book.get_levels_quantity(Side.SELL, 101.00) == 20)
+        self.assertTrue(book.get_levels_quantity(Side.SELL, 99.00) == 0)
+        self.assertTrue(book.get_levels_quantity(Side.BUY, 96.00) == 10)
+        self.assertTrue(book.ask_side.quantity_to(102.00, limit=15) == 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from benchmarks import run
+from benchmarks.compare import compare
+from benchmarks.orderflow import generate_order_flow, CANCEL, LIMIT, DEFAULT_MIX
+
+
+class TestOrderFlow(unittest.TestCase):
+    def test_SeededFlow(self):
+        flow = list(generate_order_flow(5000, seed=1))
+        self.assertTrue(flow == list(generate_order_flow(5000, seed=1)))
+        self.assertTrue(flow != list(generate_order_flow(5000, seed=2)))
+
+        timestamps = [timestamp for _, timestamp, _ in flow]
+        self.assertTrue(timestamps == sorted(timestamps))
+
+        kinds = [kind for kind, _, _ in flow]
+        self.assertTrue(set(kinds) == set(DEFAULT_MIX))
+        self.assertTrue(0.4 < kinds.count(LIMIT) / len(kinds) < 0.6)
+
+        # Cancels always refer to an earlier order of the same instrument
+        for idx, (kind, _, payload) in enumerate(flow):
+            if kind == CANCEL:
+                instrument, target = payload
+                self.assertTrue(target < idx and flow[target][2][1] == instrument)
+
+    def test_Benchmark(self):
+        results = run.run(events=3000, measure_memory=False)
+        self.assertTrue(results['latency_ns']['all']['count'] == 3000)
+        self.assertTrue(results['throughput']['events_per_sec'] > 0)
+        self.assertTrue(results['trades'] > 0)
+
+        slower = dict(results, throughput={'events_per_sec': results['throughput']['events_per_sec'] // 2})
+        regressions = [row[0] for row in compare(results, slower) if row[-1]]
+        self.assertTrue(regressions == ['events_per_sec'])
+
+
+if __name__ == '__main__':
+    unittest.main()
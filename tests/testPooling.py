@@ -0,0 +1,82 @@
+import unittest
+
+from benchmarks.orderflow import generate_order_flow, CANCEL
+from engine.matching_engine import MatchingEngine
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType, OrderStatus
+from engine.src.instrument import InstrumentSpec
+from engine.src.order import OrderPool, reset_order_ids
+from engine.src.report import ExecutionReport
+
+
+def run_flow(pooled: bool) -> MatchingEngine:
+    reset_order_ids()
+    exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.01)], clock=SimulatedClock(), pooled=pooled)
+    order_ids = {}
+    for idx, (kind, timestamp, payload) in enumerate(generate_order_flow(4000, instruments=('BTC', 'ETH'), seed=8)):
+        exchange.clock.set(timestamp)
+        if kind == CANCEL:
+            exchange.cancel_order(payload[0], order_ids.get(payload[1], 'o000000'))
+        else:
+            order_ids[idx] = exchange.match_order(exchange.new_order(*payload)).order_id
+    return exchange
+
+
+def book_state(exchange: MatchingEngine) -> dict:
+    return {instrument: [(order.order_id, order.client_id, order.price, order.total_quantity, order.sequence)
+                         for order in book.bids + book.asks] for instrument, book in exchange.orderbooks.items()}
+
+
+class TestPooling(unittest.TestCase):
+    def test_SameResults(self):
+        regular, pooled = run_flow(False), run_flow(True)
+        self.assertTrue(pooled.pool.reused > 1000 and pooled.pool.created < pooled.pool.reused)
+        self.assertTrue([repr(trade) for trade in pooled.trades] == [repr(trade) for trade in regular.trades])
+        self.assertTrue(book_state(pooled) == book_state(regular))
+
+    def test_Recycling(self):
+        exchange = MatchingEngine(pooled=True)
+        resting = exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.0)
+        exchange.match_order(resting)
+        report = exchange.match_order(exchange.new_order('c000002', 'BTC', OrderType.LIMIT, Side.BUY, 10, 100.0))
+        self.assertTrue(report.status == OrderStatus.FILLED and len(exchange.pool) == 2)
+
+        # Filled order is re-used with a new ID, the report keeps the old one
+        order = exchange.new_order('c000003', 'BTC', OrderType.LIMIT, Side.BUY, 5, 99.0)
+        self.assertTrue(order.id > int(report.order_id[1:]) and len(exchange.pool) == 1)
+        exchange.match_order(order)
+        self.assertTrue(exchange.cancel_order('BTC', order.order_id).order_id == order.order_id)
+        self.assertTrue(len(exchange.pool) == 2)
+
+        pool = OrderPool(capacity=1)
+        pool.release(order)
+        pool.release(resting)
+        self.assertTrue(len(pool) == 1)
+
+    def test_RecycledStopOrder(self):
+        exchange = MatchingEngine(pooled=True)
+        stop = exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.BUY, 5, 115.0, stop_flag=True,
+                                  trigger_price=110.0)
+        exchange.match_order(stop)
+        exchange.cancel_order('BTC', stop.order_id)
+
+        # The cancelled stop order is re-used with a higher trigger price while its old heap entry is still queued
+        order = exchange.new_order('c000002', 'BTC', OrderType.LIMIT, Side.BUY, 5, 205.0, stop_flag=True,
+                                   trigger_price=200.0)
+        self.assertTrue(order is stop)
+        exchange.match_order(order)
+        exchange.match_order(exchange.new_order('c000003', 'BTC', OrderType.LIMIT, Side.SELL, 1, 110.0))
+        exchange.match_order(exchange.new_order('c000004', 'BTC', OrderType.LIMIT, Side.BUY, 1, 110.0))
+        self.assertTrue(exchange.get_order('BTC', order.order_id) is order and order.stop_flag)
+        self.assertTrue(exchange.orderbooks['BTC'].bids == [] and len(exchange.trades) == 1)
+
+    def test_LazyOrderIds(self):
+        report = ExecutionReport(42, OrderStatus.NEW, 0, 10)
+        self.assertTrue(report.order_id == 'o000042' and repr(report).startswith('Order ID: o000042'))
+        self.assertTrue(report == ExecutionReport('o000042', OrderStatus.NEW, 0, 10))
+        report.order_id = 'o000043'
+        self.assertTrue(report.order_id == 'o000043')
+
+
+if __name__ == '__main__':
+    unittest.main()
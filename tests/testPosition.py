@@ -0,0 +1,80 @@
+import unittest
+
+from benchmarks.orderflow import generate_order_flow, CANCEL
+from engine.matching_engine import MatchingEngine
+from engine.src.client import Client
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType
+from engine.src.position import Position
+
+
+class TestPosition(unittest.TestCase):
+    def test_Fills(self):
+        position = Position('c000001', 'BTC')
+        position.fill(Side.BUY, 100.0, 10)
+        position.fill(Side.BUY, 103.0, 20)
+        self.assertTrue(position.quantity == 30 and position.average_price == 102.0)
+
+        # Reducing the position realizes the P&L against the average cost
+        position.fill(Side.SELL, 105.0, 10)
+        self.assertTrue(position.quantity == 20 and position.average_price == 102.0)
+        self.assertTrue(position.realized_pnl == 30.0)
+        self.assertTrue(position.unrealized_pnl(101.0) == -20.0)
+
+        # Reversing the position opens the rest at the fill price
+        position.fill(Side.SELL, 100.0, 25)
+        self.assertTrue(position.quantity == -5 and position.average_price == 100.0)
+        self.assertTrue(position.realized_pnl == -10.0)
+        position.fill(Side.BUY, 98.0, 5)
+        self.assertTrue(position.quantity == 0 and position.average_price == 0)
+        self.assertTrue(position.realized_pnl == 0.0)
+        self.assertTrue(position.volume == 70 and position.trades == 5)
+
+    def test_BothCounterparties(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 50, 100.00)
+        client_2 = Client(client_name='Jack Jones')
+        client_2.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 100.00)
+        client_2.place_order(exchange, 'BTC', OrderType.MARKET, Side.BUY, 5)
+
+        trade = exchange.trades[0]
+        self.assertTrue(trade.client_id == client_2.client_id and trade.passive_client_id == client_1.client_id)
+        self.assertTrue(trade.client_id_b == client_2.client_id and trade.client_id_a == client_1.client_id)
+        self.assertTrue(len(client_1.get_trades(exchange)) == 2)
+
+        seller = client_1.get_positions(exchange)['BTC']
+        self.assertTrue(seller.quantity == -15 and seller.average_price == 100.00 and seller.volume == 15)
+        buyer = exchange.get_position(client_2.client_id, 'BTC')
+        self.assertTrue(buyer.quantity == 15 and buyer.trades == 2)
+        self.assertTrue(exchange.get_position(client_2.client_id, 'ETH') is None)
+        self.assertTrue(exchange.get_client_positions('unknown') == {})
+
+    def test_PositionsMatchTrades(self):
+        exchange = MatchingEngine(clock=SimulatedClock())
+        order_ids = {}
+        for idx, (kind, timestamp, payload) in enumerate(generate_order_flow(3000, instruments=('BTC', 'ETH'),
+                                                                             seed=21)):
+            exchange.clock.set(timestamp)
+            if kind == CANCEL:
+                exchange.cancel_order(payload[0], order_ids.get(payload[1], 'o000000'))
+            else:
+                order_ids[idx] = exchange.match_order(exchange.new_order(*payload)).order_id
+
+        # Rebuilt from the whole trade history
+        expected = {}
+        for trade in exchange.trades:
+            for client_id, side in ((trade.client_id_b, Side.BUY), (trade.client_id_a, Side.SELL)):
+                position = expected.setdefault((client_id, trade.instrument), Position(client_id, trade.instrument))
+                position.fill(side, trade.price, trade.quantity)
+
+        self.assertTrue(len(expected) == len(exchange.positions) > 10)
+        for (client_id, instrument), position in expected.items():
+            actual = exchange.get_position(client_id, instrument)
+            self.assertTrue((actual.quantity, actual.average_price, actual.realized_pnl, actual.volume) ==
+                            (position.quantity, position.average_price, position.realized_pnl, position.volume))
+        self.assertTrue(sum(position.quantity for position in exchange.positions) == 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
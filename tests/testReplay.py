@@ -0,0 +1,141 @@
+import csv
+import os
+import tempfile
+import unittest
+
+from benchmarks.orderflow import generate_order_flow
+from benchmarks.replay import replay_events
+from benchmarks.run import drive
+from engine.matching_engine import MatchingEngine
+from engine.src import codec
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType, TimeInForce
+from engine.src.instrument import InstrumentSpec
+from engine.src.replay import ReplayDriver, CSV_COLUMNS, read_csv, read_binary, read_events, write_csv, write_binary
+
+EVENTS = ','.join(CSV_COLUMNS) + '''
+1000,new,1,BTC,c1,LIMIT,SELL,10,100.0,,,,
+2000,new,2,BTC,c2,LIMIT,SELL,5,101.0,,,,
+3000,new,3,BTC,c3,MARKET,BUY,12,,,,,
+4000,new,4,BTC,c4,LIMIT,BUY,5,99.0,,,DAY,
+4500,new,5,BTC,c5,LIMIT,BUY,5,104.0,,102.0,,
+5000,modify,4,BTC,,,,6,99.5,,,,
+6000,cancel,4,BTC,,,,,,,,,
+7000,cancel,42,BTC,,,,,,,,,
+8000,new,6,BTC,c6,LIMIT,BUY,1,101.0,,,FOK,
+'''
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.directory.name, 'events.csv')
+        self.binary_path = os.path.join(self.directory.name, 'events.bin')
+        self.output = os.path.join(self.directory.name, 'output.csv')
+        with open(self.csv_path, 'w') as file:
+            file.write(EVENTS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read_output(self) -> list:
+        with open(self.output, newline='') as file:
+            return list(csv.reader(file))
+
+    def test_ReadCsv(self):
+        events = list(read_csv(self.csv_path))
+        self.assertTrue(len(events) == 9)
+        self.assertTrue(events[3] == (4000, 4, codec.NEW_ORDER, ('c4', 'BTC', OrderType.LIMIT, Side.BUY, 5, 99.0, False,
+                                                                 None, False, False, None, TimeInForce.DAY, None)))
+        # Trigger price makes a stop order, FOK time in force a fill-or-kill order
+        self.assertTrue(events[4][3][9] is True and events[4][3][10] == 102.0)
+        self.assertTrue(events[8][3][8] is True and events[8][3][11] == TimeInForce.GTC)
+        self.assertTrue(events[5] == (5000, 0, codec.MODIFY, ('BTC', 4, 99.5, 6, None)))
+        self.assertTrue(events[6] == (6000, 0, codec.CANCEL, ('BTC', 4)))
+
+    def test_InvalidCsvRow(self):
+        with open(self.csv_path, 'a') as file:
+            file.write('9000,new,7,BTC,c7,LIMIT,HOLD,1,100.0,,,,\n')
+        with self.assertRaises(ValueError) as context:
+            list(read_csv(self.csv_path))
+        self.assertTrue('line 11' in str(context.exception))
+
+    def test_FormatsRoundTrip(self):
+        events = list(read_csv(self.csv_path))
+        self.assertTrue(write_binary(read_csv(self.csv_path), self.binary_path) == len(events))
+        self.assertTrue(list(read_binary(self.binary_path)) == events)
+
+        converted = os.path.join(self.directory.name, 'converted.csv')
+        self.assertTrue(write_csv(read_events(self.binary_path), converted) == len(events))
+        self.assertTrue(list(read_events(converted)) == events)
+
+    def test_StreamsFillsAndLevels(self):
+        stats = ReplayDriver(MatchingEngine(), self.output).run(read_events(self.csv_path))
+        self.assertTrue(stats['events'] == 9 and stats['orders'] == 6 and stats['trades'] == 3)
+        # Cancel of an unknown reference
+        self.assertTrue(stats['rejected'] == 1)
+
+        rows = self.read_output()
+        fills = [row for row in rows if row[0] == 'fill']
+        # The market order sweeps both asks, the fill-or-kill order takes the rest of the second one
+        self.assertTrue(fills == [['fill', '3000', '1', 'BTC', '100.0', '10', 'BUY', '3', '1'],
+                                  ['fill', '3000', '2', 'BTC', '101.0', '2', 'BUY', '3', '2'],
+                                  ['fill', '8000', '3', 'BTC', '101.0', '1', 'BUY', '6', '2']])
+        levels = [row[1:] for row in rows if row[0] == 'level']
+        self.assertTrue(['5000', 'BTC', 'BUY', '99.5', '6'] in levels)
+        self.assertTrue(levels[-1] == ['8000', 'BTC', 'SELL', '101.0', '2'])
+        self.assertTrue(stats['level_updates'] == len(levels))
+
+    def test_OutsideWorldPrices(self):
+        # Fills and levels of an instrument with a spec are written in the outside world prices, not in ticks
+        ReplayDriver(MatchingEngine(instruments=[InstrumentSpec('BTC', 0.5)]), self.output).run(
+            read_events(self.csv_path))
+        rows = self.read_output()
+        self.assertTrue([row[4] for row in rows if row[0] == 'fill'] == ['100.0', '101.0', '101.0'])
+        self.assertTrue(['5000', 'BTC', 'BUY', '99.5', '6'] in [row[1:] for row in rows if row[0] == 'level'])
+
+    def test_ReplayMatchesDirectDriving(self):
+        flow = list(generate_order_flow(3000, seed=11))
+        direct = MatchingEngine(clock=SimulatedClock())
+        drive(direct, flow)
+
+        write_binary(replay_events(flow), self.binary_path)
+        engine = MatchingEngine(trade_retention=100)
+        stats = ReplayDriver(engine, self.output, levels=False).run(read_events(self.binary_path))
+        # The engine's clock and feed are given back after the replay
+        self.assertTrue(engine.feed is None and not isinstance(engine.clock, SimulatedClock))
+        # Only the retention window of the trades is kept in memory
+        self.assertTrue(len(engine.trades) < 125)
+
+        fills = [(row[1], row[3], float(row[4]), int(row[5]), row[6]) for row in self.read_output()]
+        self.assertTrue(stats['trades'] == len(direct.trades) == len(fills))
+        self.assertTrue(fills == [(str(trade.timestamp), trade.instrument, trade.price, trade.quantity, trade.side.name)
+                                  for trade in direct.trades])
+
+    def test_ReferencesStayBounded(self):
+        def events(first: int, last: int):
+            # Every resting sell is filled passively by the following market buy
+            for idx in range(first, last):
+                yield idx * 2, idx, codec.NEW_ORDER, ('c1', 'BTC', OrderType.LIMIT, Side.SELL, 1, 100.0, False, None,
+                                                      False, False, None, TimeInForce.GTC, None)
+                yield idx * 2 + 1, -idx, codec.NEW_ORDER, ('c2', 'BTC', OrderType.MARKET, Side.BUY, 1, None, False,
+                                                           None, False, False, None, TimeInForce.GTC, None)
+
+        driver = ReplayDriver(MatchingEngine(trade_retention=10), prune_size=16)
+        # Maps the run method keeps working with
+        references, order_refs = driver._references, driver._order_refs
+        self.assertTrue(driver.run(events(1, 2501))['trades'] == 2500)
+        self.assertTrue(len(references) < 16 and len(order_refs) < 16)
+        self.assertTrue(driver.run(events(2501, 5001))['trades'] == 2500)
+        self.assertTrue(len(references) < 16 and len(order_refs) < 16)
+        self.assertTrue(driver.references == len(references))
+
+    def test_PacedReplay(self):
+        # 7 microseconds of recorded events replayed 10000 times slower
+        stats = ReplayDriver(MatchingEngine(), speed=1e-4).run(read_events(self.csv_path))
+        self.assertTrue(stats['seconds'] >= 0.07)
+        self.assertTrue(stats['events'] == 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
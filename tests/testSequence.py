@@ -0,0 +1,52 @@
+import unittest
+
+from engine.matching_engine import MatchingEngine
+from engine.src.client import Client
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType
+
+
+class TestSequence(unittest.TestCase):
+    def test_SequenceNumbers(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 99.00)
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 99.00)
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 100.00)
+
+        bids = exchange.orderbooks['BTC'].bids
+        self.assertTrue([bid.sequence for bid in bids] == [3, 1, 2])
+        self.assertTrue(exchange.sequence == 3)
+        self.assertTrue(bids[1].timestamp <= bids[2].timestamp <= bids[0].timestamp)
+
+    def test_SimulatedClock(self):
+        clock = SimulatedClock(start=1_000_000_000)
+        exchange = MatchingEngine(clock=clock)
+        client_1 = Client(client_name='John Adams')
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.00)
+
+        clock.advance(500_000)
+        client_2 = Client(client_name='Jack Jones')
+        client_2.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 5, 100.00)
+
+        self.assertTrue(exchange.orderbooks['BTC'].best_ask().timestamp == 1_000_000_000)
+        self.assertTrue(exchange.trades[-1].timestamp == 1_000_500_000)
+        self.assertTrue(exchange.format_timestamp(exchange.trades[-1].timestamp).endswith('01.000500'))
+
+        # Simulated clock never goes backwards
+        clock.set(0)
+        self.assertTrue(clock.now() == 1_000_500_000)
+
+    def test_ModifyLosesPriority(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        order_id = client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.00)
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.00)
+
+        order = exchange.modify_order('BTC', order_id, 100.00, 20)
+        self.assertTrue(order.sequence == 3)
+        self.assertTrue(exchange.orderbooks['BTC'].asks[-1] is order)
+
+
+if __name__ == '__main__':
+    unittest.main()
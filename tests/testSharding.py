@@ -0,0 +1,77 @@
+import unittest
+
+from engine.matching_engine import MatchingEngine
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType, OrderStatus
+from engine.src.sharding import ShardedMatchingEngine
+from benchmarks.orderflow import generate_order_flow, CANCEL
+
+
+def trade_fields(trades) -> list:
+    return [(trade.instrument, trade.price, trade.quantity, trade.client_id) for trade in trades]
+
+
+class TestSharding(unittest.TestCase):
+    def test_SameResultsAsSingleEngine(self):
+        records = [payload for kind, _, payload in generate_order_flow(1500, instruments=('BTC', 'ETH'), seed=3)
+                   if kind != CANCEL]
+
+        single = MatchingEngine(clock=SimulatedClock())
+        single_reports = single.match_orders(records)
+
+        with ShardedMatchingEngine(2, clock=SimulatedClock()) as sharded:
+            self.assertTrue(sharded.shard('BTC') != sharded.shard('ETH'))
+            reports, trades = [], []
+            # Results of consecutive batches continue the same merged stream
+            for start in range(0, len(records), 300):
+                batch_reports, batch_trades = sharded.match_orders(records[start:start + 300])
+                reports.extend(batch_reports)
+                trades.extend(batch_trades)
+
+            for instrument in ('BTC', 'ETH'):
+                bids = sharded.call(instrument, 'orderbooks')[instrument].bids
+                self.assertTrue([(order.price, order.total_quantity) for order in bids] ==
+                                [(order.price, order.total_quantity) for order in single.orderbooks[instrument].bids])
+
+        self.assertTrue([report.status for report in reports] == [report.status for report in single_reports])
+        self.assertTrue([report.filled_quantity for report in reports] ==
+                        [report.filled_quantity for report in single_reports])
+        self.assertTrue(trade_fields(trades) == trade_fields(single.trades))
+        self.assertTrue([trade.trade_id for trade in trades] == [f't{idx:06}' for idx in range(1, len(trades) + 1)])
+        for report in reports:
+            for number in report.trade_numbers:
+                self.assertTrue(trades[number - 1].quantity == single.trades[number - 1].quantity)
+
+    def test_DisjointOrderIds(self):
+        with ShardedMatchingEngine(2) as sharded:
+            reports, _ = sharded.match_orders([('c000001', 'BTC', OrderType.LIMIT, Side.BUY, 10, 100.0),
+                                               ('c000001', 'ETH', OrderType.LIMIT, Side.BUY, 10, 100.0)])
+            self.assertTrue(reports[0].order_id != reports[1].order_id)
+
+            self.assertTrue(sharded.cancel_order('ETH', reports[1].order_id).order_id == reports[1].order_id)
+            self.assertTrue(sharded.cancel_order('ETH', reports[1].order_id) is None)
+            modified = sharded.modify_order('BTC', reports[0].order_id, 99.0, 5)
+            self.assertTrue(modified.price == 99.0 and modified.total_quantity == 5)
+
+    def test_Errors(self):
+        with ShardedMatchingEngine(2) as sharded:
+            reports, trades = sharded.match_orders([('c000001', 'BTC', OrderType.LIMIT, Side.BUY, -10, 100.0)])
+            self.assertTrue(reports[0].status == OrderStatus.REJECTED and trades == [])
+
+            # Replies of the other shards are read even if one shard fails, the next batch gets its own results
+            self.assertTrue(sharded.shard('BTC') != sharded.shard('ETH'))
+            sharded.match_orders([('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.0)])
+            with self.assertRaises(TypeError):
+                sharded.match_orders([('c000002', 'BTC', OrderType.LIMIT, Side.BUY, 10, '100.0'),
+                                      ('c000002', 'ETH', OrderType.LIMIT, Side.BUY, 10, 10.0)])
+            reports, _ = sharded.match_orders([('c000003', 'ETH', OrderType.LIMIT, Side.SELL, 4, 10.0)])
+            self.assertTrue(reports[0].status == OrderStatus.FILLED)
+
+            with self.assertRaises(AttributeError):
+                sharded.call('BTC', 'unknown_method')
+            # The worker keeps serving after a failed call
+            self.assertTrue(sharded.call('BTC', 'get_last_trade_price', 'BTC') is None)
+
+
+if __name__ == '__main__':
+    unittest.main()
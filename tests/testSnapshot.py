@@ -0,0 +1,147 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks.orderflow import generate_order_flow, CANCEL
+from engine.matching_engine import MatchingEngine
+from engine.src import snapshot
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType
+from engine.src.instrument import InstrumentSpec
+from engine.src.journal import Journal
+from engine.src.marketdata import MarketDataFeed
+from engine.src.order import next_order_id, reset_order_ids
+
+
+def engine_state(engine: MatchingEngine, first_trade: int) -> tuple:
+    books = {instrument: [(order.id, order.client_id, order.side, order.price, order.total_quantity,
+                           order.displayed_quantity, order.show_quantity, order.iceberg_flag, order.sequence,
+                           order.timestamp) for order in book.bids + book.asks]
+             for instrument, book in engine.orderbooks.items()}
+    levels = {instrument: [(level.price, len(level), level.total_quantity, level.displayed_quantity)
+                           for side in (book.bid_side, book.ask_side) for level in side.levels()]
+              for instrument, book in engine.orderbooks.items()}
+    stops = [{instrument: [(order.id, order.order_type, order.price, order.trigger_price, order.sequence)
+                           for order in stop_book] for instrument, stop_book in stops.items()}
+             for stops in (engine.stop_bids, engine.stop_asks)]
+    positions = sorted((position.client_id, position.instrument, position.quantity, position.average_price,
+                        position.realized_pnl, position.volume, position.trades) for position in engine.positions)
+    deferred = {instrument: [order.id for order in orders] for instrument, orders in engine.deferred_stops.items()}
+    trades = [(trade.trade_id, trade.client_id, trade.instrument, trade.price, trade.quantity, trade.order_id_b,
+               trade.order_id_a, trade.timestamp) for trade in engine.trades.trades_since(first_trade)]
+    last_prices = {instrument: engine.get_last_trade_price(instrument) for instrument in engine.orderbooks}
+    return books, levels, stops, deferred, positions, trades, last_prices, engine.sequence, engine.trades.count
+
+
+def create_engine(**options) -> MatchingEngine:
+    # ETH has no spec, its float prices are kept as they are
+    return MatchingEngine(instruments=[InstrumentSpec('BTC', 0.01)], **options)
+
+
+def drive(exchange: MatchingEngine, events: list, order_ids: dict):
+    for idx, (kind, timestamp, payload) in events:
+        exchange.clock.set(timestamp)
+        if kind == CANCEL:
+            exchange.cancel_order(payload[0], order_ids.get(payload[1], 'o000000'))
+        else:
+            order_ids[idx] = exchange.match_order(exchange.new_order(*payload)).order_id
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.snapshot_path = os.path.join(self.directory.name, 'engine.snapshot')
+        self.journal_path = os.path.join(self.directory.name, 'engine.journal')
+        self.events = list(enumerate(generate_order_flow(4000, instruments=('BTC', 'ETH'), seed=11)))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_SaveAndLoad(self):
+        exchange = create_engine(clock=SimulatedClock())
+        drive(exchange, self.events, {})
+        self.assertTrue(any(exchange.stop_bids.values()) and any(exchange.stop_asks.values()))
+        snapshot.save(exchange, self.snapshot_path)
+
+        restored = create_engine()
+        self.assertTrue(snapshot.load(self.snapshot_path, restored) == 0)
+        # Trades executed before the snapshot are not part of it
+        self.assertTrue(len(restored.trades) == 0)
+        self.assertTrue(engine_state(restored, exchange.trades.count) == engine_state(exchange, exchange.trades.count))
+        self.assertTrue(isinstance(restored.orderbooks['BTC'].best_bid().price, int))
+        self.assertTrue(isinstance(restored.orderbooks['ETH'].best_bid().price, float))
+
+        with self.assertRaises(AssertionError):
+            snapshot.load(self.snapshot_path, restored)
+
+    def test_SnapshotWithJournalTail(self):
+        order_ids = {}
+        with Journal(self.journal_path, sync_every=None) as journal:
+            exchange = create_engine(clock=SimulatedClock(), journal=journal)
+            drive(exchange, self.events[:2500], order_ids)
+            snapshot_trades = exchange.trades.count
+            writer = snapshot.save(exchange, self.snapshot_path, background=True)
+            drive(exchange, self.events[2500:], order_ids)
+            writer.join()
+
+        recovered = create_engine()
+        self.assertTrue(snapshot.recover(recovered, self.snapshot_path, self.journal_path) == len(self.events) - 2500)
+        self.assertTrue(recovered.trades.count > snapshot_trades)
+        self.assertTrue(engine_state(recovered, snapshot_trades) == engine_state(exchange, snapshot_trades))
+
+        # Recovered engine continues the order ID sequence
+        order = recovered.new_order('c000001', 'BTC', OrderType.LIMIT, Side.BUY, 1, 1.0)
+        self.assertTrue(order.id > max(int(order_id[1:]) for order_id in order_ids.values()))
+
+    def test_DeferredStops(self):
+        with Journal(self.journal_path, sync_every=None) as journal:
+            exchange = create_engine(clock=SimulatedClock(), journal=journal, stop_cascade_limit=1)
+            order_ids = {}
+            drive(exchange, self.events[:2500], order_ids)
+            snapshot.save(exchange, self.snapshot_path)
+            drive(exchange, self.events[2500:], order_ids)
+        self.assertTrue(exchange.stop_cascades.deferred > 0)
+
+        restored = create_engine(stop_cascade_limit=1)
+        snapshot.recover(restored, self.snapshot_path, self.journal_path)
+        self.assertTrue(engine_state(restored, exchange.trades.count) == engine_state(exchange, exchange.trades.count))
+
+    def test_LoadKeepsIdSequence(self):
+        exchange = create_engine()
+        exchange.match_order(exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.0))
+        snapshot.save(exchange, self.snapshot_path)
+        # Another engine of the process keeps generating IDs on a sequence with its own step
+        reset_order_ids(next_order_id() + 100, 3)
+        start = next_order_id()
+
+        snapshot.load(self.snapshot_path, create_engine())
+        # Loading the older snapshot neither rewinds the sequence nor changes its step
+        self.assertTrue(next_order_id() == start)
+        first, second = (exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.BUY, 1, 1.0).id for _ in range(2))
+        self.assertTrue(first == start and second == start + 3)
+        reset_order_ids(second + 1)
+
+    def test_LoadWithFeed(self):
+        exchange = create_engine()
+        exchange.match_order(exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.5))
+        snapshot.save(exchange, self.snapshot_path)
+
+        restored = create_engine(feed=MarketDataFeed())
+        snapshot.load(self.snapshot_path, restored)
+        updates = []
+        restored.feed.subscribe(updates.extend)
+        restored.match_order(restored.new_order('c000002', 'BTC', OrderType.LIMIT, Side.BUY, 4, 100.5))
+        self.assertTrue([(update.side, update.price, update.displayed_quantity) for update in updates] ==
+                        [(Side.SELL, 100.5, 6)])
+        top = restored.feed.top_of_book('BTC')
+        self.assertTrue(top.ask_price == 100.5 and top.ask_quantity == 6 and top.bid_price is None)
+
+    def test_NotASnapshot(self):
+        with open(self.snapshot_path, 'wb') as file:
+            file.write(bytes(128))
+        with self.assertRaises(ValueError):
+            snapshot.load(self.snapshot_path, create_engine())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -166,6 +166,101 @@ class TestStopOrder(unittest.TestCase):
         self.assertTrue(best_bid.total_quantity == 140)
         self.assertTrue(best_bid.price == 99.00)
 
+    def test_StopTriggeredByOppositeSide(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        client_1.place_order(exchange, 'BTC', OrderType.MARKET, Side.BUY, 10, stop_flag=True, trigger_price=100.00)
+
+        client_2 = Client(client_name='Jack Jones')
+        client_2.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 20, 102.00)
+        client_2.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 5, 101.00)
+
+        client_3 = Client(client_name='Clark Kent')
+        client_3.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 5, 101.00)
+
+        self.assertTrue(len(exchange.trades) == 2)
+        self.assertTrue(len(exchange.stop_bids['BTC']) == 0)
+        self.assertTrue(exchange.trades[-1].price == 102.00)
+
+        best_ask = exchange.orderbooks['BTC'].best_ask()
+        self.assertTrue(best_ask.total_quantity == 10)
+
+    def test_StopCancelled(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        order_id = client_1.place_order(exchange, 'BTC', OrderType.MARKET, Side.SELL, 10, stop_flag=True,
+                                        trigger_price=100.00)
+        client_1.place_order(exchange, 'BTC', OrderType.MARKET, Side.SELL, 15, stop_flag=True, trigger_price=99.00)
+
+        cancelled = exchange.cancel_order('BTC', order_id)
+        self.assertTrue(cancelled.order_id == order_id)
+        self.assertTrue(len(exchange.stop_asks['BTC']) == 1)
+        self.assertTrue(exchange.stop_asks['BTC'][0].total_quantity == 15)
+
+        client_2 = Client(client_name='Jack Jones')
+        client_2.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 50, 99.00)
+        client_2.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 5, 99.00)
+
+        self.assertTrue(len(exchange.trades) == 2)
+        self.assertTrue(exchange.orderbooks['BTC'].best_bid().total_quantity == 30)
+
+    def test_StopQueuePriority(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        for trigger_price in (98.00, 100.00, 99.00, 100.00):
+            client_1.place_order(exchange, 'BTC', OrderType.MARKET, Side.SELL, 10, stop_flag=True,
+                                 trigger_price=trigger_price)
+
+        triggers = [order.trigger_price for order in exchange.stop_asks['BTC']]
+        self.assertTrue(triggers == [100.00, 100.00, 99.00, 98.00])
+        self.assertTrue(exchange.stop_asks['BTC'][1].order_id > exchange.stop_asks['BTC'][0].order_id)
+
+        triggered = exchange.get_stops('BTC', 99.00, Side.SELL)
+        self.assertTrue([order.trigger_price for order in triggered] == [100.00, 100.00, 99.00])
+        self.assertTrue(len(exchange.stop_asks['BTC']) == 1)
+
+    @staticmethod
+    def stop_ladder(exchange: MatchingEngine, levels: int):
+        """Every BUY stop lifts the next ask level, whose price triggers the next stop"""
+        for idx in range(levels + 1):
+            exchange.match_order(exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 1, 100.00 + idx))
+        for idx in range(levels):
+            exchange.match_order(exchange.new_order('c000002', 'BTC', OrderType.MARKET, Side.BUY, 1, stop_flag=True,
+                                                    trigger_price=100.00 + idx))
+
+    def test_DeepCascade(self):
+        exchange = MatchingEngine()
+        self.stop_ladder(exchange, 3000)
+        exchange.match_order(exchange.new_order('c000003', 'BTC', OrderType.MARKET, Side.BUY, 1))
+
+        self.assertTrue(len(exchange.trades) == 3001)
+        self.assertTrue(len(exchange.stop_bids['BTC']) == 0)
+        self.assertTrue(exchange.get_last_trade_price('BTC') == 3100.00)
+        stats = exchange.stop_cascades
+        self.assertTrue(stats.cascades == 1 and stats.stops_fired == 3000 and stats.max_depth == 3000)
+        self.assertTrue(stats.deferred == 0 and stats.time_ns > 0)
+
+    def test_CascadeLimit(self):
+        exchange = MatchingEngine(stop_cascade_limit=10)
+        self.stop_ladder(exchange, 25)
+        exchange.match_order(exchange.new_order('c000003', 'BTC', OrderType.MARKET, Side.BUY, 1))
+        self.assertTrue(len(exchange.trades) == 11)
+        self.assertTrue([order.trigger_price for order in exchange.deferred_stops['BTC']] == [110.00])
+
+        # Deferred stops are matched before the next order of the instrument
+        report = exchange.match_order(exchange.new_order('c000003', 'BTC', OrderType.LIMIT, Side.BUY, 1, 50.00))
+        self.assertTrue(report.filled_quantity == 0)
+        self.assertTrue(len(exchange.trades) == 21)
+        self.assertTrue(exchange.get_last_trade_price('BTC') == 120.00)
+        self.assertTrue(exchange.stop_cascades.deferred == 2 and exchange.stop_cascades.max_fired == 10)
+
+        # Deferred stop can still be cancelled
+        deferred = exchange.deferred_stops['BTC'][0]
+        self.assertTrue(exchange.cancel_order('BTC', deferred.order_id) is deferred)
+        self.assertTrue('BTC' not in exchange.deferred_stops)
+        exchange.match_order(exchange.new_order('c000003', 'BTC', OrderType.LIMIT, Side.BUY, 1, 50.00))
+        self.assertTrue(len(exchange.trades) == 21 and len(exchange.stop_bids['BTC']) == 4)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+
+from engine.matching_engine import MatchingEngine
+from engine.src import snapshot
+from engine.src.clock import SimulatedClock
+from engine.src.enums import Side, OrderType, OrderStatus, TimeInForce
+from engine.src.instrument import InstrumentSpec
+from engine.src.journal import Journal
+
+SECOND = 1_000_000_000
+
+
+class TestTimeInForce(unittest.TestCase):
+    def setUp(self):
+        self.exchange = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.5)], clock=SimulatedClock(SECOND))
+
+    def place(self, side: Side, quantity: int, price: float, instrument: str = 'BTC', **options):
+        return self.exchange.match_order(self.exchange.new_order('c000001', instrument, OrderType.LIMIT, side,
+                                                                 quantity, price, **options))
+
+    def test_ImmediateOrCancel(self):
+        self.place(Side.SELL, 10, 100.0)
+        report = self.place(Side.BUY, 25, 100.5, time_in_force=TimeInForce.IOC)
+        self.assertTrue(report.status == OrderStatus.KILLED)
+        self.assertTrue(report.filled_quantity == 10 and report.leaves_quantity == 0)
+        self.assertTrue(len(self.exchange.orderbooks['BTC']) == 0)
+
+        report = self.place(Side.BUY, 5, 100.5, time_in_force=TimeInForce.IOC)
+        self.assertTrue(report.status == OrderStatus.KILLED and report.filled_quantity == 0)
+
+    def test_GoodTillDate(self):
+        clock = self.exchange.clock
+        expiring = self.place(Side.SELL, 10, 100.0, time_in_force=TimeInForce.GTD, expire_time=2 * SECOND)
+        self.place(Side.SELL, 10, 101.0, time_in_force=TimeInForce.GTD, expire_time=3 * SECOND)
+        cancelled = self.place(Side.SELL, 10, 102.0, time_in_force=TimeInForce.GTD, expire_time=2 * SECOND)
+        self.exchange.cancel_order('BTC', cancelled.order_id)
+        self.assertTrue(len(self.exchange.expiries) == 3)
+
+        # The expired order is removed before the inbound order is matched
+        clock.set(2 * SECOND)
+        report = self.place(Side.BUY, 10, 101.0)
+        self.assertTrue(report.status == OrderStatus.FILLED)
+        trade = self.exchange.trades[0]
+        self.assertTrue(trade.price == 202 and trade.order_id_a != expiring.order_id)
+        self.assertTrue(len(self.exchange.orderbooks['BTC']) == 0)
+
+        # Orders expire without any inbound order too, already expired ones are not accepted
+        self.place(Side.BUY, 10, 99.0, time_in_force=TimeInForce.GTD, expire_time=4 * SECOND)
+        clock.set(4 * SECOND)
+        expired = self.exchange.expire_orders()
+        self.assertTrue([order.price for order in expired] == [198])
+        report = self.place(Side.BUY, 10, 99.0, time_in_force=TimeInForce.GTD, expire_time=4 * SECOND)
+        self.assertTrue(report.status == OrderStatus.EXPIRED and len(self.exchange.expiries) == 0)
+
+        with self.assertRaises(AssertionError):
+            self.place(Side.BUY, 10, 99.0, time_in_force=TimeInForce.GTD)
+
+    def test_StopExpiry(self):
+        self.place(Side.SELL, 10, 100.0)
+        stop = self.exchange.new_order('c000002', 'BTC', OrderType.MARKET, Side.BUY, 5, stop_flag=True,
+                                       trigger_price=100.0, time_in_force=TimeInForce.GTD, expire_time=2 * SECOND)
+        self.assertTrue(self.exchange.match_order(stop).status == OrderStatus.PENDING)
+        self.exchange.clock.set(2 * SECOND)
+        self.place(Side.BUY, 5, 100.0)
+        self.assertTrue(len(self.exchange.stop_bids['BTC']) == 0)
+        self.assertTrue(self.exchange.orderbooks['BTC'].best_ask().total_quantity == 5)
+
+    def test_EndOfDay(self):
+        for price in (100.0, 101.0, 102.0):
+            self.place(Side.SELL, 10, price, time_in_force=TimeInForce.DAY)
+            self.place(Side.SELL, 10, price, instrument='ETH', time_in_force=TimeInForce.DAY)
+        self.place(Side.SELL, 10, 103.0)
+        self.place(Side.BUY, 10, 100.0)
+
+        expired = self.exchange.expire_day('BTC')
+        self.assertTrue(sorted(order.price for order in expired) == [202, 204])
+        self.assertTrue([order.price for order in self.exchange.orderbooks['BTC'].asks] == [206])
+        self.assertTrue(len(self.exchange.orderbooks['ETH']) == 3)
+        self.assertTrue(self.exchange.expire_day('BTC') == [])
+        self.assertTrue(len(self.exchange.expire_day()) == 3 and len(self.exchange.orderbooks['ETH']) == 0)
+
+    def test_ManyExpiries(self):
+        exchange = MatchingEngine(clock=SimulatedClock(), pooled=True)
+        for idx in range(20000):
+            exchange.match_order(exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.BUY, 1,
+                                                    100.0 - idx % 50, time_in_force=TimeInForce.GTD,
+                                                    expire_time=(idx % 1000 + 1) * 1_000_000))
+        expired = 0
+        for millisecond in range(1, 1001):
+            exchange.clock.set(millisecond * 1_000_000)
+            expired += len(exchange.expire_orders())
+            self.assertTrue(len(exchange.orderbooks['BTC']) == 20000 - expired)
+        self.assertTrue(expired == 20000 and len(exchange.expiries) == 0)
+
+    def test_JournalAndSnapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            journal_path = os.path.join(directory, 'engine.journal')
+            snapshot_path = os.path.join(directory, 'engine.snapshot')
+            with Journal(journal_path, sync_every=None) as journal:
+                self.exchange.journal = journal
+                self.place(Side.SELL, 10, 100.0, time_in_force=TimeInForce.GTD, expire_time=2 * SECOND)
+                self.place(Side.SELL, 10, 101.0, time_in_force=TimeInForce.DAY)
+                snapshot.save(self.exchange, snapshot_path)
+                self.exchange.clock.set(3 * SECOND)
+                self.place(Side.BUY, 5, 101.0)
+                self.exchange.expire_day()
+                self.place(Side.BUY, 5, 101.0)
+
+            for restore in (lambda engine: Journal.replay(journal_path, engine),
+                            lambda engine: snapshot.recover(engine, snapshot_path, journal_path)):
+                restored = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.5)])
+                restore(restored)
+                self.assertTrue(restored.trades.count == self.exchange.trades.count == 1)
+                self.assertTrue(restored.trades[0].price == 202)
+                self.assertTrue([order.id for order in restored.orderbooks['BTC'].bids] ==
+                                [order.id for order in self.exchange.orderbooks['BTC'].bids])
+                self.assertTrue(len(restored.orderbooks['BTC'].asks) == 0)
+
+    def test_JournaledExpiry(self):
+        with tempfile.TemporaryDirectory() as directory:
+            journal_path = os.path.join(directory, 'engine.journal')
+            with Journal(journal_path, sync_every=None) as journal:
+                self.exchange.journal = journal
+                self.place(Side.SELL, 10, 100.0, time_in_force=TimeInForce.GTD, expire_time=2 * SECOND)
+                self.place(Side.SELL, 10, 101.0, time_in_force=TimeInForce.GTD, expire_time=5 * SECOND)
+                # Expired by the clock while no orders arrive
+                self.exchange.clock.set(3 * SECOND)
+                self.assertTrue([order.price for order in self.exchange.expire_orders()] == [200])
+
+            # The replayed clock never passes the expiry time, the journaled expiry removes the order
+            restored = MatchingEngine(instruments=[InstrumentSpec('BTC', 0.5)], clock=SimulatedClock(SECOND))
+            self.assertTrue(Journal.replay(journal_path, restored) == 3)
+            self.assertTrue([order.price for order in restored.orderbooks['BTC'].asks] == [202])
+            self.assertTrue(restored.expire_orders() == [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import random
+import unittest
+
+from engine.src.timerwheel import TimerWheel
+
+
+class TestTimerWheel(unittest.TestCase):
+    def test_FiresOnTime(self):
+        wheel = TimerWheel(resolution=1000)
+        self.assertTrue(wheel.schedule(2500, 'a') and wheel.schedule(1000, 'b') and wheel.schedule(10 ** 9, 'c'))
+        self.assertFalse(wheel.schedule(0, 'd'))
+        self.assertTrue(len(wheel) == 3)
+
+        # Items fire at the first tick boundary at or after their expiry
+        self.assertTrue(wheel.advance(999) == [])
+        self.assertTrue(wheel.advance(1000) == ['b'])
+        self.assertTrue(wheel.advance(2999) == [])
+        self.assertTrue(wheel.advance(3000) == ['a'])
+        self.assertTrue(wheel.advance(10 ** 9 - 1) == [] and len(wheel) == 1)
+        self.assertTrue(wheel.advance(10 ** 12) == ['c'] and len(wheel) == 0)
+        self.assertFalse(wheel.schedule(10 ** 12, 'e'))
+
+    def test_RandomSchedules(self):
+        # Small wheels, so the items cascade through all levels and the overflow list
+        rnd = random.Random(5)
+        for bits, levels in ((1, 3), (3, 2), (6, 8)):
+            wheel = TimerWheel(resolution=7, bits=bits, levels=levels, start=rnd.randrange(10 ** 6))
+            scheduled, fired = {}, []
+            for item in range(3000):
+                expiry = wheel.time + rnd.choice((rnd.randrange(1, 100), rnd.randrange(1, 10 ** 9)))
+                if wheel.schedule(expiry, item):
+                    scheduled[item] = expiry
+                if item % 20 == 0:
+                    now = wheel.time + rnd.randrange(10 ** 7)
+                    items = wheel.advance(now)
+                    self.assertTrue(all(scheduled[item] <= now for item in items))
+                    ticks = [-(-scheduled[item] // 7) for item in items]
+                    self.assertTrue(ticks == sorted(ticks))
+                    fired.extend(items)
+                    due = {item for item, expiry in scheduled.items() if -(-expiry // 7) * 7 <= now}
+                    self.assertTrue(due == set(fired))
+            fired.extend(wheel.advance(10 ** 10))
+            self.assertTrue(sorted(fired) == sorted(scheduled) and len(wheel) == 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from engine.matching_engine import MatchingEngine
+from engine.src.client import Client
+from engine.src.enums import Side, OrderType
+from engine.src.tradetape import TradeTape
+
+
+class TestTradeTape(unittest.TestCase):
+    def test_ClientTrades(self):
+        exchange = MatchingEngine()
+        client_1 = Client(client_name='John Adams')
+        client_1.place_order(exchange, 'BTC', OrderType.LIMIT, Side.SELL, 50, 100.00)
+        client_1.place_order(exchange, 'ETH', OrderType.LIMIT, Side.SELL, 50, 10.00)
+
+        client_2 = Client(client_name='Jack Jones')
+        client_2.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 10, 100.00)
+        client_2.place_order(exchange, 'ETH', OrderType.LIMIT, Side.BUY, 10, 10.00)
+
+        client_3 = Client(client_name='Clark Kent')
+        client_3.place_order(exchange, 'BTC', OrderType.LIMIT, Side.BUY, 5, 100.00)
+
+        trades = exchange.get_client_trades(client_2.client_id)
+        self.assertTrue([trade.instrument for trade in trades] == ['BTC', 'ETH'])
+        self.assertTrue(trades[0].trade_id == 't000001')
+        self.assertTrue(trades[1].quantity == 10)
+        self.assertTrue(exchange.get_client_trades('unknown') == [])
+
+        self.assertTrue(exchange.get_last_trade_price() == 100.00)
+        self.assertTrue(exchange.get_last_trade_price('ETH') == 10.00)
+        self.assertTrue(exchange.get_last_trade_price('XRP') is None)
+        self.assertTrue([trade.quantity for trade in exchange.trades.instrument_trades('BTC')] == [10, 5])
+
+    def test_Retention(self):
+        tape = TradeTape(retention=8)
+        for number in range(1, 101):
+            tape.append('BTC', f'c{number % 2:06}', float(number), 1, number, number + 1000, number, 'c999999', Side.BUY)
+
+        self.assertTrue(tape.count == 100)
+        self.assertTrue(8 <= len(tape) < 10)
+        self.assertTrue(tape[-1].trade_id == 't000100')
+        self.assertTrue(tape[-1].order_id_b == 'o000100')
+        self.assertTrue(tape.last_price('BTC') == 100.00)
+        self.assertTrue(len(tape.client_trades('c000000')) == len([trade for trade in tape if trade.client_id == 'c000000']))
+        self.assertTrue([trade.price for trade in tape.trades_since(97)] == [98.0, 99.0, 100.0])
+
+    def test_Spill(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spill_path = os.path.join(directory, 'trades.bin')
+            tape = TradeTape(retention=4, spill_path=spill_path, tick_instruments={'BTC'})
+            for number in range(1, 31):
+                instrument = 'BTC' if number % 3 else 'ETH'
+                price = number if instrument == 'BTC' else number + 0.5
+                tape.append(instrument, f'c{number:06}', price, number, number, number + 1000, number, 'c999999',
+                            Side.SELL)
+
+            spilled = list(TradeTape.read_spilled(spill_path))
+            trades = spilled + list(tape)
+            self.assertTrue([trade.trade_id for trade in trades] == [f't{number:06}' for number in range(1, 31)])
+            self.assertTrue(trades[3].price == 4 and isinstance(trades[3].price, int))
+            self.assertTrue(trades[2].price == 3.5 and trades[2].instrument == 'ETH')
+            self.assertTrue(trades[10].client_id == 'c000011')
+
+    def test_MixedPricesWithoutSpec(self):
+        # Prices of an instrument without a spec stay floats even if the first trade is at an integer price
+        exchange = MatchingEngine()
+        exchange.match_order(exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100))
+        exchange.match_order(exchange.new_order('c000001', 'BTC', OrderType.LIMIT, Side.SELL, 10, 100.5))
+        exchange.match_order(exchange.new_order('c000002', 'BTC', OrderType.LIMIT, Side.BUY, 20, 101.0))
+        self.assertTrue([trade.price for trade in exchange.trades] == [100, 100.5])
+        self.assertTrue(exchange.get_last_trade_price('BTC') == 100.5)
+        self.assertTrue(exchange.get_last_trade_price() == 100.5)
+
+        with tempfile.TemporaryDirectory() as directory:
+            spill_path = os.path.join(directory, 'trades.bin')
+            tape = TradeTape(retention=1, spill_path=spill_path)
+            for number, price in enumerate((100, 100.5, 101, 101.5), 1):
+                tape.append('ETH', 'c000001', price, 1, number, number + 1000, number, 'c000002', Side.BUY)
+            trades = list(TradeTape.read_spilled(spill_path)) + list(tape)
+            self.assertTrue([trade.price for trade in trades] == [100, 100.5, 101, 101.5])
+
+
+if __name__ == '__main__':
+    unittest.main()